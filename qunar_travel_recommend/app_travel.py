@@ -3,10 +3,15 @@ import streamlit as st
 import matplotlib
 import matplotlib.pyplot as plt
 import seaborn as sns
-import jieba
-from sklearn.feature_extraction.text import TfidfVectorizer
-from sklearn.metrics.pairwise import cosine_similarity
-from wordcloud import WordCloud
+import io
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "src"))
+from travel_index import CONTENT_FIELDS, file_sha256, load_or_build_index
+from rerank import retrieve_rerank
+from term_freq import refresh_term_freq, wordcloud_png
+from travel_stats import DURATION_BUCKETS, UNKNOWN, refresh_stats
 
 # ----------- 全局中文支持设置，绝对路径 -----------
 # Windows 下用微软雅黑
@@ -14,45 +19,147 @@ CHINESE_FONT = 'C:/Windows/Fonts/msyh.ttc'
 matplotlib.rcParams['font.sans-serif'] = ['Microsoft YaHei']
 matplotlib.rcParams['axes.unicode_minus'] = False
 
-# ----------- 数据载入（兼容tab/逗号分隔和 BOM） -----------
-def load_df(path):
-    with open(path, 'r', encoding='utf-8') as f:
-        header = f.readline()
-    sep = '\t' if '\t' in header else ','
-    df = pd.read_csv(path, sep=sep, encoding='utf-8')
-    col_names = [c.replace('\ufeff', '') for c in df.columns]
-    df.columns = col_names
-    return df
-
-# -- 加载数据
-df = load_df("../data/featured_travel.csv")
-
-# -- 推荐系统建模预处理
-def preprocess(row):
-    fields = []
-    for k in ['标题', '人物', '主题']:
-        val = row.get(k)
-        if pd.notnull(val):
-            val_str = str(val).strip()
-            if val_str and val_str != '无':
-                fields.append(val_str)
-    return " ".join(fields)
-df['内容'] = df.apply(preprocess, axis=1)
-df = df[df['内容'].str.strip() != '']
-
-# -- 分词向量化
-def chinese_tokenizer(text):
-    try:
-        return list(jieba.cut(str(text)))
-    except:
-        return []
-vectorizer = TfidfVectorizer(tokenizer=chinese_tokenizer, max_features=500)
-X = vectorizer.fit_transform(df['内容'])
+DATA_PATH = "../data/featured_travel.csv"
+
+
+# ----------- 缓存层：Streamlit 每次交互都会从头执行脚本，数据、索引、图表按数据版本缓存，进程内所有会话共享 -----------
+@st.cache_data(show_spinner=False)
+def data_version(path, mtime, size):
+    """
+    数据文件内容哈希作为版本号；mtime/size 参与缓存键，文件没动时不必重新计算哈希
+    """
+    return file_sha256(path)[:12]
+
+
+def current_data_version(path):
+    stat = os.stat(path)
+    return data_version(path, stat.st_mtime, stat.st_size)
+
+
+@st.cache_resource(show_spinner="正在加载数据与索引……")
+def load_resources(data_path, version):
+    """
+    加载预构建索引（推荐要展示的字段都在索引的行元数据里，看板出数走统计聚合表，不再读整份数据），
+    同一数据版本只执行一次；数据变化时才重新拟合
+    """
+    return load_or_build_index(data_path)
+
+
+@st.cache_resource(show_spinner=False)
+def load_stats(data_path, version):
+    """
+    统计聚合表：数据文件有新增行时只增量聚合新增部分，看板图表都从聚合表出数
+    """
+    return refresh_stats(data_path)
+
+
+@st.cache_resource(show_spinner=False)
+def load_term_freq(data_path, version):
+    """
+    词云词频表：与推荐“内容”同样取标题/人物/主题，只对新增游记分词
+    """
+    return refresh_term_freq(data_path, CONTENT_FIELDS)
+
+
+# ----------- 图表：按数据版本缓存渲染好的 PNG（_stats/_terms 不参与哈希，由 version 标识），图表函数不修改共享的数据 -----------
+def figure_png(fig):
+    buf = io.BytesIO()
+    fig.savefig(buf, format='png', dpi=150, bbox_inches='tight')
+    plt.close(fig)
+    return buf.getvalue()
+
+@st.cache_data(show_spinner=False)
+def chart_top_destinations(version, _stats):
+    dest = _stats.table(['目的地'])
+    dest = dest[dest['目的地'] != UNKNOWN].head(10)
+    if dest.empty:
+        return None
+    top_dest = dest['目的地'].tolist()
+    avg_fee = dest.set_index('目的地')['平均费用']
+    fig1, ax1 = plt.subplots(figsize=(10,4))
+    ax1.bar(top_dest, avg_fee.loc[top_dest], color=sns.color_palette("Blues_r", n_colors=10))
+    ax1.set_ylabel('人均费用（元）')
+    ax1.set_xlabel('热门目的地')
+    ax1.set_title('Top10 热门目的地及平均人均费用')
+    mean_fee = avg_fee.mean()
+    min_fee, max_fee = avg_fee.min(), avg_fee.max()
+    ax1.axhline(mean_fee, color='red', linestyle='--', label='均值')
+    ax1.axhline(min_fee, color='green', linestyle=':', label='最小值')
+    ax1.axhline(max_fee, color='blue', linestyle=':', label='最大值')
+    for spine in ['top','right']:
+        ax1.spines[spine].set_visible(False)
+    ax1.legend()
+    return figure_png(fig1)
+
+
+@st.cache_data(show_spinner=False)
+def chart_partners(version, _stats):
+    partners = _stats.table(['人物'])
+    partner_count = partners[partners['人物'] != UNKNOWN].set_index('人物')['数量'].head(10)
+    if partner_count.empty:
+        return None
+    fig2, ax2 = plt.subplots()
+    colors = sns.color_palette('Pastel1', n_colors=partner_count.size)
+    patches, texts, autotexts = ax2.pie(partner_count, labels=partner_count.index, autopct='%1.1f%%',
+                                        startangle=140, colors=colors, textprops={'fontsize':12})
+    ax2.set_title('出游结伴方式')
+    return figure_png(fig2)
+
+
+@st.cache_data(show_spinner=False)
+def chart_years(version, _stats):
+    df_years = _stats.table(['年份']).dropna(subset=['年份']).set_index('年份')['数量'].sort_index()
+    if df_years.empty:
+        return None
+    fig3, ax3 = plt.subplots()
+    sns.lineplot(x=df_years.index.astype(int), y=df_years.values, marker='o', ax=ax3)
+    ax3.set_xlabel("年份")
+    ax3.set_ylabel("数量")
+    ax3.set_title("各年份出游数量变化趋势")
+    return figure_png(fig3)
+
+
+@st.cache_data(show_spinner=False)
+def chart_play_duration(version, _stats):
+    play = _stats.table(['主题'])
+    play_top = play[play['主题'] != UNKNOWN].set_index('主题')['数量'].head(10)
+    order = [name for _, _, name in DURATION_BUCKETS]
+    dur_top = _stats.table(['时长']).set_index('时长')['数量'].reindex(order).dropna()
+    fig4, ax4 = plt.subplots(1,2,figsize=(14,4))
+    if not play_top.empty:
+        sns.barplot(y=play_top.index, x=play_top.values, ax=ax4[0], palette='coolwarm')
+        ax4[0].set_title('热门出游主题Top10')
+        ax4[0].set_xlabel('数量')
+    else:
+        ax4[0].set_visible(False)
+    if not dur_top.empty:
+        sns.barplot(y=dur_top.index, x=dur_top.values, ax=ax4[1], palette='mako')
+        ax4[1].set_title('不同旅行时长分布')
+        ax4[1].set_xlabel('数量')
+    else:
+        ax4[1].set_visible(False)
+    return figure_png(fig4)
+
+
+@st.cache_data(show_spinner="正在生成词云……")
+def chart_wordcloud(version, _terms, max_words=120):
+    # 直接从持久化词频表生成，不再拼接全文整体分词；磁盘上也按词频表版本+参数缓存
+    return wordcloud_png(
+        _terms, font_path=CHINESE_FONT,
+        background_color='white', width=800, height=400,
+        max_words=max_words, contour_width=1, contour_color='steelblue'
+    )
+
 
 # ===================== Streamlit 前端 =====================
 st.set_page_config(page_title="去哪儿游记推荐与数据洞察", layout="wide")
 st.title("去哪儿游记智能推荐与数据可视化平台")
 
+version = current_data_version(DATA_PATH)
+index = load_resources(DATA_PATH, version)
+stats = load_stats(DATA_PATH, version)
+terms = load_term_freq(DATA_PATH, version)
+
 tab1, tab2 = st.tabs(['🌟 智能推荐', '📊 数据分析'])
 
 # ========== Tab1：智能推荐 ==========
@@ -60,10 +167,8 @@ with tab1:
     st.header("🌟 个性化游记推荐")
     user_interest = st.text_input("请输入你的旅游兴趣（如：美食、沙滩、亲子）", value="美食")
     budget = st.text_input("最大预算（单位元，可留空）", "")
-    def get_recommend_reason(user_interest, content):
-        keywords = set(chinese_tokenizer(user_interest))
-        docwords = set(chinese_tokenizer(content))
-        hit = keywords & docwords
+    def get_recommend_reason(user_interest, i):
+        hit = index.matched_terms(user_interest, i)
         if hit:
             return f"匹配兴趣词：{'、'.join(hit)}"
         else:
@@ -72,23 +177,15 @@ with tab1:
         user_interest = user_interest.strip()
         if not user_interest:
             return []
-        user_vec = vectorizer.transform([user_interest])
-        df_ = df.copy()
-        if budget > 0:
-            df_['费用'] = pd.to_numeric(df_['费用'], errors='coerce')
-            df_ = df_[df_['费用'].notnull() & (df_['费用'] <= budget)]
-            if df_.empty:
-                return []
-            X_ = vectorizer.transform(df_['内容'])
-        else:
-            X_ = X
-        if X_.shape[0] == 0:
+        user_vec = index.transform([user_interest])
+        mask = index.budget_mask(budget)
+        if mask is not None and not mask.any():
             return []
-        sims = cosine_similarity(user_vec, X_)[0]
-        idx = sims.argsort()[::-1][:top_n]
+        # 召回（文本前若干篇 + 热度兜底）后按热度、新近度、预算契合度重排
+        idx, _ = retrieve_rerank(index, user_vec, top_n, mask=mask, budget=budget if budget > 0 else None)
         results = []
         for i in idx:
-            row = df_.iloc[df_.index[i]]
+            row = index.row(i)
             results.append({
                 '标题': row.get('标题', ''),
                 '人物': row.get('人物', ''),
@@ -97,7 +194,7 @@ with tab1:
                 '浏览': row.get('浏览', ''),
                 '点赞': row.get('点赞', ''),
                 '链接': row.get('链接', ''),
-                '推荐理由': get_recommend_reason(user_interest, row.get('内容',''))
+                '推荐理由': get_recommend_reason(user_interest, i)
             })
         return results
 
@@ -126,108 +223,40 @@ with tab1:
 with tab2:
     st.header("📊 真实游记数据分析洞察")
 
-    # 1. 热门目的地Top10及人均费用（柱状图）
+    # 1. 热门目的地Top10及人均费用（柱状图，来自预聚合统计表）
     st.subheader("1. 热门目的地Top10与人均费用")
-    # 这里用标题字段简单提取目的地（可根据你实际情况微调提取正则）
-    df['目的地'] = df['标题'].str.extract(r'([\u4e00-\u9fa5]{2,8})[游行]', expand=False)
-    top_dest = df['目的地'].value_counts().head(10).index.tolist()
-    top_dest_df = df[df['目的地'].isin(top_dest)]
-    avg_fee = top_dest_df.groupby('目的地')['费用'].mean()
-    fig1, ax1 = plt.subplots(figsize=(10,4))
-    ax1.bar(top_dest, avg_fee.loc[top_dest], color=sns.color_palette("Blues_r", n_colors=10))
-    ax1.set_ylabel('人均费用（元）')
-    ax1.set_xlabel('热门目的地')
-    ax1.set_title('Top10 热门目的地及平均人均费用')
-    mean_fee = avg_fee.mean()
-    min_fee, max_fee = avg_fee.min(), avg_fee.max()
-    ax1.axhline(mean_fee, color='red', linestyle='--', label='均值')
-    ax1.axhline(min_fee, color='green', linestyle=':', label='最小值')
-    ax1.axhline(max_fee, color='blue', linestyle=':', label='最大值')
-    for spine in ['top','right']:
-        ax1.spines[spine].set_visible(False)
-    ax1.legend()
-    st.pyplot(fig1)
+    png1 = chart_top_destinations(version, stats)
+    if png1 is not None:
+        st.image(png1)
+    else:
+        st.info('未找到目的地信息，无法展示热门目的地。')
 
     # 2. 出游结伴方式（饼图）
     st.subheader("2. 出游结伴方式分析")
-    if '人物' in df.columns:
-        partner_count = df['人物'].value_counts().head(10)
-        fig2, ax2 = plt.subplots()
-        colors = sns.color_palette('Pastel1', n_colors=partner_count.size)
-        patches, texts, autotexts = ax2.pie(partner_count, labels=partner_count.index, autopct='%1.1f%%',
-                                            startangle=140, colors=colors, textprops={'fontsize':12})
-        ax2.set_title('出游结伴方式')
-        st.pyplot(fig2)
+    png2 = chart_partners(version, stats)
+    if png2 is not None:
+        st.image(png2)
     else:
         st.info('未找到人物字段，无法展示结伴方式。')
 
     # 3. 出游时间（折线图）
     st.subheader("3. 不同时间段出游情况")
-    date_col = None
-    for col in ['出发日期','时间','日期','年份','出']:
-        if col in df.columns:
-            date_col = col
-            break
-    if date_col is not None:
-        df['year'] = df[date_col].astype(str).str.extract(r'(20\d{2})')
-        df_years = df['year'].value_counts().sort_index()
-        fig3, ax3 = plt.subplots()
-        sns.lineplot(x=df_years.index, y=df_years.values, marker='o', ax=ax3)
-        ax3.set_xlabel("年份")
-        ax3.set_ylabel("数量")
-        ax3.set_title("各年份出游数量变化趋势")
-        st.pyplot(fig3)
+    png3 = chart_years(version, stats)
+    if png3 is not None:
+        st.image(png3)
     else:
         st.info('未找到日期相关字段，无法展示出游时间分布')
 
     # 4. 出游主题、旅行时长分布（条形图）
     st.subheader("4. 出游玩法/旅行时长分布")
-    play_col = None
-    for c in ['主题','玩法','方式']:
-        if c in df.columns:
-            play_col = c
-            break
-    dur_col = None
-    for c in ['天数','旅行时长','行程天数']:
-        if c in df.columns:
-            dur_col = c
-            break
-    fig4, ax4 = plt.subplots(1,2,figsize=(14,4))
-    if play_col:
-        play_top = df[play_col].value_counts().head(10)
-        sns.barplot(y=play_top.index, x=play_top.values, ax=ax4[0], palette='coolwarm')
-        ax4[0].set_title('热门出游主题Top10')
-        ax4[0].set_xlabel('数量')
-    else:
-        ax4[0].set_visible(False)
-    if dur_col:
-        dur_top = df[dur_col].value_counts().sort_index()
-        sns.barplot(y=dur_top.index.astype(str), x=dur_top.values, ax=ax4[1], palette='mako')
-        ax4[1].set_title('不同旅行时长分布')
-        ax4[1].set_xlabel('数量')
-    else:
-        ax4[1].set_visible(False)
-    st.pyplot(fig4)
+    st.image(chart_play_duration(version, stats))
 
     # 5. 词云
     st.subheader("5. 高频词词云")
-    if '内容' in df.columns:
-        texts = ' '.join(df['内容'].astype(str).tolist())
-        seg_list = jieba.cut(texts)
-        words = [w for w in seg_list if len(w) > 1]
-        text_join = ' '.join(words)
-        wc = WordCloud(
-            font_path=CHINESE_FONT,
-            background_color='white', width=800, height=400,
-            max_words=120, contour_width=1, contour_color='steelblue'
-        ).generate(text_join)
-        fig5, ax5 = plt.subplots(figsize=(8,4))
-        ax5.imshow(wc, interpolation='bilinear')
-        ax5.axis('off')
-        ax5.set_title('短评/内容 关键词词云')
-        st.pyplot(fig5)
+    if terms.counts:
+        st.image(chart_wordcloud(version, terms))
     else:
-        st.info('数据中未找到“内容”字段，无法绘制词云')
+        st.info('没有可用的文本内容，无法绘制词云')
 
     st.markdown("""
     **如何为“选择困难症”用户提供推荐？**
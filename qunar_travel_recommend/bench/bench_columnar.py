@@ -0,0 +1,101 @@
+"""
+CSV 与列式文件（.arrow）的加载对比：加载耗时和加载带来的 RSS 增量。
+每种方式在独立子进程里测，互不影响。
+
+    python bench/bench_columnar.py [--csv data/featured_travel.csv] [--scale 100] [--json]
+
+--scale N 把数据重复 N 倍后再测，用于观察大文件下的差异。
+"""
+import argparse
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(BASE_DIR, "src"))
+
+MODES = ["csv", "arrow", "arrow_index_columns"]
+
+
+def current_rss_mb():
+    with open("/proc/self/status") as f:
+        for line in f:
+            if line.startswith("VmRSS:"):
+                return int(line.split()[1]) / 1024
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def run_child(mode, csv_path):
+    """
+    子进程内：导入依赖后记下基线 RSS，再加载一次数据并逐列触碰，输出 JSON
+    """
+    import pandas as pd  # noqa: F401
+    from columnar import read_columnar, columnar_path
+    from travel_index import load_travel_csv, INDEX_COLUMNS
+
+    base_rss = current_rss_mb()
+    start = time.perf_counter()
+    if mode == "csv":
+        df = load_travel_csv(csv_path)
+    elif mode == "arrow":
+        df = read_columnar(columnar_path(csv_path))
+    else:
+        df = read_columnar(columnar_path(csv_path), INDEX_COLUMNS)
+    # 触碰每一列，避免只测到惰性映射
+    for c in df.columns:
+        df[c].isna().sum()
+    elapsed = time.perf_counter() - start
+    print(json.dumps({"mode": mode, "rows": len(df), "columns": len(df.columns),
+                      "seconds": round(elapsed, 4), "rss_delta_mb": round(current_rss_mb() - base_rss, 1)}))
+
+
+def prepare(csv_path, scale, workdir):
+    import pandas as pd
+    from columnar import write_columnar
+    from travel_index import load_travel_csv
+    path = csv_path
+    if scale > 1:
+        df = load_travel_csv(csv_path)
+        path = os.path.join(workdir, f"scaled_x{scale}.csv")
+        pd.concat([df] * scale, ignore_index=True).to_csv(path, index=False, encoding="utf-8-sig")
+    else:
+        path = os.path.join(workdir, os.path.basename(csv_path))
+        with open(csv_path, "rb") as src, open(path, "wb") as dst:
+            dst.write(src.read())
+    write_columnar(path)
+    return path
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="CSV 与列式文件加载对比")
+    parser.add_argument("--csv", default=os.path.join(BASE_DIR, "data", "featured_travel.csv"))
+    parser.add_argument("--scale", type=int, default=1)
+    parser.add_argument("--json", action="store_true")
+    parser.add_argument("--child", choices=MODES, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        run_child(args.child, args.csv)
+        sys.exit(0)
+
+    with tempfile.TemporaryDirectory() as workdir:
+        path = prepare(args.csv, args.scale, workdir)
+        sizes = {"csv_mb": round(os.path.getsize(path) / 2**20, 2),
+                 "arrow_mb": round(os.path.getsize(os.path.splitext(path)[0] + ".arrow") / 2**20, 2)}
+        results = []
+        for mode in MODES:
+            out = subprocess.run([sys.executable, os.path.abspath(__file__), "--child", mode, "--csv", path],
+                                 capture_output=True, text=True, check=True)
+            results.append(json.loads(out.stdout.strip().splitlines()[-1]))
+
+    if args.json:
+        print(json.dumps({"scale": args.scale, **sizes, "results": results}, ensure_ascii=False))
+    else:
+        print(f"数据放大 {args.scale} 倍：CSV {sizes['csv_mb']} MB，列式 {sizes['arrow_mb']} MB")
+        for r in results:
+            print(f"  {r['mode']:20s} {r['rows']:>9d} 行 {r['columns']:>3d} 列  "
+                  f"{r['seconds'] * 1000:9.1f} ms  RSS +{r['rss_delta_mb']} MB")
@@ -0,0 +1,100 @@
+"""
+列表页解析基准：在样例页（data/fixtures/page_*.html，由 src/qunar_stub_server.py 按列表页结构生成）上
+    1. 校验 fast 与 bs4 两个后端逐条记录完全一致（不一致时退出码为 1）
+    2. 分别统计每秒解析页数
+
+quirks/*.html 是省略 </li>、</ul> 等不规范写法的变体，两个后端在这里有意不同（bs4 把后一条嵌进前一条），
+不参与对比，由 tests/test_qunar_extract.py 单独固定
+
+    python bench/bench_extract.py [--repeat 20] [--json]
+"""
+import argparse
+import glob
+import json
+import os
+import sys
+import time
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(BASE_DIR, "src"))
+from qunar_extract import EXTRACTORS  # noqa: E402
+
+FIXTURE_DIR = os.path.join(BASE_DIR, "data", "fixtures")
+
+
+def load_fixtures(fixture_dir=FIXTURE_DIR):
+    pages = _read_pages(sorted(glob.glob(os.path.join(fixture_dir, "page_*.html"))), fixture_dir)
+    if not pages:
+        raise FileNotFoundError(f"没有样例页，请先运行 src/qunar_stub_server.py --write-fixtures: {fixture_dir}")
+    return pages
+
+
+def load_quirks(fixture_dir=FIXTURE_DIR):
+    """
+    不规范写法的变体页：[(文件名, HTML, 由哪一页改写而来)]，来源记在 quirks/sources.json
+    """
+    with open(os.path.join(fixture_dir, "quirks", "sources.json"), encoding="utf-8") as f:
+        sources = json.load(f)
+    paths = [os.path.join(fixture_dir, "quirks", name) for name in sorted(sources)]
+    return [(name, html, sources[os.path.basename(name)]) for name, html in _read_pages(paths, fixture_dir)]
+
+
+def _read_pages(paths, fixture_dir):
+    pages = []
+    for path in paths:
+        # 不转换换行，保留 CRLF 变体原样
+        with open(path, encoding="utf-8", newline="") as f:
+            pages.append((os.path.relpath(path, fixture_dir), f.read()))
+    return pages
+
+
+def check_parity(pages, baseline="bs4", candidate="fast"):
+    """
+    逐页对比两个后端的输出，返回不一致的 (文件名, 说明) 列表
+    """
+    diffs = []
+    for name, html in pages:
+        expected = EXTRACTORS[baseline](html)
+        actual = EXTRACTORS[candidate](html)
+        if len(expected) != len(actual):
+            diffs.append((name, f"记录数 {len(expected)} != {len(actual)}"))
+            continue
+        for i, (e, a) in enumerate(zip(expected, actual)):
+            if e != a:
+                fields = [k for k in e if e.get(k) != a.get(k)]
+                diffs.append((name, f"第{i}条字段不一致: {fields}"))
+    return diffs
+
+
+def bench(pages, backend, repeat):
+    extract = EXTRACTORS[backend]
+    start = time.perf_counter()
+    for _ in range(repeat):
+        for _, html in pages:
+            extract(html)
+    elapsed = time.perf_counter() - start
+    return len(pages) * repeat / elapsed
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="列表页解析基准")
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--json", action="store_true", help="以 JSON 输出结果")
+    args = parser.parse_args()
+
+    pages = load_fixtures()
+    diffs = check_parity(pages)
+    result = {"pages": len(pages), "repeat": args.repeat, "parity": not diffs,
+              "pages_per_sec": {name: round(bench(pages, name, args.repeat), 1) for name in EXTRACTORS}}
+    result["speedup"] = round(result["pages_per_sec"]["fast"] / result["pages_per_sec"]["bs4"], 2)
+    if args.json:
+        print(json.dumps(result, ensure_ascii=False))
+    else:
+        print(f"样例页: {len(pages)}，重复 {args.repeat} 次")
+        for name, pps in result["pages_per_sec"].items():
+            print(f"  {name:5s} {pps:8.1f} 页/秒")
+        print(f"  加速比 {result['speedup']}x")
+        print("一致性校验:", "通过" if not diffs else "失败")
+    for name, msg in diffs:
+        print(f"  {name}: {msg}", file=sys.stderr)
+    sys.exit(1 if diffs else 0)
@@ -0,0 +1,52 @@
+"""
+召回 + 重排的延迟随语料规模的变化：合成语料从 1 万篇到 100 万篇，
+统计每次推荐的平均耗时、候选数，以及只按文本得分检索的耗时作对照。
+
+    python bench/bench_rerank.py [--sizes 10000,100000,1000000] [--queries 200] [--json]
+"""
+import argparse
+import json
+import os
+import sys
+import time
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(BASE_DIR, "src"))
+sys.path.insert(0, os.path.join(BASE_DIR, "bench"))
+from bench_topk import query_vectors, synthetic_index  # noqa: E402
+from rerank import TEXT_CANDIDATES, POPULAR_CANDIDATES, retrieve_rerank  # noqa: E402
+
+
+def run(n_docs, n_terms, n_queries, top_n=10):
+    index, term_p = synthetic_index(n_docs, n_terms)
+    queries = query_vectors(index, term_p, n_queries)
+    mask = index.budget_mask(5000)
+    t0 = time.perf_counter()
+    for q in queries:
+        index.search(q, top_n, mask=mask)
+    t1 = time.perf_counter()
+    for q in queries:
+        retrieve_rerank(index, q, top_n, mask=mask, budget=5000, days=5)
+    t2 = time.perf_counter()
+    return {
+        'docs': n_docs,
+        'search_ms': round((t1 - t0) / n_queries * 1000, 3),
+        'rerank_ms': round((t2 - t1) / n_queries * 1000, 3),
+        'max_candidates': TEXT_CANDIDATES + POPULAR_CANDIDATES,
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="召回 + 重排延迟基准")
+    parser.add_argument("--sizes", default="10000,100000,1000000")
+    parser.add_argument("--terms", type=int, default=100000)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--json", action="store_true")
+    args = parser.parse_args()
+    results = [run(int(n), args.terms, args.queries) for n in args.sizes.split(",")]
+    if args.json:
+        print(json.dumps(results, ensure_ascii=False))
+    else:
+        for r in results:
+            print(f"{r['docs']:>9d} 篇  只检索 {r['search_ms']:8.3f} ms  召回+重排 {r['rerank_ms']:8.3f} ms"
+                  f"  （候选不超过 {r['max_candidates']} 篇）")
@@ -0,0 +1,274 @@
+"""
+全流程基准：用合成数据（bench/synthetic_data.py）在 1k / 10k / 100k / 1M 行上依次测
+    generate  生成原始数据（爬虫输出格式）
+    parse     列表页解析：逐页渲染成 HTML（不计时）后用 qunar_extract.extract_fast 解析（计时）
+    clean     data_cleaning.clean_data
+    features  analysis.add_features
+    pipeline  feature_pipeline.clean_and_featurize（分块流式的清洗 + 特征，对照用）
+    index     travel_index.build_index
+    query     加载索引，单条推荐（TravelRecommender.recommend）的 p50/p99 延迟和批量推荐的吞吐
+每个阶段在独立子进程里运行，记录耗时、行数和峰值内存（ru_maxrss，含解释器和导入的库；base_rss_mb 为子进程启动时的内存）。
+
+结果以 JSON 输出，每个（行数, 阶段）一条记录；--baseline 给出上次的结果文件时逐项对比耗时。
+
+    python bench/bench_suite.py [--sizes 1000,10000,100000,1000000] [--stages ...] [--out result.json] [--baseline old.json]
+"""
+import argparse
+import json
+import os
+import platform
+import resource
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SRC_DIR = os.path.join(BASE_DIR, "src")
+sys.path.insert(0, SRC_DIR)
+sys.path.insert(0, os.path.join(BASE_DIR, "bench"))
+
+STAGES = ["generate", "parse", "clean", "features", "pipeline", "index", "query"]
+QUERIES = ['美食', '古镇 摄影', '海边 沙滩', '自驾', '徒步 雪山', '温泉', '亲子', '夜景 美食', '博物馆', '草原 露营']
+# 阶段依赖（前置阶段的产物）：未选中的前置阶段在产物不存在时也会执行，但不计入结果
+DEPENDS = {'parse': 'generate', 'clean': 'generate', 'pipeline': 'generate',
+           'features': 'clean', 'index': 'features', 'query': 'index'}
+OUTPUTS = {'generate': 'raw', 'clean': 'cleaned', 'features': 'featured', 'index': 'index'}
+PAGE_SIZE = 10
+# 回归判定：比基线慢这么多倍时标出来
+REGRESSION_RATIO = 1.2
+
+
+def current_rss_mb():
+    with open("/proc/self/status") as f:
+        for line in f:
+            if line.startswith("VmRSS:"):
+                return int(line.split()[1]) / 1024
+    return 0.0
+
+
+def peak_rss_mb():
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def paths(workdir):
+    return {
+        'raw': os.path.join(workdir, 'raw.csv'),
+        'cleaned': os.path.join(workdir, 'cleaned.csv'),
+        'featured': os.path.join(workdir, 'featured.csv'),
+        'pipeline': os.path.join(workdir, 'pipeline.csv'),
+        'index': os.path.join(workdir, 'index'),
+    }
+
+
+def required_stages(selected):
+    need = set(selected)
+    for stage in reversed(STAGES):
+        if stage in need and stage in DEPENDS:
+            need.add(DEPENDS[stage])
+    return need
+
+
+def count_rows(csv_path):
+    import pandas as pd
+    return sum(len(c) for c in pd.read_csv(csv_path, usecols=[0], chunksize=200000))
+
+
+# ----------- 各阶段（在子进程里执行），返回要记录的附加字段 -----------
+def stage_generate(rows, p):
+    from synthetic_data import write_synthetic
+    write_synthetic(rows, p['raw'])
+    return {'rows_out': rows}
+
+
+def stage_parse(rows, p):
+    import pandas as pd
+    from qunar_extract import extract_fast
+    from qunar_stub_server import render_list_page
+    parsed = pages = 0
+    parse_seconds = 0.0
+    for chunk in pd.read_csv(p['raw'], encoding='utf-8-sig', chunksize=PAGE_SIZE * 1000):
+        records = chunk.to_dict('records')
+        for start in range(0, len(records), PAGE_SIZE):
+            html = render_list_page(records[start:start + PAGE_SIZE])
+            t0 = time.perf_counter()
+            parsed += len(extract_fast(html))
+            parse_seconds += time.perf_counter() - t0
+            pages += 1
+    return {'seconds': parse_seconds, 'pages': pages, 'rows_out': parsed,
+            'pages_per_sec': round(pages / parse_seconds, 1) if parse_seconds else None}
+
+
+def stage_clean(rows, p):
+    from data_cleaning import clean_data
+    clean_data(p['raw'], p['cleaned'])
+    return {'rows_out': count_rows(p['cleaned'])}
+
+
+def stage_features(rows, p):
+    from analysis import add_features
+    add_features(p['cleaned'], p['featured'])
+    return {'rows_out': count_rows(p['featured'])}
+
+
+def stage_pipeline(rows, p):
+    from feature_pipeline import clean_and_featurize
+    _, rows_out = clean_and_featurize(p['raw'], p['pipeline'], columnar=False)
+    return {'rows_out': rows_out}
+
+
+def stage_index(rows, p):
+    from travel_index import build_index
+    index = build_index(p['featured'], p['index'])
+    return {'rows_out': len(index), 'terms': len(index.vocabulary), 'nnz': int(index.X.nnz)}
+
+
+def stage_query(rows, p, n_single=200, batch=200):
+    import numpy as np
+    from recommender import TravelRecommender
+    t0 = time.perf_counter()
+    rec = TravelRecommender(p['featured'], p['index'])
+    load_seconds = time.perf_counter() - t0
+    rec.recommend(interests='预热')
+    lat = []
+    for i in range(n_single):
+        kwargs = {'interests': QUERIES[i % len(QUERIES)]}
+        if i % 3 == 1:
+            kwargs['budget'] = 3000
+        if i % 4 == 2:
+            kwargs['people'] = '家庭'
+        t1 = time.perf_counter()
+        rec.recommend(top_n=10, **kwargs)
+        lat.append(time.perf_counter() - t1)
+    lat = np.array(lat) * 1000
+    queries = [QUERIES[i % len(QUERIES)] for i in range(batch)]
+    t1 = time.perf_counter()
+    rec.recommend_many(queries, top_n=10)
+    batch_seconds = time.perf_counter() - t1
+    return {
+        'rows_out': len(rec),
+        'load_seconds': round(load_seconds, 4),
+        'single_p50_ms': round(float(np.percentile(lat, 50)), 3),
+        'single_p99_ms': round(float(np.percentile(lat, 99)), 3),
+        'single_mean_ms': round(float(lat.mean()), 3),
+        'batch_queries': batch,
+        'batch_qps': round(batch / batch_seconds, 1),
+    }
+
+
+STAGE_FUNCS = {name: globals()['stage_' + name] for name in STAGES}
+
+
+def run_stage_inline(stage, rows, workdir):
+    """
+    子进程入口：执行一个阶段，输出一行 JSON
+    """
+    p = paths(workdir)
+    base = current_rss_mb()
+    t0 = time.perf_counter()
+    extra = STAGE_FUNCS[stage](rows, p)
+    seconds = time.perf_counter() - t0
+    result = {'rows': rows, 'stage': stage, 'seconds': seconds, 'base_rss_mb': round(base, 1),
+              'peak_rss_mb': round(peak_rss_mb(), 1)}
+    result.update(extra)
+    result['seconds'] = round(result['seconds'], 4)
+    print("BENCH_RESULT " + json.dumps(result, ensure_ascii=False), flush=True)
+
+
+def run_stage(stage, rows, workdir, verbose=False):
+    cmd = [sys.executable, os.path.abspath(__file__), "--run-stage", stage, "--rows", str(rows), "--workdir", workdir]
+    proc = subprocess.run(cmd, cwd=SRC_DIR, capture_output=True, text=True)
+    for line in proc.stdout.splitlines():
+        if line.startswith("BENCH_RESULT "):
+            return json.loads(line[len("BENCH_RESULT "):])
+        if verbose:
+            print(line, file=sys.stderr)
+    return {'rows': rows, 'stage': stage, 'error': (proc.stderr or proc.stdout).strip()[-2000:]}
+
+
+def environment():
+    import numpy as np
+    import pandas as pd
+    return {
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cpus': os.cpu_count(),
+        'numpy': np.__version__,
+        'pandas': pd.__version__,
+        'time': time.strftime('%Y-%m-%dT%H:%M:%S'),
+    }
+
+
+def compare(results, baseline):
+    """
+    逐项对比耗时，返回 [(行数, 阶段, 基线秒数, 本次秒数, 倍数)]
+    """
+    old = {(r['rows'], r['stage']): r for r in baseline.get('results', []) if 'seconds' in r}
+    rows = []
+    for r in results:
+        b = old.get((r['rows'], r['stage']))
+        if b and 'seconds' in r and b['seconds'] > 0:
+            rows.append((r['rows'], r['stage'], b['seconds'], r['seconds'], r['seconds'] / b['seconds']))
+    return rows
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="合成数据全流程基准")
+    parser.add_argument("--sizes", default="1000,10000,100000,1000000")
+    parser.add_argument("--stages", default=",".join(STAGES))
+    parser.add_argument("--out", default=None, help="结果 JSON 文件，默认输出到标准输出")
+    parser.add_argument("--baseline", default=None, help="上次的结果 JSON，逐项对比耗时")
+    parser.add_argument("--workdir", default=None, help="中间文件目录，默认临时目录（结束后删除）")
+    parser.add_argument("--verbose", action="store_true")
+    parser.add_argument("--run-stage", default=None, help=argparse.SUPPRESS)
+    parser.add_argument("--rows", type=int, default=None, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.run_stage:
+        run_stage_inline(args.run_stage, args.rows, args.workdir)
+        sys.exit(0)
+
+    stages = [s for s in args.stages.split(",") if s]
+    unknown = set(stages) - set(STAGES)
+    if unknown:
+        sys.exit(f"未知阶段: {', '.join(sorted(unknown))}（可选 {', '.join(STAGES)}）")
+    need = required_stages(stages)
+    root = args.workdir or tempfile.mkdtemp(prefix="bench-suite-")
+    results = []
+    try:
+        for rows in [int(s) for s in args.sizes.split(",")]:
+            workdir = os.path.join(root, str(rows))
+            os.makedirs(workdir, exist_ok=True)
+            for stage in STAGES:
+                if stage not in need:
+                    continue
+                if stage not in stages and os.path.exists(paths(workdir)[OUTPUTS[stage]]):
+                    continue
+                r = run_stage(stage, rows, workdir, args.verbose)
+                if stage in stages:
+                    results.append(r)
+                if 'error' in r:
+                    print(f"[基准] {rows:>8} 行 {stage:9s} 失败: {r['error'][-300:]}", file=sys.stderr)
+                else:
+                    print(f"[基准] {rows:>8} 行 {stage:9s} {r['seconds']:9.3f}s  峰值 {r['peak_rss_mb']:8.1f} MB",
+                          file=sys.stderr)
+    finally:
+        if not args.workdir:
+            shutil.rmtree(root, ignore_errors=True)
+
+    report = {'environment': environment(), 'results': results}
+    if args.baseline:
+        with open(args.baseline, encoding='utf-8') as f:
+            diffs = compare(results, json.load(f))
+        report['comparison'] = [{'rows': n, 'stage': s, 'baseline_seconds': b, 'seconds': c, 'ratio': round(x, 3)}
+                                for n, s, b, c, x in diffs]
+        for n, s, b, c, x in diffs:
+            flag = "  <-- 变慢" if x > REGRESSION_RATIO else ""
+            print(f"[对比] {n:>8} 行 {s:9s} {b:9.3f}s -> {c:9.3f}s  x{x:.2f}{flag}", file=sys.stderr)
+    text = json.dumps(report, ensure_ascii=False, indent=1)
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            f.write(text)
+    else:
+        print(text)
@@ -0,0 +1,135 @@
+"""
+倒排索引 top-k 检索基准：
+    1. 在真实数据（不限词表）和合成的大语料上，校验 MaxScore 检索与暴力打分的行号、分数完全一致
+       （含预算过滤、同分和不足 k 条补位的情况；不一致时退出码为 1）
+    2. 对比两者的单次查询耗时，以及检索实际读取的倒排项数
+
+    python bench/bench_topk.py [--docs 200000] [--terms 50000] [--queries 300] [--k 10] [--json]
+"""
+import argparse
+import json
+import os
+import sys
+import time
+
+import numpy as np
+from scipy import sparse
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(BASE_DIR, "src"))
+from travel_index import TravelIndex, fit_index, load_travel_csv  # noqa: E402
+
+
+def synthetic_index(n_docs, n_terms, doc_len=12, seed=0):
+    """
+    按 Zipf 分布抽词构造 L2 归一化的 TF-IDF 矩阵和随机数值字段，只包含检索/重排需要的部分
+    """
+    rng = np.random.default_rng(seed)
+    ranks = np.arange(1, n_terms + 1)
+    p = 1.0 / ranks
+    p /= p.sum()
+    cols = rng.choice(n_terms, size=(n_docs, doc_len), p=p)
+    rows = np.repeat(np.arange(n_docs), doc_len)
+    X = sparse.csr_matrix((np.ones(rows.size), (rows, cols.ravel())), shape=(n_docs, n_terms))
+    df = np.bincount(X.indices, minlength=n_terms)
+    idf = np.log((1 + n_docs) / (1 + df)) + 1
+    X = X.multiply(idf).tocsr()
+    norms = np.sqrt(np.asarray(X.multiply(X).sum(axis=1)).ravel())
+    X = sparse.diags(1 / np.where(norms > 0, norms, 1)) @ X
+    X = X.tocsr()
+    X.sort_indices()
+    numeric = {
+        'fee': rng.integers(0, 10000, n_docs).astype(np.float64),
+        'views': np.floor(rng.pareto(1.5, n_docs) * 1000),
+        'likes': np.floor(rng.pareto(1.5, n_docs) * 10),
+        'comments': np.floor(rng.pareto(1.5, n_docs) * 3),
+        'date': rng.integers(16000, 20000, n_docs).astype(np.float64),
+        'days': rng.integers(1, 16, n_docs).astype(np.float64),
+    }
+    meta = {'latest_date': float(numeric['date'].max())}
+    return TravelIndex({}, idf, X, {}, numeric, [], None, None, meta), p
+
+
+def query_vectors(index, term_p, n_queries, seed=1):
+    """
+    随机查询：1~4 个词，按词频分布抽取（常见词多、罕见词少），权重为 IDF 后 L2 归一化
+    """
+    rng = np.random.default_rng(seed)
+    n_terms = len(index.idf)
+    queries = []
+    for _ in range(n_queries):
+        terms = np.unique(rng.choice(n_terms, size=rng.integers(1, 5), p=term_p))
+        vals = index.idf[terms] / np.linalg.norm(index.idf[terms])
+        queries.append(sparse.csr_matrix((vals, terms, [0, len(terms)]), shape=(1, n_terms)))
+    return queries
+
+
+def compare(index, queries, k, masks):
+    """
+    返回 (不一致列表, 统计)；统计含两种方式的平均耗时和平均读取倒排项数
+    """
+    # 强制走倒排检索（默认小语料直接暴力打分）
+    index.exhaustive_max_docs = 0
+    diffs = []
+    brute_t = engine_t = 0.0
+    touched = []
+    for mask in masks:
+        for qi, q in enumerate(queries):
+            t0 = time.perf_counter()
+            b_idx, b_scores = index.search_exhaustive(q, k, mask)
+            t1 = time.perf_counter()
+            stats = {}
+            e_idx, e_scores = index.search(q, k, mask=mask, stats=stats)
+            t2 = time.perf_counter()
+            brute_t += t1 - t0
+            engine_t += t2 - t1
+            touched.append(stats.get('postings_touched', 0))
+            if not (np.array_equal(b_idx, e_idx) and np.array_equal(b_scores, e_scores)):
+                diffs.append((qi, mask is not None, b_idx.tolist(), e_idx.tolist()))
+    n = len(queries) * len(masks)
+    return diffs, {
+        'brute_ms': round(brute_t / n * 1000, 3),
+        'engine_ms': round(engine_t / n * 1000, 3),
+        'avg_postings_touched': round(float(np.mean(touched)), 1),
+        'nnz': int(index.X.nnz),
+    }
+
+
+def real_queries(index):
+    terms = ['美食', '古镇 摄影', '亲子 海边', '自驾 草原 露营', '三亚', '独自一人 徒步', '不存在的词']
+    return [index.transform([t]) for t in terms] + [index.transform([w]) for w in list(index.vocabulary)[:200]]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="倒排索引 top-k 检索基准")
+    parser.add_argument("--csv", default=os.path.join(BASE_DIR, "data", "featured_travel.csv"))
+    parser.add_argument("--docs", type=int, default=200000)
+    parser.add_argument("--terms", type=int, default=50000)
+    parser.add_argument("--queries", type=int, default=300)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--json", action="store_true")
+    args = parser.parse_args()
+
+    report, failed = {}, False
+    real = fit_index(load_travel_csv(args.csv), max_features=None)
+    masks = [None, real.budget_mask(2000)]
+    diffs, report['real'] = compare(real, real_queries(real), args.k, masks)
+    report['real']['docs'], report['real']['terms'] = len(real), len(real.idf)
+    failed |= bool(diffs)
+
+    synth, term_p = synthetic_index(args.docs, args.terms)
+    masks = [None, synth.budget_mask(3000)]
+    diffs_s, report['synthetic'] = compare(synth, query_vectors(synth, term_p, args.queries), args.k, masks)
+    report['synthetic']['docs'], report['synthetic']['terms'] = args.docs, args.terms
+    failed |= bool(diffs_s)
+
+    if args.json:
+        print(json.dumps({**report, 'parity': not failed}, ensure_ascii=False))
+    else:
+        for name, r in report.items():
+            print(f"{name:10s} {r['docs']:>8d} 篇 {r['terms']:>6d} 词  暴力 {r['brute_ms']:8.3f} ms  "
+                  f"倒排 {r['engine_ms']:8.3f} ms  平均读取倒排项 {r['avg_postings_touched']:.0f} / {r['nnz']}")
+        for d in (diffs + diffs_s)[:5]:
+            print("不一致：", d)
+        print("结果一致" if not failed else "结果不一致")
+    sys.exit(1 if failed else 0)
@@ -0,0 +1,153 @@
+"""
+多进程服务压测：启动 src/serve.py（默认关闭响应缓存，测的是检索本身），在若干并发度下
+向 /api/recommend 发请求，报告 p50/p99 延迟、吞吐，以及每个工作进程的内存：
+RSS、其中文件映射部分（索引的内存映射，各进程共享同一份页缓存）、私有匿名内存和 PSS（共享部分按进程数均摊）。
+进程内存读取 /proc，仅 Linux。
+
+    python bench/load_test.py [--workers 4] [--concurrency 1,4,16,32] [--requests 400] [--data ...] [--json]
+"""
+import argparse
+import json
+import os
+import random
+import subprocess
+import sys
+import time
+import urllib.parse
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SERVE = os.path.join(BASE_DIR, "src", "serve.py")
+
+INTERESTS = ['美食', '古镇 摄影', '海边 沙滩', '自驾 草原', '徒步', '温泉', '博物馆', '夜景 美食', '亲子 乐园', '']
+CITIES = ['', '', '三亚', '厦门', '北京', '成都', '丽江']
+PEOPLE = ['', '', '情侣', '家庭', '朋友', '独自一人']
+
+
+def random_query(rng):
+    params = {'interests': rng.choice(INTERESTS), 'city': rng.choice(CITIES), 'people': rng.choice(PEOPLE),
+              'top_n': rng.choice([5, 10])}
+    if rng.random() < 0.3:
+        params['budget'] = rng.choice([1000, 3000, 8000])
+    return urllib.parse.urlencode(params)
+
+
+def get(url, timeout=30):
+    with urllib.request.urlopen(url, timeout=timeout) as resp:
+        return resp.status, resp.read()
+
+
+def wait_ready(base, proc, timeout=300):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if proc.poll() is not None:
+            raise RuntimeError(f"服务进程已退出，返回码 {proc.returncode}")
+        try:
+            return json.loads(get(base + "/admin/index", timeout=2)[1])
+        except OSError:
+            time.sleep(0.3)
+    raise TimeoutError("等待服务就绪超时")
+
+
+def child_pids(pid):
+    path = f"/proc/{pid}/task/{pid}/children"
+    with open(path) as f:
+        return [int(p) for p in f.read().split()]
+
+
+def memory_kb(pid):
+    """
+    返回 {rss, rss_file, rss_anon, pss}（KB）
+    """
+    result = {}
+    with open(f"/proc/{pid}/status") as f:
+        for line in f:
+            key, _, value = line.partition(':')
+            if key in ('VmRSS', 'RssFile', 'RssAnon'):
+                result[{'VmRSS': 'rss', 'RssFile': 'rss_file', 'RssAnon': 'rss_anon'}[key]] = int(value.split()[0])
+    try:
+        with open(f"/proc/{pid}/smaps_rollup") as f:
+            for line in f:
+                if line.startswith('Pss:'):
+                    result['pss'] = int(line.split()[1])
+    except OSError:
+        pass
+    return result
+
+
+def run_level(base, concurrency, n_requests, seed=0):
+    rng = random.Random(seed)
+    urls = [f"{base}/api/recommend?{random_query(rng)}" for _ in range(n_requests)]
+
+    def one(url):
+        t0 = time.perf_counter()
+        status, _ = get(url)
+        return time.perf_counter() - t0, status
+
+    t0 = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        results = list(pool.map(one, urls))
+    wall = time.perf_counter() - t0
+    lat = np.array([r[0] for r in results]) * 1000
+    errors = sum(1 for r in results if r[1] != 200)
+    return {
+        'concurrency': concurrency,
+        'requests': n_requests,
+        'errors': errors,
+        'p50_ms': round(float(np.percentile(lat, 50)), 2),
+        'p99_ms': round(float(np.percentile(lat, 99)), 2),
+        'mean_ms': round(float(lat.mean()), 2),
+        'rps': round(n_requests / wall, 1),
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="多进程推荐服务压测")
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--concurrency", default="1,4,16,32")
+    parser.add_argument("--requests", type=int, default=400, help="每个并发度的请求数")
+    parser.add_argument("--port", type=int, default=5055)
+    parser.add_argument("--data", default=None, help="数据文件，默认与 web_api 相同")
+    parser.add_argument("--cache", action="store_true", help="保留响应缓存（默认关闭）")
+    parser.add_argument("--json", action="store_true")
+    args = parser.parse_args()
+
+    env = dict(os.environ)
+    if not args.cache:
+        env["RECOMMEND_CACHE_SIZE"] = "0"
+    cmd = [sys.executable, SERVE, "--workers", str(args.workers), "--host", "127.0.0.1",
+           "--port", str(args.port), "--watch", "0"]
+    if args.data:
+        cmd += ["--data", os.path.abspath(args.data)]
+    proc = subprocess.Popen(cmd, cwd=os.path.dirname(SERVE), env=env,
+                            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    base = f"http://127.0.0.1:{args.port}"
+    try:
+        info = wait_ready(base, proc)
+        # 每个工作进程都要就绪（fork 后各自挂载索引），先预热一轮
+        run_level(base, args.workers * 2, args.workers * 20, seed=99)
+        levels = [run_level(base, int(c), args.requests, seed=i)
+                  for i, c in enumerate(args.concurrency.split(','))]
+        workers = [{'pid': pid, **memory_kb(pid)} for pid in child_pids(proc.pid)]
+        master = memory_kb(proc.pid)
+    finally:
+        proc.terminate()
+        proc.wait(timeout=30)
+
+    report = {'docs': info['docs'], 'version': info['version'], 'workers': len(workers),
+              'levels': levels, 'worker_memory_kb': workers, 'master_memory_kb': master}
+    if args.json:
+        print(json.dumps(report, ensure_ascii=False))
+    else:
+        print(f"索引 {info['version']}，{info['docs']} 篇，{len(workers)} 个工作进程")
+        print(f"{'并发':>6} {'请求':>6} {'错误':>4} {'p50 ms':>9} {'p99 ms':>9} {'平均 ms':>9} {'请求/秒':>9}")
+        for r in levels:
+            print(f"{r['concurrency']:>6} {r['requests']:>6} {r['errors']:>4} {r['p50_ms']:>9} "
+                  f"{r['p99_ms']:>9} {r['mean_ms']:>9} {r['rps']:>9}")
+        print(f"{'进程':>8} {'RSS MB':>9} {'文件映射 MB':>11} {'匿名 MB':>9} {'PSS MB':>9}")
+        for w in workers:
+            print(f"{w['pid']:>8} {w.get('rss', 0) / 1024:>9.1f} {w.get('rss_file', 0) / 1024:>11.1f} "
+                  f"{w.get('rss_anon', 0) / 1024:>9.1f} {w.get('pss', 0) / 1024:>9.1f}")
@@ -0,0 +1,139 @@
+"""
+合成游记数据：字段与爬虫原始输出一致（标题, 链接, 作者, 出发时间, 天数, 费用, 人物, 主题, 浏览, 点赞, 评论, 目的地, 行程），
+取值分布按真实数据（data/qunar_travel.csv）估计：人物/主题词/城市/景点按真实出现频率抽样，
+目的地为若干城市用“>”连接，行程为若干景点用“>”连接；标题由城市、天数、主题词、景点拼成，各行文本不重复。
+也按真实数据的比例留出缺失值和会被清洗掉的行（标题含“攻略”、天数超过 15、出发时间为空）。
+
+    python bench/synthetic_data.py --rows 100000 --out /tmp/synthetic_travel.csv
+"""
+import argparse
+import os
+from collections import Counter
+
+import numpy as np
+import pandas as pd
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+REAL_CSV = os.path.join(BASE_DIR, "data", "qunar_travel.csv")
+
+COLUMNS = ['标题', '链接', '作者', '出发时间', '天数', '费用', '人物', '主题', '浏览', '点赞', '评论', '目的地', '行程']
+TITLE_WORDS = ['之旅', '慢时光', '打卡', '游记', '周末', '深度游', '漫游', '寻味', '逛吃', '小众', '治愈', '记录']
+DAY_WORDS = ['一', '两', '三', '四', '五', '六', '七', '八', '九', '十']
+
+
+def _pool(values, sep):
+    """
+    真实数据某一列拆分后的取值池：(取值数组, 抽样概率)
+    """
+    counts = Counter(v.strip().rstrip('.') for text in values.dropna().astype(str)
+                     for v in text.split(sep) if v.strip().rstrip('.'))
+    items, freq = zip(*counts.most_common())
+    p = np.array(freq, dtype=np.float64)
+    return np.array(items, dtype=object), p / p.sum()
+
+
+def _lengths(values, sep):
+    n = values.dropna().astype(str).map(lambda t: len([v for v in t.split(sep) if v.strip()]))
+    counts = n.value_counts()
+    return counts.index.to_numpy(), (counts / counts.sum()).to_numpy()
+
+
+def real_profile(csv_path=REAL_CSV):
+    df = pd.read_csv(csv_path, encoding='utf-8-sig')
+    return {
+        'people': _pool(df['人物'], '\0'),
+        'theme': _pool(df['主题'][df['主题'] != '无'], ' '),
+        'theme_len': _lengths(df['主题'][df['主题'] != '无'], ' '),
+        'city': _pool(df['目的地'], '>'),
+        'city_len': _lengths(df['目的地'], '>'),
+        'poi': _pool(df['行程'], '>'),
+        'poi_len': _lengths(df['行程'], '>'),
+        'fee': pd.to_numeric(df['费用'], errors='coerce').dropna().to_numpy(),
+        'missing': df.isna().mean().to_dict(),
+    }
+
+
+def _join(rng, pool, lengths, n, sep):
+    items, p = pool
+    k = rng.choice(lengths[0], size=n, p=lengths[1])
+    flat = rng.choice(items, size=int(k.sum()), p=p)
+    ends = np.cumsum(k)
+    return [sep.join(dict.fromkeys(flat[e - m:e])) for e, m in zip(ends, k)]
+
+
+def _counter_text(values):
+    """
+    列表页上的计数写法：一万以上写成“x.x万”
+    """
+    return np.where(values >= 10000, np.char.add(np.round(values / 10000, 1).astype(str), '万'),
+                    values.astype(str)).astype(object)
+
+
+def generate(n_rows, seed=0, csv_path=REAL_CSV):
+    """
+    生成 n_rows 行原始格式的游记 DataFrame
+    """
+    rng = np.random.default_rng(seed)
+    prof = real_profile(csv_path)
+    n = n_rows
+    people = rng.choice(prof['people'][0], size=n, p=prof['people'][1]).astype(object)
+    theme = np.array(_join(rng, prof['theme'], prof['theme_len'], n, ' '), dtype=object)
+    city = np.array(_join(rng, prof['city'], prof['city_len'], n, '>'), dtype=object)
+    trip = np.array(_join(rng, prof['poi'], prof['poi_len'], n, '>'), dtype=object)
+    days = np.clip(rng.geometric(0.2, size=n), 1, 15)
+    # 少量超过 15 天的行，清洗时会被去掉
+    long_trip = rng.random(n) < 0.02
+    days[long_trip] = rng.integers(16, 60, size=int(long_trip.sum()))
+    fee = rng.choice(prof['fee'], size=n) if len(prof['fee']) else rng.integers(100, 10000, size=n)
+    start = np.datetime64('2015-01-01')
+    dates = (start + rng.integers(0, 3800, size=n).astype('timedelta64[D]')).astype(str).astype(object)
+    first_city = [c.split('>')[0] for c in city]
+    first_poi = [t.split('>')[0] for t in trip]
+    title_word = rng.choice(TITLE_WORDS, size=n)
+    theme_word = [t.split(' ')[0] for t in theme]
+    titles = [f"{c}{DAY_WORDS[min(d, 10) - 1]}日{tw}｜{poi}{w}" for c, d, tw, poi, w
+              in zip(first_city, days, theme_word, first_poi, title_word)]
+    ids = rng.permutation(n) + 10_000_000
+    views = np.floor(rng.pareto(1.2, size=n) * 2000).astype(np.int64)
+    df = pd.DataFrame({
+        '标题': titles,
+        '链接': [f"https://travel.qunar.com/youji/{i}" for i in ids],
+        '作者': [f"用户{i % 997331}" for i in ids],
+        '出发时间': dates,
+        '天数': days,
+        '费用': fee,
+        '人物': people,
+        '主题': theme,
+        '浏览': _counter_text(views),
+        '点赞': np.floor(rng.pareto(1.5, size=n) * 20).astype(np.int64),
+        '评论': np.floor(rng.pareto(1.5, size=n) * 5).astype(np.int64),
+        '目的地': city,
+        '行程': trip,
+    }, columns=COLUMNS)
+    # 缺失值比例与真实数据一致（计数列真实数据里全空，这里按 10% 留空）
+    for col in ['费用', '人物', '主题', '目的地', '行程']:
+        rate = prof['missing'].get(col, 0.0)
+        df.loc[rng.random(n) < rate, col] = None
+    for col in ['浏览', '点赞', '评论']:
+        df[col] = df[col].astype(object)
+        df.loc[rng.random(n) < 0.1, col] = None
+    df.loc[rng.random(n) < 0.02, '标题'] = df['标题'] + '（攻略）'
+    df.loc[rng.random(n) < 0.005, '出发时间'] = None
+    return df
+
+
+def write_synthetic(n_rows, out_path, seed=0):
+    df = generate(n_rows, seed)
+    os.makedirs(os.path.dirname(os.path.abspath(out_path)), exist_ok=True)
+    df.to_csv(out_path, index=False, encoding='utf-8-sig')
+    return out_path
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="生成合成游记数据")
+    parser.add_argument("--rows", type=int, default=10000)
+    parser.add_argument("--out", default="synthetic_travel.csv")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    write_synthetic(args.rows, args.out, args.seed)
+    print(f"已生成 {args.rows} 行 -> {args.out}")
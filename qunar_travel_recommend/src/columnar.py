@@ -0,0 +1,158 @@
+"""
+游记数据集的列式存储（Arrow IPC / Feather v2 文件，不压缩，可内存映射）：
+    - 人物/主题/目的地：字典编码的分类列
+    - 出发时间：date32 日期
+    - 旅行时长/天数、旅行月份：int16；浏览/点赞/评论/浏览次数：int32（均可为空）
+    - 费用：float64；其余文本列：string
+
+写入支持分块追加（字典增量写入），读取时内存映射并只取需要的列。
+依赖 pyarrow；未安装时 load_dataset 自动退回读 CSV。
+"""
+import os
+
+import numpy as np
+import pandas as pd
+
+try:
+    import pyarrow as pa
+    import pyarrow.feather as feather
+    import pyarrow.ipc as ipc
+except ImportError:
+    pa = None
+
+from feature_pipeline import parse_view_counts, CHUNK_SIZE
+
+CATEGORY_FIELDS = ['人物', '主题', '目的地']
+DATE_FIELDS = ['出发时间', '出发日期']
+SMALL_INT_FIELDS = ['旅行时长', '天数', '旅行月份']
+COUNTER_FIELDS = ['浏览', '点赞', '评论', '浏览次数']
+FLOAT_FIELDS = ['费用', '人均费用']
+
+
+def has_arrow():
+    return pa is not None
+
+
+def columnar_path(csv_path):
+    return os.path.splitext(csv_path)[0] + '.arrow'
+
+
+def _field_type(name):
+    if name in CATEGORY_FIELDS:
+        return pa.dictionary(pa.int32(), pa.string())
+    if name in DATE_FIELDS:
+        return pa.date32()
+    if name in SMALL_INT_FIELDS:
+        return pa.int16()
+    if name in COUNTER_FIELDS:
+        return pa.int32()
+    if name in FLOAT_FIELDS:
+        return pa.float64()
+    return pa.string()
+
+
+class ColumnarWriter:
+    """
+    分块写列式文件。分类列维护一份全局字典，新出现的取值追加到字典末尾，以字典增量的形式写入
+    """
+
+    def __init__(self, path):
+        if pa is None:
+            raise ImportError("写列式文件需要 pyarrow：pip install pyarrow")
+        self.path = path
+        self.tmp_path = path + '.tmp'
+        self.writer = None
+        self.schema = None
+        self.dictionaries = {}
+        self.rows = 0
+
+    def _init_schema(self, columns):
+        self.schema = pa.schema([(c, _field_type(c)) for c in columns])
+        self.dictionaries = {c: {} for c in columns if c in CATEGORY_FIELDS}
+        options = ipc.IpcWriteOptions(emit_dictionary_deltas=True)
+        self.writer = ipc.new_file(self.tmp_path, self.schema, options=options)
+
+    def _array(self, name, values):
+        typ = self.schema.field(name).type
+        if name in self.dictionaries:
+            codes_of = self.dictionaries[name]
+            text = values.astype(object).where(values.notna(), None)
+            for v in pd.unique(text.dropna()):
+                codes_of.setdefault(str(v), len(codes_of))
+            codes = np.array([-1 if v is None else codes_of[str(v)] for v in text], dtype=np.int32)
+            return pa.DictionaryArray.from_arrays(
+                pa.array(codes, mask=codes < 0), pa.array(list(codes_of), type=pa.string()))
+        if typ == pa.date32():
+            dates = pd.to_datetime(values, format='%Y-%m-%d', errors='coerce')
+            return pa.array(dates.dt.date.where(dates.notna(), None), type=typ)
+        if typ in (pa.int16(), pa.int32()):
+            if name in COUNTER_FIELDS:
+                # 计数可能是“3.4万”这样的文本，与浏览次数用同一套解析
+                nums = parse_view_counts(values).astype('Int64').where(values.notna(), pd.NA)
+            else:
+                nums = pd.to_numeric(values, errors='coerce').round().astype('Int64')
+            return pa.array(nums, type=typ, from_pandas=True)
+        if typ == pa.float64():
+            return pa.array(pd.to_numeric(values, errors='coerce'), type=typ, from_pandas=True)
+        return pa.array(values.astype(object).where(values.notna(), None).map(
+            lambda v: v if v is None else str(v)), type=pa.string())
+
+    def write(self, df):
+        if self.writer is None:
+            self._init_schema(list(df.columns))
+        arrays = [self._array(name, df[name]) for name in self.schema.names]
+        self.writer.write_batch(pa.record_batch(arrays, schema=self.schema))
+        self.rows += len(df)
+
+    def close(self):
+        if self.writer is not None:
+            self.writer.close()
+            os.replace(self.tmp_path, self.path)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.close()
+        elif self.writer is not None:
+            self.writer.close()
+            os.remove(self.tmp_path)
+
+
+def write_columnar(csv_path, path=None, chunksize=CHUNK_SIZE):
+    """
+    把已有的 CSV 分块转换成列式文件，返回输出路径
+    """
+    path = path or columnar_path(csv_path)
+    with ColumnarWriter(path) as writer:
+        for chunk in pd.read_csv(csv_path, encoding='utf-8-sig', chunksize=chunksize, dtype=str):
+            writer.write(chunk)
+    print(f"[列式存储] {csv_path} -> {path}，{writer.rows} 行")
+    return path
+
+
+def read_columnar(path, columns=None):
+    """
+    内存映射读取列式文件，只解码 columns 指定的列（不存在的列忽略）
+    """
+    if columns is not None:
+        names = ipc.open_file(pa.memory_map(path)).schema.names
+        columns = [c for c in columns if c in names]
+    table = feather.read_table(path, columns=columns, memory_map=True)
+    return table.to_pandas(date_as_object=False)
+
+
+def load_dataset(csv_path, columns=None):
+    """
+    读取游记数据集：同名 .arrow 文件存在且不比 CSV 旧时读列式文件，否则读 CSV
+    """
+    arrow_path = columnar_path(csv_path)
+    if (pa is not None and os.path.exists(arrow_path)
+            and os.path.getmtime(arrow_path) >= os.path.getmtime(csv_path)):
+        return read_columnar(arrow_path, columns)
+    from travel_index import load_travel_csv
+    df = load_travel_csv(csv_path)
+    if columns is not None:
+        df = df[[c for c in columns if c in df.columns]]
+    return df
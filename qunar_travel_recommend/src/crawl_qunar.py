@@ -1,127 +1,257 @@
 import requests
-from bs4 import BeautifulSoup
+from requests.adapters import HTTPAdapter
 import pandas as pd
-import time, re
+import time, os, json, random, shutil, threading
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlparse
 
-def parse_num(s):
-    """
-    解析数字，如“3.4万”转成34000
-    """
-    if not s: return None
-    s = s.replace(',','').replace(' ', '')
-    if '万' in s:
-        try:
-            return int(float(s.replace('万', '')) * 10000)
-        except:
-            return 0
-    try:
-        return int(re.sub(r'\D', '', s))
-    except:
-        return 0
+from qunar_extract import get_extractor
+from travel_store import youji_id, known_ids, merge_into_store, new_records
+from travel_stats import refresh_stats
+
+BASE_URL = "https://travel.qunar.com/travelbook/list.htm?page={}&order=hot_heat"
+HEADERS = {
+    "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) "
+                  "AppleWebKit/537.36 (KHTML, like Gecko) "
+                  "Chrome/123.0.0.0 Safari/537.36"
+}
+# 默认限速：每个域名每秒最多 DEFAULT_RATE 次请求，允许攒 DEFAULT_BURST 个令牌的突发。
+# 列表页都在同一个域名下，这就是整次抓取的总预算：4 个线程约 4 次/秒，比原来串行每页 sleep 1 秒快约 4 倍，
+# 同时不至于给对方造成压力；要更保守时用 --rate 调低
+DEFAULT_RATE = 4.0
+DEFAULT_BURST = 4
 
 def crawl_qunar_page(url):
-    headers = {
-        "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) "
-                      "AppleWebKit/537.36 (KHTML, like Gecko) "
-                      "Chrome/123.0.0.0 Safari/537.36"
-    }
-    resp = requests.get(url, headers=headers, timeout=10)
+    resp = requests.get(url, headers=HEADERS, timeout=10)
     resp.encoding = "utf-8"
     if resp.status_code != 200:
         print("请求失败", url)
         return []
-    soup = BeautifulSoup(resp.text, "html.parser")
-    result = []
-    ul = soup.find("ul", class_="b_strategy_list")
-    if not ul:
-        print("未找到攻略列表")
-        return []
-    for li in ul.find_all("li", class_="list_item"):
-        # 标题
-        title_tag = li.find("h2", class_="tit")
-        title = title_tag.a.get_text(strip=True) if title_tag and title_tag.a else ""
-        link = title_tag.a['href'] if title_tag and title_tag.a and title_tag.a.has_attr('href') else ""
-        if link and not link.startswith("http"):
-            link = "https://travel.qunar.com" + link
-        # 作者
-        author_a = li.find("span", class_="user_name")
-        author = author_a.get_text(strip=True) if author_a else ""
-        # 出发时间、天数、费用、人物、主题（玩法）
-        intro = li.find("span", class_="intro")
-        date, days, fee, people, trip = "", "", "", "", ""
-        if intro:
-            intro_text = intro.text.replace('\xa0', ' ')
-            # 出发时间
-            date_match = re.search(r"(\d{4}-\d{2}-\d{2}) 出发", intro_text)
-            date = date_match.group(1) if date_match else ""
-            # 天数
-            days_match = re.search(r"共(\d+)天", intro_text)
-            days = days_match.group(1) if days_match else ""
-            # 费用
-            fee_match = re.search(r"人均(\d+)元", intro_text)
-            fee = fee_match.group(1) if fee_match else ""
-            # 人物
-            people_match = re.search(r"(独自一人|三五好友|亲子|家庭|情侣|闺蜜|学生)", intro_text)
-            people = people_match.group(1) if people_match else ""
-            # 主题
-            trip_find = intro.find("span", class_="trip")
-            if trip_find:
-                trip = trip_find.get_text(strip=True).replace('\xa0', ' ').replace(' ', ' ')
-        # 浏览数
-        num_view = li.find("span", class_="icon_view")
-        view = parse_num(num_view.find_all("span")[1].text if num_view and len(num_view.find_all("span"))>1 else "") if num_view else 0
-        # 点赞
-        num_love = li.find("span", class_="icon_love")
-        like = parse_num(num_love.find_all("span")[1].text if num_love and len(num_love.find_all("span"))>1 else "") if num_love else 0
-        # 评论
-        num_comment = li.find("span", class_="icon_comment")
-        comment = parse_num(num_comment.find_all("span")[1].text if num_comment and len(num_comment.find_all("span"))>1 else "") if num_comment else 0
-        # 途经城市（目的地）
-        p_places = li.find_all("p", class_="places")
-        dest = ""
-        if p_places:
-            for p in p_places:
-                if "途经" in p.get_text():
-                    dest = p.get_text(strip=True).replace('途经：','')
-                    break
-        # 行程
-        itinerary = ""
-        if p_places:
-            for p in p_places:
-                if "行程" in p.get_text():
-                    itinerary = p.get_text(strip=True).replace('行程：','')
-                    break
-        result.append({
-            "标题": title,
-            "链接": link,
-            "作者": author,
-            "出发时间": date,
-            "天数": days,
-            "费用": fee,
-            "人物": people,
-            "主题": trip,
-            "浏览": view,
-            "点赞": like,
-            "评论": comment,
-            "目的地": dest,
-            "行程": itinerary,
-        })
-    return result
-
-def crawl_qunar_travelbooks(max_pages=200, sleep_sec=1):
-    base_url = "https://travel.qunar.com/travelbook/list.htm?page={}&order=hot_heat"
-    all_data = []
+    return parse_qunar_page(resp.text)
+
+def parse_qunar_page(html, backend="fast"):
+    """
+    解析一页游记列表HTML，返回记录列表；backend 可选 "fast"（默认）或 "bs4"，输出完全一致
+    """
+    return get_extractor(backend)(html)
+
+class TokenBucket:
+    """
+    令牌桶限速：每秒补充 rate 个令牌，最多积攒 capacity 个，acquire 拿不到令牌时阻塞等待
+    """
+    def __init__(self, rate, capacity=1):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) / self.rate
+            time.sleep(wait)
+
+class HostRateLimiter:
+    """
+    按域名分别限速
+    """
+    def __init__(self, rate, capacity=1):
+        self.rate = rate
+        self.capacity = capacity
+        self.buckets = {}
+        self.lock = threading.Lock()
+
+    def acquire(self, url):
+        host = urlparse(url).netloc
+        with self.lock:
+            bucket = self.buckets.get(host)
+            if bucket is None:
+                bucket = self.buckets[host] = TokenBucket(self.rate, self.capacity)
+        bucket.acquire()
+
+def make_session(pool_size=8):
+    """
+    带连接池的长连接会话，多个线程共用
+    """
+    session = requests.Session()
+    session.headers.update(HEADERS)
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+def fetch_page(session, url, limiter=None, retries=3, backoff=1.0, timeout=10):
+    """
+    抓取一页HTML；网络异常、429 和 5xx 按指数退避重试，最终失败返回 None
+    """
+    for attempt in range(retries + 1):
+        if limiter is not None:
+            limiter.acquire(url)
+        try:
+            resp = session.get(url, timeout=timeout)
+            if resp.status_code == 200:
+                resp.encoding = "utf-8"
+                return resp.text
+            if resp.status_code != 429 and resp.status_code < 500:
+                print("请求失败", resp.status_code, url)
+                return None
+            print(f"请求失败 {resp.status_code}，第{attempt + 1}次: {url}")
+        except requests.RequestException as e:
+            print(f"请求异常 {e}，第{attempt + 1}次: {url}")
+        if attempt < retries:
+            time.sleep(backoff * (2 ** attempt) * (1 + random.random() * 0.5))
+    return None
+
+def _checkpoint_path(checkpoint_dir, page):
+    return os.path.join(checkpoint_dir, f"page_{page:04d}.json")
+
+def load_checkpoint(checkpoint_dir, page):
+    path = _checkpoint_path(checkpoint_dir, page)
+    if not os.path.exists(path):
+        return None
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+def default_rate(rate=None, sleep_sec=None):
+    """
+    显式给出 rate 时用 rate；只给 sleep_sec 时按每 sleep_sec 秒 1 次；都没给时用 DEFAULT_RATE
+    """
+    if rate:
+        return rate
+    if sleep_sec:
+        return 1.0 / sleep_sec
+    return DEFAULT_RATE
+
+def save_checkpoint(checkpoint_dir, page, data):
+    path = _checkpoint_path(checkpoint_dir, page)
+    tmp = path + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(data, f, ensure_ascii=False)
+    os.replace(tmp, path)
+
+def crawl_qunar_travelbooks(max_pages=200, sleep_sec=None, workers=4, rate=None, retries=3,
+                            checkpoint_dir=None, base_url=BASE_URL, backend="fast", resume=False):
+    """
+    并发抓取游记列表页：线程池 + 共享长连接会话 + 按域名令牌桶限速（默认每秒 DEFAULT_RATE 次）+ 失败重试。
+    给出 checkpoint_dir 时每抓完一页就落盘；断点只用于续抓中断的那次运行：resume=True 时跳过已落盘的页，
+    否则先清空旧断点重新抓。全部页面抓取成功后删除断点目录。
+    """
+    limiter = HostRateLimiter(default_rate(rate, sleep_sec), DEFAULT_BURST)
+    session = make_session(pool_size=workers)
+    if checkpoint_dir:
+        if not resume and os.path.isdir(checkpoint_dir):
+            shutil.rmtree(checkpoint_dir)
+        os.makedirs(checkpoint_dir, exist_ok=True)
+    pages = {}
+    todo = []
     for page in range(1, max_pages+1):
+        data = load_checkpoint(checkpoint_dir, page) if checkpoint_dir else None
+        if data is not None:
+            pages[page] = data
+        else:
+            todo.append(page)
+    if pages:
+        print(f"从断点恢复{len(pages)}页，剩余{len(todo)}页")
+
+    def crawl_one(page):
         url = base_url.format(page)
-        print(f"抓取第{page}页: {url}")
-        data = crawl_qunar_page(url)
-        print(f"本页抓到{len(data)}条")
-        all_data.extend(data)
-        time.sleep(sleep_sec)
+        html = fetch_page(session, url, limiter, retries=retries)
+        if html is None:
+            return page, None
+        data = parse_qunar_page(html, backend)
+        # 空页可能是被拦截的验证页，不落盘，下次续抓时重试
+        if checkpoint_dir and data:
+            save_checkpoint(checkpoint_dir, page, data)
+        print(f"抓取第{page}页: {url}，本页抓到{len(data)}条")
+        return page, data
+
+    failed = []
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        for page, data in pool.map(crawl_one, todo):
+            if data is None:
+                failed.append(page)
+            else:
+                pages[page] = data
+    session.close()
+    if failed:
+        print(f"以下页面抓取失败，可加 --resume 重新运行续抓: {failed}")
+    elif checkpoint_dir:
+        shutil.rmtree(checkpoint_dir, ignore_errors=True)
+    all_data = []
+    for page in sorted(pages):
+        all_data.extend(pages[page])
     return pd.DataFrame(all_data)
 
+def crawl_incremental(store_csv, max_pages=200, lookahead=1, sleep_sec=None, workers=1, rate=None,
+                      retries=3, base_url=BASE_URL, backend="fast"):
+    """
+    增量抓取：列表按 hot_heat 排序，从第 1 页往后翻，遇到一页全部是已知游记后再多看 lookahead 页，
+    这几页也没有新游记就停止。新游记追加进 store_csv，已知游记只更新浏览/点赞/评论。
+    workers>1 时每次并发抓 workers 页，按页序处理。返回 (新增条数, 更新条数, 请求页数)
+    """
+    limiter = HostRateLimiter(default_rate(rate, sleep_sec), DEFAULT_BURST)
+    session = make_session(pool_size=workers)
+    known = known_ids(store_csv)
+    print(f"已知游记 {len(known)} 条")
+    records, fetched, quiet = [], 0, 0
+
+    def crawl_one(page):
+        html = fetch_page(session, base_url.format(page), limiter, retries=retries)
+        return None if html is None else parse_qunar_page(html, backend)
+
+    page = 1
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        while page <= max_pages and quiet <= lookahead:
+            batch = list(range(page, min(page + workers, max_pages + 1)))
+            fetched += len(batch)
+            for p, data in zip(batch, pool.map(crawl_one, batch)):
+                if not data:
+                    # 抓取失败或空页，视为列表已到尽头
+                    print(f"第{p}页无数据，停止")
+                    quiet = lookahead + 1
+                    break
+                records.extend(data)
+                new_ids = {youji_id(r["链接"]) for r in data} - known
+                quiet = 0 if new_ids else quiet + 1
+                print(f"第{p}页: {len(data)}条，其中新游记{len(new_ids)}条")
+                if quiet > lookahead:
+                    break
+            page += len(batch)
+    session.close()
+    if os.path.exists(store_csv):
+        # 先让统计聚合表追上合并前的文件，合并后只需累加新追加的游记
+        refresh_stats(store_csv)
+    added, updated = merge_into_store(store_csv, records)
+    print(f"增量抓取完成：请求{fetched}页，新增{added}条，更新计数{updated}条 -> {store_csv}")
+    if added or updated:
+        # 更新计数会整体重写文件，但统计不用计数字段：直接累加新追加的行，不重读文件
+        refresh_stats(store_csv, appended=new_records(records, known))
+    return added, updated, fetched
+
 if __name__ == "__main__":
-    df = crawl_qunar_travelbooks(max_pages=200)
-    print("共抓取", len(df), "条数据")
-    df.to_csv("qunar_travel.csv", index=False, encoding="utf-8-sig")
-    print("已保存为qunar_travel.csv")
\ No newline at end of file
+    import argparse
+    parser = argparse.ArgumentParser(description="去哪儿游记列表爬虫")
+    parser.add_argument("--incremental", action="store_true", help="增量抓取并合并进已有存储")
+    parser.add_argument("--store", default="../data/qunar_travel.csv")
+    parser.add_argument("--max-pages", type=int, default=200)
+    parser.add_argument("--lookahead", type=int, default=1)
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--rate", type=float, default=DEFAULT_RATE, help="每个域名每秒最多请求次数")
+    parser.add_argument("--resume", action="store_true", help="从 crawl_checkpoint/ 续抓上次中断的运行")
+    args = parser.parse_args()
+    if args.incremental:
+        crawl_incremental(args.store, max_pages=args.max_pages, lookahead=args.lookahead,
+                          workers=args.workers, rate=args.rate)
+    else:
+        df = crawl_qunar_travelbooks(max_pages=args.max_pages, workers=args.workers, rate=args.rate,
+                                     checkpoint_dir="crawl_checkpoint", resume=args.resume)
+        print("共抓取", len(df), "条数据")
+        df.to_csv("qunar_travel.csv", index=False, encoding="utf-8-sig")
+        print("已保存为qunar_travel.csv")
@@ -1,40 +1,22 @@
 import pandas as pd
+from feature_pipeline import clean_frame
+from near_dup import THRESHOLD, default_report_path, drop_near_duplicates
 
-def clean_data(input_csv, output_csv):
+def clean_data(input_csv, output_csv, dedup=True, threshold=THRESHOLD):
+    """
+    返回 (读入行数, 写出行数)。dedup=True 时去掉近重复游记，簇明细写到 dedup/<输出文件名>.json
+    """
     df = pd.read_csv(input_csv)
-    # 去掉含“攻略”的标题
-    if "标题" in df.columns:
-        df = df[~df["标题"].str.contains("攻略", na=False)]
-    # 天数限制
-    if "天数" in df.columns:
-        df["天数"] = df["天数"].replace("99+", 99)
-        df["天数"] = pd.to_numeric(df["天数"], errors='coerce')
-        df = df[df["天数"] <= 15]
-    # 费用字段清洗
-    for money_col in ["人均费用", "费用"]:
-        if money_col in df.columns:
-            df[money_col] = pd.to_numeric(df[money_col], errors='coerce').fillna(0)
-    # 人数补齐
-    if "人数" in df.columns:
-        df["人数"] = df["人数"].fillna("独自一人")
-    elif "人物" in df.columns:
-        df["人物"] = df["人物"].fillna("独自一人")
-    # 玩法补齐
-    if "玩法" in df.columns:
-        df["玩法"] = df["玩法"].fillna("无")
-    elif "主题" in df.columns:
-        df["主题"] = df["主题"].fillna("无")
-    # 出发日期不能为空
-    date_col = None
-    if "出发日期" in df.columns:
-        date_col = "出发日期"
-    elif "出发时间" in df.columns:
-        date_col = "出发时间"
-    if date_col:
-        df = df.dropna(subset=[date_col])
+    rows_in = len(df)
+    # 去掉含“攻略”的标题、天数限制、费用清洗、人物/主题补齐、出发日期不能为空（向量化实现见 feature_pipeline）
+    df = clean_frame(df)
+    if dedup:
+        # 转载、同一行程换标题重发的游记只留热度最高的一篇（MinHash + LSH，见 near_dup）
+        df = drop_near_duplicates(df, threshold, default_report_path(output_csv))
     df = df.reset_index(drop=True)
     df.to_csv(output_csv, index=False, encoding="utf-8-sig")
     print(f"[数据清洗] 保存到: {output_csv}")
+    return rows_in, len(df)
 
 if __name__ == "__main__":
-    clean_data("../data/qunar_travel.csv", "../data/cleaned_travel.csv")
\ No newline at end of file
+    clean_data("../data/qunar_travel.csv", "../data/cleaned_travel.csv")
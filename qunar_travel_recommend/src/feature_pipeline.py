@@ -0,0 +1,159 @@
+"""
+清洗 + 特征的融合流水线：原始爬取文件按固定大小分块读入，每块依次做清洗和特征计算后
+直接追加写出，只写一次 featured 数据集。
+
+近重复游记去重需要看全量数据，是写出之前单独的一遍流式扫描（near_dup.chunked_near_duplicates）：
+每行只在内存里留下签名各段的桶键和热度（约 140 字节），不保留文本；写出这遍再跳过要去掉的行。
+因此原始文件共读两遍，内存与行数成正比但与行宽无关；dedup=False 时只读一遍。
+
+各步骤都是向量化的字符串/数值运算，data_cleaning.clean_data 和 analysis.add_features 也复用这里的实现。
+
+    python feature_pipeline.py ../data/qunar_travel.csv ../data/featured_travel.csv
+"""
+import sys
+
+import numpy as np
+import pandas as pd
+
+CHUNK_SIZE = 50000
+MAX_DAYS = 15
+
+
+def _compact_int(values):
+    """
+    数值列全为整数时转成可空整数 Int64，写出时不带“.0”
+    """
+    valid = values.dropna()
+    if valid.empty or (valid % 1 == 0).all():
+        return values.astype("Int64")
+    return values
+
+
+def date_column(df):
+    if "出发日期" in df.columns:
+        return "出发日期"
+    if "出发时间" in df.columns:
+        return "出发时间"
+    return None
+
+
+def clean_frame(df):
+    """
+    清洗规则：去掉含“攻略”的标题、天数 <= 15、费用转数值并补 0、人物/主题补默认值、出发日期不能为空
+    """
+    if "标题" in df.columns:
+        df = df[~df["标题"].astype("string").str.contains("攻略", na=False).astype(bool)]
+    if "天数" in df.columns:
+        days = pd.to_numeric(df["天数"].replace("99+", 99), errors="coerce")
+        keep = days <= MAX_DAYS
+        df = df[keep].copy()
+        df["天数"] = _compact_int(days[keep])
+    else:
+        df = df.copy()
+    for money_col in ["人均费用", "费用"]:
+        if money_col in df.columns:
+            df[money_col] = pd.to_numeric(df[money_col], errors="coerce").fillna(0).astype(float)
+    if "人数" in df.columns:
+        df["人数"] = df["人数"].fillna("独自一人")
+    elif "人物" in df.columns:
+        df["人物"] = df["人物"].fillna("独自一人")
+    if "玩法" in df.columns:
+        df["玩法"] = df["玩法"].fillna("无")
+    elif "主题" in df.columns:
+        df["主题"] = df["主题"].fillna("无")
+    date_col = date_column(df)
+    if date_col:
+        df = df.dropna(subset=[date_col])
+    return df
+
+
+def parse_dates(values):
+    """
+    先按 YYYY-MM-DD 快速解析，少数其他格式的再逐个推断
+    """
+    dates = pd.to_datetime(values, format="%Y-%m-%d", errors="coerce")
+    retry = dates.isna() & values.notna()
+    if retry.any():
+        dates[retry] = pd.to_datetime(values[retry], format="mixed", errors="coerce")
+    return dates
+
+
+def parse_view_counts(values):
+    """
+    阅读数/浏览解析：去掉“+”和千分位，“3.4万”转成 34000，无法解析的记 0
+    """
+    s = values.astype("string").str.replace("+", "", regex=False).str.replace(",", "", regex=False)
+    wan = s.str.contains("万", regex=False).fillna(False).astype(bool)
+    num = pd.to_numeric(s.str.replace("万", "", regex=False), errors="coerce").astype(float)
+    num = num.where(~wan, num * 10000)
+    num = num.where(np.isfinite(num), 0)
+    return np.trunc(num).astype("int64")
+
+
+def add_feature_columns(df):
+    """
+    新特征：旅行月份、浏览次数；天数重命名为旅行时长
+    """
+    df = df.copy()
+    date_col = date_column(df)
+    if date_col:
+        df["旅行月份"] = parse_dates(df[date_col]).dt.month.astype("Int64")
+    read_col = "阅读数" if "阅读数" in df.columns else "浏览" if "浏览" in df.columns else None
+    if read_col:
+        df["浏览次数"] = parse_view_counts(df[read_col])
+    if "天数" in df.columns:
+        df = df.rename(columns={"天数": "旅行时长"})
+    return df
+
+
+def clean_and_featurize(input_csv, output_csv, chunksize=CHUNK_SIZE, columnar=True, dedup=True, threshold=None):
+    """
+    分块流式执行清洗 + 特征，返回 (读入行数, 写出行数)。
+    columnar=True 且装有 pyarrow 时，同时写出同名 .arrow 列式文件；
+    dedup=True 时先单独扫一遍去掉近重复游记，簇明细写到 dedup/<输出文件名>.json
+    """
+    from columnar import ColumnarWriter, columnar_path, has_arrow
+    from near_dup import THRESHOLD, column_text, chunked_near_duplicates, default_report_path, write_report
+    threshold = THRESHOLD if threshold is None else threshold
+    clusters, keep = chunked_near_duplicates(input_csv, clean_frame, chunksize, threshold) if dedup else ([], [])
+    members = np.array(sorted(i for c in clusters for i in c), dtype=np.int64)
+    drop = np.setdiff1d(members, keep)
+    # 簇明细只需要簇内各行的标题/链接，写出时顺便收集
+    titles, links = {}, {}
+    rows_in = rows_out = cleaned_rows = 0
+    writer = ColumnarWriter(columnar_path(output_csv)) if columnar and has_arrow() else None
+    # 原样透传的列按字符串读，避免不同分块推断出不同类型导致写出格式不一致
+    reader = pd.read_csv(input_csv, encoding="utf-8-sig", chunksize=chunksize, dtype=str)
+    with open(output_csv, "w", encoding="utf-8-sig", newline="") as out:
+        header = True
+        for chunk in reader:
+            rows_in += len(chunk)
+            cleaned = clean_frame(chunk)
+            # drop 是清洗后各行的全局位置
+            positions = np.arange(cleaned_rows, cleaned_rows + len(cleaned))
+            cleaned_rows += len(cleaned)
+            in_cluster = np.isin(positions, members)
+            if in_cluster.any():
+                part = cleaned[in_cluster]
+                titles.update(zip(positions[in_cluster].tolist(), column_text(part, "标题")))
+                links.update(zip(positions[in_cluster].tolist(), column_text(part, "链接")))
+            cleaned = cleaned[~np.isin(positions, drop)]
+            featured = add_feature_columns(cleaned)
+            featured.to_csv(out, index=False, header=header)
+            if writer is not None:
+                writer.write(featured)
+            header = False
+            rows_out += len(featured)
+    if writer is not None:
+        writer.close()
+    if dedup:
+        write_report(default_report_path(output_csv), threshold, cleaned_rows, cleaned_rows - len(drop),
+                     clusters, keep, titles, links)
+    print(f"[清洗+特征] {input_csv}: 读入 {rows_in} 行，写出 {rows_out} 行 -> {output_csv}")
+    return rows_in, rows_out
+
+
+if __name__ == "__main__":
+    src = sys.argv[1] if len(sys.argv) > 1 else "../data/qunar_travel.csv"
+    dst = sys.argv[2] if len(sys.argv) > 2 else "../data/featured_travel.csv"
+    clean_and_featurize(src, dst)
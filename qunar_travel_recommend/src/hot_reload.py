@@ -0,0 +1,150 @@
+"""
+推荐器热更新：数据文件有新版本时在后台线程里加载/构建新索引，建好后一次赋值替换当前推荐器，服务进程不重启。
+
+    - 请求开始时取一次 live.get()，整个请求都用这一个对象；替换发生在请求中途时，
+      这个请求仍在旧版本上跑完，旧对象在没有引用后自然回收
+    - 同一时间只有一个构建；构建期间又收到更新时，构建完再补做一次
+    - 构建失败时保留当前版本继续服务，错误记在 status() 里；watch 线程记下失败时的文件签名，
+      文件再次变化之前不再自动重试（手动 reload 不受限制）
+    - 可以手动触发（reload），也可以由 watch 线程按 mtime/大小轮询数据文件
+    - follow 模式（多进程服务的工作进程）：不自己构建，只挂载别的进程已构建好的索引，
+      轮询的是索引目录下的 CURRENT 指针
+"""
+import os
+import threading
+import time
+import traceback
+
+from recommender import TravelRecommender
+from travel_index import default_index_dir, load_index
+
+
+def file_signature(path):
+    st = os.stat(path)
+    return st.st_mtime, st.st_size
+
+
+def attach_recommender(csv_path, index_dir=None):
+    """
+    只读挂载已构建好的当前版本索引（不校验、不构建），数组全部是内存映射
+    """
+    index = load_index(index_dir or default_index_dir(csv_path), verify=False)
+    return TravelRecommender(csv_path, index=index)
+
+
+class LiveRecommender:
+    """
+    持有当前在线的 TravelRecommender，负责后台重建和原子替换。
+    watch_path 为轮询变化的文件，默认是数据文件
+    """
+
+    def __init__(self, csv_path, index_dir=None, factory=TravelRecommender, watch_path=None):
+        self.csv_path = csv_path
+        self.index_dir = index_dir
+        self.factory = factory
+        self.watch_path = watch_path or csv_path
+        self.lock = threading.Lock()
+        self.building = False
+        self.pending = False
+        self.last_error = None
+        # 上次构建失败时 watch_path 的签名，文件没再变化就不自动重试
+        self.failed_signature = None
+        self.reloads = 0
+        self.current, self.info = self._build()
+
+    @classmethod
+    def follow(cls, csv_path, index_dir=None):
+        index_dir = index_dir or default_index_dir(csv_path)
+        return cls(csv_path, index_dir, factory=attach_recommender,
+                   watch_path=os.path.join(index_dir, 'CURRENT'))
+
+    def _build(self):
+        signature = file_signature(self.watch_path)
+        t0 = time.perf_counter()
+        rec = self.factory(self.csv_path, self.index_dir)
+        info = {
+            'version': rec.index.version,
+            'docs': len(rec),
+            'built_at': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'build_seconds': round(time.perf_counter() - t0, 3),
+            'signature': signature,
+        }
+        return rec, info
+
+    def get(self):
+        return self.current
+
+    def reload(self, wait=False):
+        """
+        在后台线程中重建并替换，返回是否新启动了构建（已有构建在跑时只记下待办）。
+        wait=True 时在当前线程构建，返回后新版本已生效
+        """
+        with self.lock:
+            if self.building:
+                self.pending = True
+                return False
+            self.building = True
+        if wait:
+            self._run()
+        else:
+            threading.Thread(target=self._run, name='index-reload', daemon=True).start()
+        return True
+
+    def _signature(self):
+        try:
+            return file_signature(self.watch_path)
+        except OSError:
+            return None
+
+    def _run(self):
+        while True:
+            attempted = self._signature()
+            try:
+                rec, info = self._build()
+                old = self.info['version']
+                # 一次引用赋值即完成切换，新请求拿到新对象，进行中的请求继续持有旧对象
+                self.current, self.info = rec, info
+                self.reloads += 1
+                self.last_error = None
+                self.failed_signature = None
+                print(f"[热更新] 索引 {old} -> {info['version']}，文档数 {info['docs']}，"
+                      f"用时 {info['build_seconds']}s")
+            except Exception as e:
+                self.last_error = f"{type(e).__name__}: {e}"
+                self.failed_signature = attempted
+                print(f"[热更新] 构建失败，继续使用 {self.info['version']}：{self.last_error}")
+                traceback.print_exc()
+            with self.lock:
+                if not self.pending:
+                    self.building = False
+                    return
+                self.pending = False
+
+    def changed(self):
+        try:
+            return file_signature(self.watch_path) != self.info['signature']
+        except OSError:
+            return False
+
+    def watch(self, interval=30):
+        """
+        启动守护线程，每 interval 秒检查一次 watch_path，有变化就触发后台重建；
+        上次在同一签名上构建失败的不再重试，等文件再次变化
+        """
+        def loop():
+            while True:
+                time.sleep(interval)
+                if (self.changed() and not self.building
+                        and (self.failed_signature is None or self._signature() != self.failed_signature)):
+                    self.reload()
+
+        thread = threading.Thread(target=loop, name='index-watch', daemon=True)
+        thread.start()
+        return thread
+
+    def status(self):
+        info = dict(self.info)
+        info.pop('signature', None)
+        info.update(building=self.building, reloads=self.reloads, last_error=self.last_error, pid=os.getpid(),
+                    source=os.path.abspath(self.csv_path), source_changed=self.changed())
+        return info
@@ -0,0 +1,127 @@
+"""
+TF-IDF 权重上的倒排索引与带 MaxScore 剪枝的 top-k 检索。
+
+    - 倒排表：每个词一条按文档号升序的倒排链（文档号 + 权重），即 X 的 CSC 形式
+    - 每个词记录倒排链上的最大权重，查询词 t 对任一文档得分的上界为 q_t * max_t
+
+检索按上界从大到小逐词累加（term-at-a-time）。当剩余词的上界之和已经小于当前第 k 名的
+（部分）得分时，没出现过的文档不可能再进前 k，后面的词只对已有候选在倒排链上二分查找补分，
+并随时剔除“已得分 + 剩余上界”不够第 k 名的候选。最后对留下的少量候选按 X 的行精确重算得分，
+排序规则与暴力打分的 topk 相同（分数降序，同分按行号升序），结果与暴力打分一致。
+"""
+import numpy as np
+from scipy import sparse
+
+# 剪枝判断留的浮点余量，保证不会误剪掉与第 k 名同分的文档
+PRUNE_EPS = 1e-9
+
+
+class InvertedIndex:
+    """
+    indptr/docs/weights 为按词组织的倒排链（CSC），term_max 为每个词的最大权重
+    """
+
+    def __init__(self, indptr, docs, weights, term_max, n_docs):
+        self.indptr = indptr
+        self.docs = docs
+        self.weights = weights
+        self.term_max = term_max
+        self.n_docs = n_docs
+
+    @classmethod
+    def from_matrix(cls, X):
+        Xc = sparse.csc_matrix(X)
+        Xc.sort_indices()
+        lengths = np.diff(Xc.indptr)
+        term_max = np.zeros(Xc.shape[1], dtype=np.float64)
+        nonempty = lengths > 0
+        if Xc.nnz:
+            term_max[nonempty] = np.maximum.reduceat(Xc.data, Xc.indptr[:-1][nonempty])
+        return cls(np.asarray(Xc.indptr, dtype=np.int64), np.asarray(Xc.indices, dtype=np.int32),
+                   np.asarray(Xc.data, dtype=np.float64), term_max, Xc.shape[0])
+
+    def posting(self, term):
+        start, end = self.indptr[term], self.indptr[term + 1]
+        return self.docs[start:end], self.weights[start:end]
+
+    def posting_length(self, term):
+        return int(self.indptr[term + 1] - self.indptr[term])
+
+    @staticmethod
+    def _allowed(docs, mask, rows):
+        if mask is not None:
+            return mask[docs]
+        pos = np.minimum(np.searchsorted(rows, docs), len(rows) - 1)
+        return rows[pos] == docs
+
+    @staticmethod
+    def _kth(acc, k):
+        return np.partition(acc, len(acc) - k)[len(acc) - k] if len(acc) >= k else 0.0
+
+    def candidates(self, terms, qweights, k, mask=None, rows=None, stats=None):
+        """
+        MaxScore 剪枝后的候选文档号（升序）。terms/qweights 为查询词号和查询权重；
+        mask 为行过滤掩码，rows 为允许的行号（升序），二者给一个即可
+        """
+        filtered = mask is not None or rows is not None
+        if rows is not None and len(rows) == 0:
+            return np.empty(0, dtype=np.int64)
+        ub = qweights * self.term_max[terms]
+        order = np.argsort(-ub, kind='stable')
+        terms, qweights, ub = terms[order], qweights[order], ub[order]
+        remaining = np.cumsum(ub[::-1])[::-1]
+        cand = np.empty(0, dtype=np.int64)
+        acc = np.empty(0, dtype=np.float64)
+        theta = 0.0
+        touched = 0
+        i = 0
+        # 阶段一：逐词合并倒排链，直到没出现过的文档不可能再进前 k
+        while i < len(terms):
+            if len(cand) >= k and remaining[i] < theta - PRUNE_EPS:
+                break
+            docs, w = self.posting(terms[i])
+            touched += len(docs)
+            contrib = qweights[i] * w
+            if filtered:
+                keep = self._allowed(docs, mask, rows)
+                docs, contrib = docs[keep], contrib[keep]
+            if len(cand) == 0:
+                # 倒排链本身已按文档号升序且无重复，第一条直接作为候选
+                cand, acc = docs.astype(np.int64), contrib
+            else:
+                merged, inverse = np.unique(np.concatenate([cand, docs]), return_inverse=True)
+                acc = np.bincount(inverse, weights=np.concatenate([acc, contrib]), minlength=len(merged))
+                cand = merged
+            theta = self._kth(acc, k)
+            i += 1
+        # 阶段二：剩下的词只给已有候选补分
+        for j in range(i, len(terms)):
+            alive = acc + remaining[j] >= theta - PRUNE_EPS
+            cand, acc = cand[alive], acc[alive]
+            docs, w = self.posting(terms[j])
+            pos = np.searchsorted(docs, cand)
+            touched += len(cand)
+            hit = pos < len(docs)
+            hit[hit] = docs[pos[hit]] == cand[hit]
+            acc[hit] += qweights[j] * w[pos[hit]]
+            theta = self._kth(acc, k)
+        # 到这里每个候选都已累加了全部查询词，只留下可能进前 k 的（与第 k 名相差在浮点余量内）
+        cand = cand[acc >= theta - PRUNE_EPS]
+        if stats is not None:
+            stats['postings_touched'] = touched
+            stats['candidates'] = len(cand)
+        return cand
+
+    def fill_rows(self, exclude, need, mask=None, rows=None):
+        """
+        得分为 0 的补位文档：允许的行中不在 exclude 里的行号最小的 need 个（与暴力打分同分按行号的规则一致）
+        """
+        if need <= 0:
+            return np.empty(0, dtype=np.int64)
+        if rows is not None:
+            pool = np.asarray(rows, dtype=np.int64)
+        elif mask is not None:
+            pool = np.flatnonzero(mask)
+        else:
+            pool = np.arange(min(self.n_docs, need + len(exclude)), dtype=np.int64)
+        return pool[~np.isin(pool, exclude)][:need]
@@ -0,0 +1,357 @@
+"""
+推荐服务的运行指标：计数器、直方图，以及按阶段计时的 Trace，导出为 Prometheus 文本格式。
+
+    trace = start_trace()          # 按采样率决定是否计时，未采中时返回什么都不做的 NULL_TRACE
+    ...                            # 阶段一
+    trace.mark('filter')           # 记下从上一个标记（或开始）到现在的耗时
+    ...
+    trace.finish()                 # 各阶段耗时写入 recommend_stage_seconds 直方图
+
+计时只在标记处读一次 perf_counter，请求结束时才加锁写直方图；采样率由环境变量 METRICS_SAMPLE_RATE
+（0~1，默认 1）控制，0 表示不计时（计数器照常累加）。
+
+多进程服务（serve.py）时每个工作进程调用 enable_multiprocess(目录)：后台线程每 SNAPSHOT_INTERVAL 秒
+把本进程的指标快照写成 目录/<pid>.json（抓取时也先写一次），/metrics 由任意一个工作进程汇总目录下全部快照：
+计数器和直方图按标签求和（退出了的进程的快照保留，总数不会倒退），仪表盘只保留还活着的进程、加 pid 标签。
+"""
+import bisect
+import glob
+import json
+import os
+import random
+import threading
+import time
+
+LATENCY_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5)
+COUNT_BUCKETS = (0, 1, 2, 5, 10, 20, 50)
+SNAPSHOT_INTERVAL = 1.0
+
+
+def _labels_text(names, values):
+    if not names:
+        return ''
+    pairs = ','.join(f'{k}="{_escape(v)}"' for k, v in zip(names, values))
+    return '{' + pairs + '}'
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _number(v):
+    if v == float('inf'):
+        return '+Inf'
+    if isinstance(v, float) and v.is_integer():
+        return str(int(v))
+    return repr(v) if isinstance(v, float) else str(v)
+
+
+class Counter:
+    def __init__(self, name, help, labels=()):
+        self.name = name
+        self.help = help
+        self.labels = tuple(labels)
+        self.values = {}
+        self.lock = threading.Lock()
+
+    def inc(self, *label_values, amount=1):
+        with self.lock:
+            self.values[label_values] = self.values.get(label_values, 0) + amount
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.help}', f'# TYPE {self.name} counter']
+        with self.lock:
+            items = sorted(self.values.items())
+        for values, v in items:
+            lines.append(f'{self.name}{_labels_text(self.labels, values)} {_number(v)}')
+        return lines
+
+    def snapshot(self):
+        with self.lock:
+            return {'type': 'counter', 'help': self.help, 'labels': self.labels,
+                    'values': [[list(k), v] for k, v in self.values.items()]}
+
+    def merge(self, snap):
+        for values, v in snap['values']:
+            self.inc(*values, amount=v)
+
+
+class Histogram:
+    """
+    累计分桶直方图（与 Prometheus 的 histogram 类型一致）
+    """
+
+    def __init__(self, name, help, labels=(), buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.help = help
+        self.labels = tuple(labels)
+        self.buckets = tuple(buckets)
+        self.series = {}
+        self.lock = threading.Lock()
+
+    def _series(self, label_values):
+        s = self.series.get(label_values)
+        if s is None:
+            # 各桶计数（非累计，最后一格为 +Inf）、总和、次数
+            s = self.series[label_values] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+        return s
+
+    def observe(self, value, *label_values):
+        i = bisect.bisect_left(self.buckets, value)
+        with self.lock:
+            s = self._series(label_values)
+            s[0][i] += 1
+            s[1] += value
+            s[2] += 1
+
+    def observe_many(self, items):
+        """
+        items 为 [(标签值元组, 数值)]，一次加锁写入
+        """
+        with self.lock:
+            for label_values, value in items:
+                s = self._series(label_values)
+                s[0][bisect.bisect_left(self.buckets, value)] += 1
+                s[1] += value
+                s[2] += 1
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.help}', f'# TYPE {self.name} histogram']
+        with self.lock:
+            items = sorted((k, ([*v[0]], v[1], v[2])) for k, v in self.series.items())
+        for values, (counts, total, n) in items:
+            cum = 0
+            for bound, c in zip(self.buckets + (float('inf'),), counts):
+                cum += c
+                labels = _labels_text(self.labels + ('le',), values + (_number(float(bound)),))
+                lines.append(f'{self.name}_bucket{labels} {cum}')
+            labels = _labels_text(self.labels, values)
+            lines.append(f'{self.name}_sum{labels} {_number(total)}')
+            lines.append(f'{self.name}_count{labels} {n}')
+        return lines
+
+    def snapshot(self):
+        with self.lock:
+            return {'type': 'histogram', 'help': self.help, 'labels': self.labels, 'buckets': self.buckets,
+                    'series': [[list(k), list(v[0]), v[1], v[2]] for k, v in self.series.items()]}
+
+    def merge(self, snap):
+        with self.lock:
+            for values, counts, total, n in snap['series']:
+                s = self._series(tuple(values))
+                s[0] = [a + b for a, b in zip(s[0], counts)]
+                s[1] += total
+                s[2] += n
+
+
+class Registry:
+    def __init__(self):
+        self.metrics = []
+        # 抓取时现算的指标：返回 [(名称, 类型, 说明, [(标签字典, 值)])] 的函数
+        self.collectors = []
+
+    def counter(self, name, help, labels=()):
+        m = Counter(name, help, labels)
+        self.metrics.append(m)
+        return m
+
+    def histogram(self, name, help, labels=(), buckets=LATENCY_BUCKETS):
+        m = Histogram(name, help, labels, buckets)
+        self.metrics.append(m)
+        return m
+
+    def add_collector(self, func):
+        self.collectors.append(func)
+
+    def collected(self):
+        return [(name, kind, help, samples) for func in self.collectors for name, kind, help, samples in func()]
+
+    def render(self):
+        lines = []
+        for m in self.metrics:
+            lines.extend(m.render())
+        lines.extend(_render_collected(self.collected()))
+        return '\n'.join(lines) + '\n'
+
+    def snapshot(self):
+        return {
+            'metrics': {m.name: m.snapshot() for m in self.metrics},
+            'collected': [[name, kind, help, [[labels, value] for labels, value in samples]]
+                          for name, kind, help, samples in self.collected()],
+        }
+
+
+def _render_collected(collected):
+    lines = []
+    for name, kind, help, samples in collected:
+        lines.append(f'# HELP {name} {help}')
+        lines.append(f'# TYPE {name} {kind}')
+        for labels, value in samples:
+            lines.append(f'{name}{_labels_text(tuple(labels), tuple(labels.values()))} {_number(value)}')
+    return lines
+
+
+def _alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+def merge_snapshots(snapshots):
+    """
+    snapshots 为 [(pid, 快照)]，返回 Prometheus 文本：计数器、直方图求和，仪表盘按活着的进程加 pid 标签
+    """
+    merged = {}
+    collected = {}
+    for pid, snap in snapshots:
+        for name, m in snap['metrics'].items():
+            target = merged.get(name)
+            if target is None:
+                if m['type'] == 'counter':
+                    target = Counter(name, m['help'], m['labels'])
+                else:
+                    target = Histogram(name, m['help'], m['labels'], m['buckets'])
+                merged[name] = target
+            target.merge(m)
+        alive = _alive(pid)
+        for name, kind, help, samples in snap['collected']:
+            entry = collected.setdefault(name, (kind, help, {}))
+            for labels, value in samples:
+                if kind == 'counter':
+                    key = tuple(labels.items())
+                    entry[2][key] = entry[2].get(key, 0) + value
+                elif alive:
+                    labels = dict(labels)
+                    labels.setdefault('pid', str(pid))
+                    entry[2][tuple(labels.items())] = value
+    lines = []
+    for name in sorted(merged):
+        lines.extend(merged[name].render())
+    lines.extend(_render_collected([(name, kind, help, [(dict(k), v) for k, v in sorted(values.items())])
+                                    for name, (kind, help, values) in collected.items()]))
+    return '\n'.join(lines) + '\n'
+
+
+class SnapshotWriter:
+    """
+    把本进程的指标快照定期写到 directory/<pid>.json（先写临时文件再替换，读取方不会读到半个文件）
+    """
+
+    def __init__(self, directory, interval=SNAPSHOT_INTERVAL, registry=None):
+        self.directory = directory
+        self.interval = interval
+        self.registry = registry or REGISTRY
+        self.path = os.path.join(directory, f'{os.getpid()}.json')
+        self.lock = threading.Lock()
+
+    def write(self):
+        snap = self.registry.snapshot()
+        with self.lock:
+            tmp = self.path + '.tmp'
+            with open(tmp, 'w', encoding='utf-8') as f:
+                json.dump(snap, f, ensure_ascii=False)
+            os.replace(tmp, self.path)
+
+    def start(self):
+        def loop():
+            while True:
+                time.sleep(self.interval)
+                try:
+                    self.write()
+                except OSError as e:
+                    print(f"[指标] 写快照失败：{e}")
+
+        self.write()
+        threading.Thread(target=loop, name='metrics-snapshot', daemon=True).start()
+        return self
+
+    def render(self):
+        """
+        先写一次本进程的快照，再汇总目录下所有进程的快照
+        """
+        self.write()
+        snapshots = []
+        for path in glob.glob(os.path.join(self.directory, '*.json')):
+            try:
+                with open(path, encoding='utf-8') as f:
+                    snapshots.append((int(os.path.basename(path)[:-5]), json.load(f)))
+            except (OSError, ValueError):
+                continue
+        return merge_snapshots(sorted(snapshots, key=lambda x: x[0]))
+
+
+REGISTRY = Registry()
+STAGE_SECONDS = REGISTRY.histogram('recommend_stage_seconds', '推荐各阶段耗时（按采样率采样）', ('stage',))
+REQUEST_SECONDS = REGISTRY.histogram('recommend_request_seconds', '推荐接口整体耗时（按采样率采样）', ('endpoint', 'cache'))
+REQUESTS = REGISTRY.counter('recommend_requests_total', '推荐接口请求数', ('endpoint', 'cache'))
+RESULTS = REGISTRY.histogram('recommend_results', '每次推荐返回的条数', ('endpoint',), buckets=COUNT_BUCKETS)
+sample_rate = float(os.environ.get('METRICS_SAMPLE_RATE', 1.0))
+# enable_multiprocess 之后 render 汇总所有进程
+snapshot_writer = None
+
+
+def set_sample_rate(rate):
+    global sample_rate
+    sample_rate = min(1.0, max(0.0, float(rate)))
+
+
+class Trace:
+    def __init__(self):
+        self.start = self.last = time.perf_counter()
+        self.stages = []
+
+    def mark(self, stage):
+        now = time.perf_counter()
+        self.stages.append(((stage,), now - self.last))
+        self.last = now
+
+    def elapsed(self):
+        return time.perf_counter() - self.start
+
+    def finish(self):
+        if self.stages:
+            STAGE_SECONDS.observe_many(self.stages)
+            self.stages = []
+
+
+class _NullTrace:
+    def mark(self, stage):
+        pass
+
+    def elapsed(self):
+        return None
+
+    def finish(self):
+        pass
+
+
+NULL_TRACE = _NullTrace()
+
+
+def start_trace():
+    """
+    按采样率返回 Trace 或 NULL_TRACE
+    """
+    if sample_rate >= 1.0 or (sample_rate > 0 and random.random() < sample_rate):
+        return Trace()
+    return NULL_TRACE
+
+
+def enable_multiprocess(directory, interval=SNAPSHOT_INTERVAL):
+    """
+    在工作进程里（fork 之后）调用：开始定期写本进程的快照，/metrics 改为汇总全部进程
+    """
+    global snapshot_writer
+    os.makedirs(directory, exist_ok=True)
+    snapshot_writer = SnapshotWriter(directory, interval).start()
+    return snapshot_writer
+
+
+def render():
+    if snapshot_writer is not None:
+        return snapshot_writer.render()
+    return REGISTRY.render()
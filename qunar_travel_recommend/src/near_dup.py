@@ -0,0 +1,310 @@
+"""
+近重复游记检测（MinHash + LSH），在清洗阶段去掉转载、同一行程换个“X日游”标题重发的游记。
+
+    1. 标题 + 行程 + 目的地 用 jieba 分词，按“>”和字段切成片段，片段内去掉标点后相邻两词为一个 shingle，哈希成 32 位整数
+    2. 每篇算 NUM_PERM 个 MinHash 值（((a*x + b) mod p) 低 32 位的最小值），两篇签名相同位置的比例即 Jaccard 相似度的估计
+    3. 签名切成 BANDS 段，任意一段完全相同的两篇成为候选对，只有候选对才比较签名，总体接近线性
+    4. 估计相似度不低于 threshold 的候选对用并查集连成簇，每簇保留热度最高的一篇（同分保留靠前的）
+
+清洗（data_cleaning.clean_data）、分块融合流水线（feature_pipeline.clean_and_featurize）以及直接从原始数据建索引
+（travel_index.build_index）都会去重。融合流水线在写出前单独流式扫一遍原始文件（chunked_near_duplicates），
+每行只留各段的桶键和热度，用“桶内代表 + 相同段数”判断近重复（bucket_pairs），不比较完整签名。
+
+    python near_dup.py ../data/cleaned_travel.csv [--threshold 0.7]
+"""
+import json
+import math
+import os
+import re
+import time
+import zlib
+
+import numpy as np
+import pandas as pd
+
+DEDUP_FIELDS = ['标题', '行程', '目的地']
+NUM_PERM = 64
+BANDS = 16
+THRESHOLD = 0.7
+MERSENNE_PRIME = (1 << 61) - 1
+MAX_HASH = (1 << 32) - 1
+FNV_PRIME = np.uint64(0x100000001B3)
+# 没有 shingle 的文档的签名值（哈希值不会取到）
+EMPTY = MAX_HASH + 1
+# 同一个桶里的文档太多时只和桶内第一篇比较，避免极端情况下退化成两两比较
+MAX_BUCKET = 200
+HASH_CHUNK = 200000
+SEGMENT_SEP = re.compile(r'^[\s>]+$')
+TOKEN_SKIP = re.compile(r'^[\s>\-|｜/、，,。.！!？?：:；;（）()【】\[\]“”"\'《》~·…]*$')
+
+
+def doc_texts(df, fields=DEDUP_FIELDS):
+    cols = [df[c].fillna('').astype(str) for c in fields if c in df.columns]
+    if not cols:
+        return [''] * len(df)
+    text = cols[0]
+    for col in cols[1:]:
+        text = text + ' ' + col
+    return text.str.lower().tolist()
+
+
+def shingle_ids(tokens):
+    """
+    相邻两词的 shingle（不跨“>”和字段边界，只有一个词的片段取该词），哈希为 uint32（crc32，跨进程稳定）
+    """
+    grams, segment = set(), []
+    for t in tokens + ['>']:
+        if SEGMENT_SEP.match(t):
+            grams.update(segment if len(segment) == 1 else (a + ' ' + b for a, b in zip(segment, segment[1:])))
+            segment = []
+        elif not TOKEN_SKIP.match(t):
+            segment.append(t)
+    return np.fromiter((zlib.crc32(g.encode('utf-8')) for g in grams), dtype=np.uint64, count=len(grams))
+
+
+def minhash_signatures(shingles, num_perm=NUM_PERM, seed=0):
+    """
+    shingles 为每篇的 shingle 数组，返回 (文档数, num_perm) 的 uint64 签名；没有 shingle 的文档签名为全 EMPTY（不与任何文档相同）。
+    a、b 取自 [1, p)，a*x 在 uint64 上溢出回绕，取模后保留低 32 位（与 datasketch 的做法相同）；
+    a 太小时 a*x+b 几乎不回绕，最小值总落在 x 最小的 shingle 上，估计会严重偏高
+    """
+    rng = np.random.default_rng(seed)
+    a = rng.integers(1, MERSENNE_PRIME, size=num_perm, dtype=np.uint64)
+    b = rng.integers(0, MERSENNE_PRIME, size=num_perm, dtype=np.uint64)
+    n = len(shingles)
+    sig = np.full((n, num_perm), EMPTY, dtype=np.uint64)
+    lengths = np.array([len(s) for s in shingles], dtype=np.int64)
+    docs = np.flatnonzero(lengths)
+    if not len(docs):
+        return sig
+    flat = np.concatenate([shingles[i] for i in docs])
+    starts = np.concatenate([[0], np.cumsum(lengths[docs])[:-1]])
+    # 按文档边界分块计算，每块是 (shingle 数, num_perm) 的矩阵
+    bounds = np.searchsorted(starts, np.arange(0, len(flat), HASH_CHUNK), side='right') - 1
+    bounds = list(dict.fromkeys(bounds.tolist())) + [len(docs)]
+    for lo, hi in zip(bounds, bounds[1:]):
+        s0 = starts[lo]
+        s1 = starts[hi] if hi < len(docs) else len(flat)
+        h = ((flat[s0:s1, None] * a + b) % np.uint64(MERSENNE_PRIME)) & np.uint64(MAX_HASH)
+        sig[docs[lo:hi]] = np.minimum.reduceat(h, starts[lo:hi] - s0, axis=0)
+    return sig
+
+
+def lsh_pairs(sig, bands=BANDS, threshold=THRESHOLD):
+    """
+    LSH 分段取候选对，再按签名一致比例过滤，返回 [(i, j, 估计相似度)]，i < j
+    """
+    n, num_perm = sig.shape
+    rows = num_perm // bands
+    valid = sig[:, 0] != EMPTY
+    ids = np.flatnonzero(valid)
+    candidates = set()
+    for band in range(bands):
+        part = np.ascontiguousarray(sig[valid, band * rows:(band + 1) * rows])
+        keys = part.view(np.dtype((np.void, part.dtype.itemsize * rows))).ravel()
+        order = np.argsort(keys, kind='stable')
+        sorted_keys = keys[order]
+        starts = np.flatnonzero(np.concatenate([[True], sorted_keys[1:] != sorted_keys[:-1], [True]]))
+        # 只遍历有 2 篇以上的桶（绝大多数桶只有一篇）
+        shared = np.flatnonzero(np.diff(starts) >= 2)
+        for lo, hi in zip(starts[shared].tolist(), starts[shared + 1].tolist()):
+            group = np.sort(ids[order[lo:hi]])
+            if len(group) > MAX_BUCKET:
+                candidates.update((int(group[0]), int(j)) for j in group[1:])
+            else:
+                candidates.update((int(group[x]), int(group[y]))
+                                  for x in range(len(group)) for y in range(x + 1, len(group)))
+    if not candidates:
+        return []
+    pairs = np.array(sorted(candidates), dtype=np.int64)
+    sim = (sig[pairs[:, 0]] == sig[pairs[:, 1]]).mean(axis=1)
+    keep = sim >= threshold
+    return [(int(i), int(j), float(s)) for (i, j), s in zip(pairs[keep], sim[keep])]
+
+
+def clusters_from_pairs(pairs):
+    """
+    并查集（只记出现在候选对里的行号），返回成员数不少于 2 的簇（行号列表，升序）
+    """
+    parent = {}
+
+    def find(x):
+        parent.setdefault(x, x)
+        while parent[x] != x:
+            parent[x] = parent[parent[x]]
+            x = parent[x]
+        return x
+
+    for i, j, _ in pairs:
+        ri, rj = find(i), find(j)
+        if ri != rj:
+            parent[max(ri, rj)] = min(ri, rj)
+    groups = {}
+    for i, j, _ in pairs:
+        for x in (i, j):
+            groups.setdefault(find(x), set()).add(x)
+    return [sorted(g) for _, g in sorted(groups.items())]
+
+
+def frame_signatures(df, user_words, num_perm=NUM_PERM, processes=None):
+    """
+    df 各行的 (MinHash 签名, 未归一化的热度)
+    """
+    from tokenizer import segment_corpus
+    from travel_index import numeric_columns, popularity_scores
+    tokens = segment_corpus(doc_texts(df), user_words, processes=processes)
+    sig = minhash_signatures([shingle_ids(t) for t in tokens], num_perm)
+    popularity = popularity_scores(numeric_columns(df), normalize=False) if len(df) else np.zeros(0)
+    return sig, popularity
+
+
+def clusters_and_keep(sig, popularity, threshold=THRESHOLD, bands=BANDS):
+    clusters = clusters_from_pairs(lsh_pairs(sig, bands, threshold))
+    # 热度最高的保留，同分时 argmax 取簇内最靠前的一篇
+    keep = [c[int(np.argmax(popularity[c]))] for c in clusters]
+    return clusters, keep
+
+
+def find_near_duplicates(df, threshold=THRESHOLD, num_perm=NUM_PERM, bands=BANDS, processes=None):
+    """
+    返回 (簇列表, 每簇保留的行号)；行号为 df 中的位置
+    """
+    from tokenizer import destination_words
+    user_words = destination_words(df['目的地'].dropna()) if '目的地' in df.columns else []
+    sig, popularity = frame_signatures(df, user_words, num_perm, processes)
+    return clusters_and_keep(sig, popularity, threshold, bands)
+
+
+def band_keys(sig, bands=BANDS):
+    """
+    每篇签名按段哈希成 uint64 桶键（FNV 式乘法 + 异或，在 uint64 上回绕），形状 (文档数, bands)
+    """
+    rows = sig.shape[1] // bands
+    keys = np.zeros((len(sig), bands), dtype=np.uint64)
+    for c in range(rows):
+        # 第 b 段的第 c 个值在第 b * rows + c 列
+        keys = (keys * FNV_PRIME) ^ sig[:, c::rows]
+    return keys
+
+
+def min_bands(threshold=THRESHOLD, bands=BANDS, num_perm=NUM_PERM):
+    """
+    相似度为 threshold 的两篇，每段完全相同的概率是 threshold ** 每段行数；桶键相同的段数不少于其期望才算近重复
+    """
+    return max(1, math.ceil(bands * threshold ** (num_perm // bands) - 1e-9))
+
+
+def bucket_pairs(keys, popularity, valid, threshold=THRESHOLD, num_perm=NUM_PERM):
+    """
+    只用桶键找近重复：每段每个桶里热度最高的一篇（同分取靠前的）作代表，桶内其他文档与代表比较全部段的桶键，
+    相同的段数不少于 min_bands 时成对。返回 [(i, j, 估计相似度)]，i < j
+    """
+    n, bands = keys.shape
+    need = min_bands(threshold, bands, num_perm)
+    ids = np.flatnonzero(valid)
+    candidates = set()
+    for band in range(bands):
+        k = keys[ids, band]
+        order = np.lexsort((ids, -popularity[ids], k))
+        sorted_keys = k[order]
+        starts = np.flatnonzero(np.concatenate([[True], sorted_keys[1:] != sorted_keys[:-1]]))
+        # 每个桶按热度排第一的就是代表
+        rep = np.repeat(ids[order[starts]], np.diff(np.append(starts, len(order))))
+        member = ids[order]
+        other = member != rep
+        candidates.update(zip(member[other].tolist(), rep[other].tolist()))
+    if not candidates:
+        return []
+    pairs = np.array(sorted(candidates), dtype=np.int64)
+    agree = (keys[pairs[:, 0]] == keys[pairs[:, 1]]).sum(axis=1)
+    keep = agree >= need
+    # 段相同的比例约为 J ** 每段行数，反推相似度
+    sim = (agree / bands) ** (bands / num_perm)
+    return [(int(min(i, j)), int(max(i, j)), float(s)) for (i, j), s in zip(pairs[keep], sim[keep])]
+
+
+def chunked_near_duplicates(input_csv, clean, chunksize, threshold=THRESHOLD):
+    """
+    分块流式扫一遍原始文件（每块先经 clean 清洗）找近重复，返回 (簇列表, 每簇保留的行号)，
+    行号为清洗后各行按顺序的全局位置。这是写出之前单独的一遍扫描：签名逐块算完即丢，
+    内存里每行只有 BANDS 个桶键和热度（约 140 字节），不保留文本。
+    与 find_near_duplicates 的差别：目的地词逐块累加进词典；是否近重复由桶键相同的段数判断（见 bucket_pairs），
+    不比较完整签名，阈值附近的个别文档判断可能不同
+    """
+    from tokenizer import destination_words
+    t0 = time.perf_counter()
+    words, keys, scores, valid = set(), [], [], []
+    for chunk in pd.read_csv(input_csv, encoding="utf-8-sig", chunksize=chunksize, dtype=str):
+        cleaned = clean(chunk)
+        if '目的地' in cleaned.columns:
+            words.update(destination_words(cleaned['目的地'].dropna()))
+        sig, popularity = frame_signatures(cleaned, sorted(words))
+        keys.append(band_keys(sig))
+        scores.append(popularity)
+        valid.append(sig[:, 0] != EMPTY)
+    if not keys:
+        return [], []
+    keys, popularity, valid = np.concatenate(keys), np.concatenate(scores), np.concatenate(valid)
+    clusters = clusters_from_pairs(bucket_pairs(keys, popularity, valid, threshold))
+    keep = [c[int(np.argmax(popularity[c]))] for c in clusters]
+    removed = sum(len(c) for c in clusters) - len(clusters)
+    print(f"[近重复] {len(keys)} 行中发现 {len(clusters)} 簇近重复，去掉 {removed} 行"
+          f"（{removed / max(len(keys), 1):.1%}），用时 {time.perf_counter() - t0:.2f}s")
+    return clusters, keep
+
+
+def column_text(df, name):
+    return df[name].astype(str).tolist() if name in df.columns else [''] * len(df)
+
+
+def write_report(path, threshold, rows_in, rows_out, clusters, keep, titles, links):
+    report = {
+        'threshold': threshold, 'num_perm': NUM_PERM, 'bands': BANDS,
+        'rows_in': rows_in, 'rows_out': rows_out, 'removed': rows_in - rows_out, 'clusters': len(clusters),
+        'details': [{'kept': {'标题': titles[k], '链接': links[k]},
+                     'removed': [{'标题': titles[i], '链接': links[i]} for i in c if i != k]}
+                    for c, k in sorted(zip(clusters, keep), key=lambda x: -len(x[0]))],
+    }
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(report, f, ensure_ascii=False, indent=1)
+
+
+def default_report_path(csv_path):
+    base = os.path.dirname(os.path.abspath(csv_path))
+    name = os.path.splitext(os.path.basename(csv_path))[0]
+    return os.path.join(base, 'dedup', f"{name}.json")
+
+
+def drop_near_duplicates(df, threshold=THRESHOLD, report_path=None):
+    """
+    去掉近重复游记（每簇只留热度最高的一篇），返回去重后的 DataFrame；report_path 给出时写出簇明细
+    """
+    t0 = time.perf_counter()
+    clusters, keep = find_near_duplicates(df, threshold)
+    drop = sorted(set(i for c in clusters for i in c) - set(keep))
+    result = df.drop(index=df.index[drop])
+    seconds = time.perf_counter() - t0
+    print(f"[近重复] {len(df)} 行中发现 {len(clusters)} 簇近重复，去掉 {len(drop)} 行"
+          f"（{len(drop) / max(len(df), 1):.1%}），剩 {len(result)} 行，用时 {seconds:.2f}s")
+    if report_path:
+        write_report(report_path, threshold, len(df), len(result), clusters, keep,
+                     column_text(df, '标题'), column_text(df, '链接'))
+    return result
+
+
+if __name__ == "__main__":
+    import argparse
+    parser = argparse.ArgumentParser(description="近重复游记检测")
+    parser.add_argument("csv", nargs="?", default="../data/cleaned_travel.csv")
+    parser.add_argument("--threshold", type=float, default=THRESHOLD)
+    parser.add_argument("--show", type=int, default=10, help="打印最大的几个簇")
+    args = parser.parse_args()
+    frame = pd.read_csv(args.csv)
+    clusters, keep = find_near_duplicates(frame, args.threshold)
+    print(f"{len(frame)} 行，{len(clusters)} 簇，可去掉 {sum(len(c) for c in clusters) - len(clusters)} 行")
+    for c, k in sorted(zip(clusters, keep), key=lambda x: -len(x[0]))[:args.show]:
+        print(f"保留 {frame['标题'].iloc[k]}")
+        for i in c:
+            if i != k:
+                print(f"    去掉 {frame['标题'].iloc[i]}")
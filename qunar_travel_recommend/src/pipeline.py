@@ -0,0 +1,342 @@
+"""
+数据流水线：把 抓取 -> 清洗 -> 特征 -> 索引（以及统计聚合、词频）建成一张按文件依赖连接的 DAG，一条命令按需执行。
+
+    crawl ──> qunar_travel.csv ──> features ──> featured_travel.csv ──> index
+                      └──> stats                           └──> termfreq
+
+    - features 是清洗 + 近重复去重 + 特征的融合阶段（feature_pipeline.clean_and_featurize），分块流式执行，
+      不再写中间的 cleaned_travel.csv
+
+    - 每个阶段的指纹 = 输入文件内容的 sha256 + 参数 + 实现该阶段的源码文件；指纹没变且输出都还在（也没被改过）就跳过。
+      上游重跑但产出内容没变时，下游指纹也不变，同样跳过
+    - 文件哈希按 (mtime, 大小) 缓存在状态文件里，未改动的大文件不重复计算
+    - 每个阶段默认在独立子进程中执行，记录耗时、读入/写出行数和峰值内存（ru_maxrss）
+    - 抓取依赖外部网站，只有加 --crawl 时才执行，且总是执行
+    - 状态在 <数据目录>/pipeline/state.json，每次运行的记录追加到 runs.jsonl
+
+    python pipeline.py [--crawl] [--max-pages 200] [--force index,...] [--only features] [--dry-run] [--data-dir ../data]
+"""
+import argparse
+import hashlib
+import json
+import multiprocessing
+import os
+import sys
+import time
+import traceback
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+SRC_DIR = os.path.dirname(os.path.abspath(__file__))
+DATA_DIR = os.path.join(os.path.dirname(SRC_DIR), "data")
+PIPELINE_FORMAT = 1
+TERMFREQ_FIELDS = ['标题', '主题', '行程']
+
+
+def peak_rss_mb():
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux 单位为 KB，macOS 为字节
+    return round(peak / (1024 * 1024 if sys.platform == 'darwin' else 1024), 1)
+
+
+def data_paths(data_dir):
+    from term_freq import default_termfreq_path
+    from travel_index import default_index_dir
+    from travel_stats import default_stats_path
+    raw = os.path.join(data_dir, "qunar_travel.csv")
+    featured = os.path.join(data_dir, "featured_travel.csv")
+    return {
+        'raw': raw,
+        'featured': featured,
+        'index': default_index_dir(featured),
+        'stats': default_stats_path(raw),
+        'termfreq': default_termfreq_path(featured, TERMFREQ_FIELDS),
+    }
+
+
+# ----------- 各阶段，返回 (读入行数, 写出行数) -----------
+def run_crawl(paths, params):
+    from crawl_qunar import crawl_incremental
+    from travel_store import load_store
+    added, updated, fetched = crawl_incremental(paths['raw'], max_pages=params['max_pages'],
+                                                lookahead=params['lookahead'], workers=params['workers'])
+    return added + updated, len(load_store(paths['raw']))
+
+
+def run_features(paths, params):
+    from feature_pipeline import clean_and_featurize
+    # 装有 pyarrow 时同时写出列式文件，建索引、统计时只解码用到的列
+    return clean_and_featurize(paths['raw'], paths['featured'], threshold=params['dedup_threshold'])
+
+
+def run_index(paths, params):
+    from travel_index import build_index
+    index = build_index(paths['featured'], paths['index'], max_features=params['max_features'])
+    return len(index), len(index)
+
+
+def run_stats(paths, params):
+    from travel_stats import refresh_stats
+    store = refresh_stats(paths['raw'], rebuild=params.get('rebuild', False))
+    return store.rows, len(store.groups)
+
+
+def run_termfreq(paths, params):
+    from term_freq import refresh_term_freq
+    store = refresh_term_freq(paths['featured'], params['fields'], rebuild=params.get('rebuild', False))
+    return store.docs, len(store.counts)
+
+
+class Stage:
+    """
+    inputs/outputs 为 paths 中的键；code 为实现该阶段的源码文件（改动后指纹随之变化）。
+    增量刷新的阶段（stats / termfreq）因源码变化重跑时，params 里带 rebuild=True，整体重算
+    """
+
+    def __init__(self, name, func, inputs, outputs, params=None, code=(), always=False):
+        self.name = name
+        self.func = func
+        self.inputs = list(inputs)
+        self.outputs = list(outputs)
+        self.params = params or {}
+        self.code = list(code)
+        self.always = always
+
+
+def default_stages(args):
+    stages = [
+        Stage('features', run_features, ['raw'], ['featured'], params={'dedup_threshold': args.dedup_threshold},
+              code=['feature_pipeline.py', 'near_dup.py', 'tokenizer.py', 'travel_index.py', 'columnar.py']),
+        Stage('index', run_index, ['featured'], ['index'], params={'max_features': args.max_features},
+              code=['travel_index.py', 'tokenizer.py', 'inverted_index.py', 'columnar.py', 'route_graph.py',
+                    'near_dup.py']),
+        Stage('stats', run_stats, ['raw'], ['stats'],
+              code=['travel_stats.py', 'feature_pipeline.py', 'tokenizer.py', 'travel_store.py', 'columnar.py']),
+        Stage('termfreq', run_termfreq, ['featured'], ['termfreq'], params={'fields': TERMFREQ_FIELDS},
+              code=['term_freq.py', 'tokenizer.py', 'travel_stats.py', 'feature_pipeline.py', 'travel_index.py',
+                    'columnar.py']),
+    ]
+    if args.crawl:
+        params = {'max_pages': args.max_pages, 'lookahead': args.lookahead, 'workers': args.workers}
+        stages.insert(0, Stage('crawl', run_crawl, [], ['raw'], params=params,
+                               code=['crawl_qunar.py', 'qunar_extract.py', 'travel_store.py'], always=True))
+    return stages
+
+
+def topo_order(stages):
+    """
+    按“输出 -> 输入”的文件依赖拓扑排序，同层保持声明顺序
+    """
+    producer = {out: s.name for s in stages for out in s.outputs}
+    deps = {s.name: {producer[i] for i in s.inputs if i in producer} for s in stages}
+    order, done = [], set()
+    while len(order) < len(stages):
+        ready = [s for s in stages if s.name not in done and deps[s.name] <= done]
+        if not ready:
+            raise ValueError(f"阶段依赖有环: {sorted(set(deps) - done)}")
+        for s in ready:
+            order.append(s)
+            done.add(s.name)
+    return order, deps
+
+
+class Pipeline:
+    def __init__(self, stages, paths, state_dir):
+        self.stages, self.deps = topo_order(stages)
+        self.paths = paths
+        self.state_dir = state_dir
+        self.state_path = os.path.join(state_dir, 'state.json')
+        self.state = self._load_state()
+
+    def _load_state(self):
+        if os.path.exists(self.state_path):
+            with open(self.state_path, encoding='utf-8') as f:
+                state = json.load(f)
+            if state.get('format') == PIPELINE_FORMAT:
+                return state
+        return {'format': PIPELINE_FORMAT, 'hashes': {}, 'stages': {}}
+
+    def save_state(self):
+        os.makedirs(self.state_dir, exist_ok=True)
+        tmp = self.state_path + '.tmp'
+        with open(tmp, 'w', encoding='utf-8') as f:
+            json.dump(self.state, f, ensure_ascii=False, indent=1)
+        os.replace(tmp, self.state_path)
+
+    def digest(self, key):
+        """
+        输入/输出的内容指纹：文件为 sha256（按 mtime/大小缓存）；索引目录取 CURRENT 指向的版本号；不存在为 None
+        """
+        path = self.paths[key]
+        if os.path.isdir(path):
+            current = os.path.join(path, 'CURRENT')
+            if not os.path.exists(current):
+                return None
+            with open(current) as f:
+                return 'version:' + f.read().strip()
+        if not os.path.exists(path):
+            return None
+        st = os.stat(path)
+        cached = self.state['hashes'].get(path)
+        if cached and cached[0] == st.st_mtime_ns and cached[1] == st.st_size:
+            return cached[2]
+        from travel_index import file_sha256
+        sha = file_sha256(path)
+        self.state['hashes'][path] = [st.st_mtime_ns, st.st_size, sha]
+        return sha
+
+    def code_digest(self, stage):
+        from travel_index import file_sha256
+        return {name: file_sha256(os.path.join(SRC_DIR, name)) for name in stage.code}
+
+    def fingerprint(self, stage, code=None):
+        payload = {
+            'stage': stage.name,
+            'params': stage.params,
+            'inputs': {k: self.digest(k) for k in stage.inputs},
+            'code': code if code is not None else self.code_digest(stage),
+        }
+        return hashlib.sha256(json.dumps(payload, ensure_ascii=False, sort_keys=True).encode('utf-8')).hexdigest()
+
+    def is_fresh(self, stage, fingerprint):
+        saved = self.state['stages'].get(stage.name)
+        if stage.always or not saved or saved.get('fingerprint') != fingerprint:
+            return False
+        return all(self.digest(k) is not None and self.digest(k) == saved['outputs'].get(k) for k in stage.outputs)
+
+    def run(self, force=(), only=None, dry_run=False, isolate=True):
+        """
+        执行全部（或 only 指定的）阶段，返回每个阶段的运行记录
+        """
+        records, failed = [], set()
+        for stage in self.stages:
+            if only and stage.name not in only:
+                continue
+            if self.deps[stage.name] & failed:
+                records.append({'stage': stage.name, 'status': 'blocked'})
+                failed.add(stage.name)
+                continue
+            missing = [k for k in stage.inputs if self.digest(k) is None]
+            if missing:
+                print(f"[流水线] {stage.name} 缺少输入: {[self.paths[k] for k in missing]}")
+                records.append({'stage': stage.name, 'status': 'failed', 'error': f"缺少输入: {missing}"})
+                failed.add(stage.name)
+                continue
+            code = self.code_digest(stage)
+            fp = self.fingerprint(stage, code)
+            if stage.name not in force and self.is_fresh(stage, fp):
+                records.append({'stage': stage.name, 'status': 'skipped', 'fingerprint': fp[:12]})
+                continue
+            if dry_run:
+                records.append({'stage': stage.name, 'status': 'would-run', 'fingerprint': fp[:12]})
+                continue
+            # 源码变了的阶段不能沿用已有产物做增量
+            saved_code = (self.state['stages'].get(stage.name) or {}).get('code')
+            rebuild = saved_code is not None and saved_code != code
+            record = run_stage(stage, self.paths, isolate, rebuild=rebuild)
+            record['fingerprint'] = fp[:12]
+            records.append(record)
+            if record['status'] != 'ran':
+                failed.add(stage.name)
+                continue
+            self.state['stages'][stage.name] = {
+                'fingerprint': fp,
+                'code': code,
+                'outputs': {k: self.digest(k) for k in stage.outputs},
+                'last_run': record,
+            }
+            self.save_state()
+        if not dry_run:
+            self.save_state()
+            self.log_run(records)
+        return records
+
+    def log_run(self, records):
+        os.makedirs(self.state_dir, exist_ok=True)
+        with open(os.path.join(self.state_dir, 'runs.jsonl'), 'a', encoding='utf-8') as f:
+            f.write(json.dumps({'time': time.strftime('%Y-%m-%dT%H:%M:%S'), 'stages': records},
+                               ensure_ascii=False) + '\n')
+
+
+def _stage_child(conn, func, paths, params):
+    try:
+        rows_in, rows_out = func(paths, params)
+        conn.send({'rows_in': int(rows_in), 'rows_out': int(rows_out), 'peak_rss_mb': peak_rss_mb()})
+    except Exception as e:
+        conn.send({'error': f"{type(e).__name__}: {e}", 'traceback': traceback.format_exc()})
+    finally:
+        conn.close()
+
+
+def run_stage(stage, paths, isolate=True, rebuild=False):
+    """
+    执行一个阶段；isolate=True 时在子进程中执行，峰值内存只算这个阶段
+    """
+    print(f"[流水线] 开始 {stage.name}{'（源码有变化，整体重算）' if rebuild else ''}")
+    params = dict(stage.params, rebuild=True) if rebuild else stage.params
+    t0 = time.perf_counter()
+    if isolate:
+        methods = multiprocessing.get_all_start_methods()
+        ctx = multiprocessing.get_context('fork' if 'fork' in methods else 'spawn')
+        parent, child = ctx.Pipe(duplex=False)
+        proc = ctx.Process(target=_stage_child, args=(child, stage.func, paths, params))
+        proc.start()
+        child.close()
+        try:
+            result = parent.recv()
+        except EOFError:
+            result = {'error': '子进程异常退出'}
+        proc.join()
+    else:
+        try:
+            rows_in, rows_out = stage.func(paths, params)
+            result = {'rows_in': int(rows_in), 'rows_out': int(rows_out), 'peak_rss_mb': peak_rss_mb()}
+        except Exception as e:
+            result = {'error': f"{type(e).__name__}: {e}", 'traceback': traceback.format_exc()}
+    seconds = round(time.perf_counter() - t0, 3)
+    if 'error' in result:
+        print(result.get('traceback', ''), file=sys.stderr)
+        print(f"[流水线] {stage.name} 失败：{result['error']}")
+        return {'stage': stage.name, 'status': 'failed', 'seconds': seconds, 'error': result['error']}
+    print(f"[流水线] 完成 {stage.name}：{seconds}s，读入 {result['rows_in']} 行，写出 {result['rows_out']} 行，"
+          f"峰值内存 {result['peak_rss_mb']} MB")
+    return {'stage': stage.name, 'status': 'ran', 'seconds': seconds, 'rows_in': result['rows_in'],
+            'rows_out': result['rows_out'], 'peak_rss_mb': result['peak_rss_mb'],
+            'finished_at': time.strftime('%Y-%m-%dT%H:%M:%S')}
+
+
+def print_summary(records):
+    print(f"{'阶段':<10}{'状态':<10}{'耗时s':>9}{'读入':>10}{'写出':>10}{'峰值MB':>9}")
+    for r in records:
+        print(f"{r['stage']:<10}{r['status']:<10}{r.get('seconds', ''):>9}{r.get('rows_in', ''):>10}"
+              f"{r.get('rows_out', ''):>10}{r.get('peak_rss_mb', '') or '':>9}")
+
+
+if __name__ == "__main__":
+    from near_dup import THRESHOLD as DEDUP_THRESHOLD
+    parser = argparse.ArgumentParser(description="抓取/清洗/特征/索引增量流水线")
+    parser.add_argument("--data-dir", default=DATA_DIR)
+    parser.add_argument("--crawl", action="store_true", help="先增量抓取（访问外部网站）")
+    parser.add_argument("--max-pages", type=int, default=200)
+    parser.add_argument("--lookahead", type=int, default=1)
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--max-features", type=int, default=500)
+    parser.add_argument("--dedup-threshold", type=float, default=DEDUP_THRESHOLD, help="近重复判定的相似度阈值")
+    parser.add_argument("--force", default="", help="强制重跑的阶段，逗号分隔")
+    parser.add_argument("--only", default="", help="只执行这些阶段，逗号分隔")
+    parser.add_argument("--dry-run", action="store_true", help="只列出需要执行的阶段")
+    parser.add_argument("--inline", action="store_true", help="在当前进程中执行（峰值内存为进程累计）")
+    args = parser.parse_args()
+
+    data_dir = os.path.abspath(args.data_dir)
+    pipeline = Pipeline(default_stages(args), data_paths(data_dir), os.path.join(data_dir, 'pipeline'))
+    records = pipeline.run(force={s for s in args.force.split(',') if s},
+                           only={s for s in args.only.split(',') if s} or None,
+                           dry_run=args.dry_run, isolate=not args.inline)
+    print_summary(records)
+    sys.exit(1 if any(r['status'] in ('failed', 'blocked') for r in records) else 0)
@@ -0,0 +1,270 @@
+"""
+按用户画像离线批量推荐：读取存储的画像（user_profile.build_user_profile 的字段），预先算好每个人的 top-k 写成一张表，
+在线对已知用户直接查表（web_api 的 /api/recommend/user/<name>）。
+
+    - 兴趣（preferences，如“美食,古镇”）一起向量化成查询矩阵，按块与文档矩阵相乘得到 画像×文档 的文本分
+    - 打分与在线重排相同：文本、热度、新近度、预算契合度、天数契合度加权求和（见 rerank），只是对全部文档打分
+    - 约束做成 画像×文档 的布尔掩码：费用 <= 预算、旅行时长 <= 可用天数、出发月份 = 旅行月份、人物匹配同行方式；
+      满足全部约束的不足 top_k 篇时依次放宽 月份 -> 天数 -> 同行方式（预算不放宽），表里记下放宽了哪些
+    - 结果：rows.npy（画像数×top_k 的行号，不足补 -1）、scores.npy，以及 meta.json（画像、索引版本等）；
+      行号对应建表时的索引版本，在线索引换了版本后用同样的打分和放宽规则对这一个画像实时重算（ProfileRecs.recompute）
+
+    python profile_recs.py profiles.jsonl [--data ../data/qunar_travel.csv] [--top-k 20]
+"""
+import json
+import os
+import shutil
+import tempfile
+import time
+
+import numpy as np
+
+from rerank import RERANK_WEIGHTS, budget_fit, duration_fit, recency_score
+from tokenizer import tokenize_query
+from travel_index import split_values, topk_rows
+
+PROFILE_RECS_FORMAT = 1
+TOP_K = 20
+# 满足全部约束的游记不足 top_k 篇时依次放宽的约束（预算始终保留）
+RELAX_ORDER = ['month', 'days', 'people']
+
+
+def default_recs_dir(csv_path):
+    base = os.path.dirname(os.path.abspath(csv_path))
+    name = os.path.splitext(os.path.basename(csv_path))[0]
+    return os.path.join(base, 'profile_recs', name)
+
+
+def _positive(value):
+    """
+    画像里的数值：空、NaN、非正数都视为没有这个约束
+    """
+    try:
+        value = float(value)
+    except (TypeError, ValueError):
+        return None
+    return value if value > 0 else None
+
+
+def profile_interests(profile):
+    return ' '.join(split_values(profile.get('preferences') or ''))
+
+
+class ConstraintMasks:
+    """
+    同行方式、月份的行掩码按取值缓存（画像里的取值种类很少）
+    """
+
+    def __init__(self, rec):
+        self.rec = rec
+        n = len(rec)
+        self.all_rows = np.ones(n, dtype=bool)
+        self.cache = {}
+
+    def facet_mask(self, name, values):
+        values = tuple(values)
+        if not values:
+            return self.all_rows
+        key = (name, values)
+        mask = self.cache.get(key)
+        if mask is None:
+            mask = np.zeros(len(self.all_rows), dtype=bool)
+            mask[self.rec.facets[name].match(list(values))] = True
+            self.cache[key] = mask
+        return mask
+
+    def people(self, accompany):
+        return self.facet_mask('people', [v for v in split_values(accompany or '') if v != '无'])
+
+    def month(self, month):
+        return self.facet_mask('month', [str(int(month))] if month else [])
+
+
+def score_block(rec, Qb, budgets, days, static):
+    """
+    一块画像对全部文档的综合得分 (块大小, 文档数)
+    """
+    weights = RERANK_WEIGHTS
+    S = weights['text'] * np.ascontiguousarray((rec.index.X @ Qb.T.toarray()).T)
+    S += static
+    numeric = rec.index.numeric
+    if not np.isnan(budgets).all():
+        # 没有预算的画像 budget 为 NaN，契合度为 0，与在线不传预算时一致
+        S += weights['budget'] * budget_fit(np.asarray(numeric['fee'])[None, :], budgets[:, None])
+    if not np.isnan(days).all():
+        S += weights['duration'] * duration_fit(np.asarray(numeric['days'])[None, :], days[:, None])
+    return S
+
+
+def constraint_levels(masks, profiles, budgets, days, fee, dur):
+    """
+    由宽到严的约束掩码 [预算, +同行方式, +天数, +月份]，形状 (4, 块大小, 文档数)
+    """
+    no_budget = np.isnan(budgets)[:, None]
+    level = (~np.isnan(fee)[None, :] & (fee[None, :] <= budgets[:, None])) | no_budget
+    levels = [level]
+    level = level & np.stack([masks.people(p.get('accompany')) for p in profiles])
+    levels.append(level)
+    level = level & ((~np.isnan(dur)[None, :] & (dur[None, :] <= days[:, None])) | np.isnan(days)[:, None])
+    levels.append(level)
+    level = level & np.stack([masks.month(_positive(p.get('travel_month'))) for p in profiles])
+    levels.append(level)
+    return np.stack(levels)
+
+
+def build_profile_recs(rec, profiles, top_k=TOP_K, max_block_bytes=256 << 20):
+    """
+    返回 (行号矩阵 int32, 得分矩阵 float32, 每个画像放宽的约束列表)
+    """
+    index = rec.index
+    n = len(index)
+    k = min(top_k, n)
+    queries = [tokenize_query(profile_interests(p)) for p in profiles]
+    Q = index.vectorize(queries)
+    budgets = np.array([_positive(p.get('budget')) or np.nan for p in profiles], dtype=np.float64)
+    days = np.array([_positive(p.get('travel_days')) or np.nan for p in profiles], dtype=np.float64)
+    fee = np.asarray(index.numeric['fee'], dtype=np.float64)
+    dur = np.asarray(index.numeric['days'], dtype=np.float64)
+    # 与画像无关的部分（热度、新近度）只算一次
+    static = RERANK_WEIGHTS['popularity'] * np.asarray(index.popularity, dtype=np.float64)
+    latest = index.meta.get('latest_date')
+    if latest is not None:
+        static = static + RERANK_WEIGHTS['recency'] * recency_score(np.asarray(index.numeric['date']), latest)
+    masks = ConstraintMasks(rec)
+    # 每个画像每篇文档：得分、两项契合度各 8 字节，四级约束掩码各 1 字节
+    block = max(1, int(max_block_bytes // (28 * max(n, 1))))
+    top_rows = np.full((len(profiles), k), -1, dtype=np.int32)
+    top_scores = np.zeros((len(profiles), k), dtype=np.float32)
+    relaxed = []
+    for start in range(0, len(profiles), block):
+        part = profiles[start:start + block]
+        b, d = budgets[start:start + block], days[start:start + block]
+        S = score_block(rec, Q[start:start + block], b, d, static)
+        levels = constraint_levels(masks, part, b, d, fee, dur)
+        counts = levels.sum(axis=2)
+        # 从最严的一级往宽里找，第一个够 k 篇的；都不够时用最宽的（只有预算）
+        enough = counts[::-1] >= k
+        chosen = np.where(enough.any(axis=0), len(levels) - 1 - enough.argmax(axis=0), 0)
+        allowed = levels[chosen, np.arange(len(part))]
+        S[~allowed] = -np.inf
+        idx = topk_rows(S, k)
+        vals = np.take_along_axis(S, idx, axis=1)
+        valid = np.isfinite(vals)
+        top_rows[start:start + len(part)] = np.where(valid, idx, -1)
+        top_scores[start:start + len(part)] = np.where(valid, vals, 0)
+        relaxed.extend(RELAX_ORDER[:len(levels) - 1 - c] for c in chosen.tolist())
+    return top_rows, top_scores, relaxed
+
+
+def save_profile_recs(out_dir, profiles, rows, scores, relaxed, index_version, source, top_k):
+    """
+    先写到同级临时目录再换上，读取方不会看到写了一半的表
+    """
+    parent = os.path.dirname(os.path.abspath(out_dir))
+    os.makedirs(parent, exist_ok=True)
+    tmp = tempfile.mkdtemp(prefix='.profile_recs-', dir=parent)
+    np.save(os.path.join(tmp, 'rows.npy'), rows)
+    np.save(os.path.join(tmp, 'scores.npy'), scores)
+    meta = {
+        'format': PROFILE_RECS_FORMAT,
+        'index_version': index_version,
+        'source': source,
+        'top_k': top_k,
+        'built_at': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'profiles': profiles,
+        'relaxed': relaxed,
+    }
+    with open(os.path.join(tmp, 'meta.json'), 'w', encoding='utf-8') as f:
+        json.dump(meta, f, ensure_ascii=False)
+    old = None
+    if os.path.exists(out_dir):
+        old = tmp + '.old'
+        os.replace(out_dir, old)
+    os.replace(tmp, out_dir)
+    if old:
+        shutil.rmtree(old, ignore_errors=True)
+
+
+class ProfileRecs:
+    """
+    已算好的画像推荐表，按用户名查
+    """
+
+    def __init__(self, meta, rows, scores):
+        self.meta = meta
+        self.rows = rows
+        self.scores = scores
+        self.positions = {str(p.get('name')): i for i, p in enumerate(meta['profiles'])}
+
+    @classmethod
+    def open(cls, path):
+        """
+        表不存在、格式不符或文件不完整时返回 None
+        """
+        try:
+            with open(os.path.join(path, 'meta.json'), encoding='utf-8') as f:
+                meta = json.load(f)
+            rows = np.load(os.path.join(path, 'rows.npy'))
+            scores = np.load(os.path.join(path, 'scores.npy'))
+        except (OSError, ValueError):
+            return None
+        if meta.get('format') != PROFILE_RECS_FORMAT or len(rows) != len(meta['profiles']):
+            return None
+        return cls(meta, rows, scores)
+
+    @property
+    def index_version(self):
+        return self.meta.get('index_version')
+
+    def __len__(self):
+        return len(self.positions)
+
+    def lookup(self, name, top_n=None):
+        """
+        返回 {'profile', 'rows', 'scores', 'relaxed'}；用户不在表里时返回 None
+        """
+        i = self.positions.get(str(name))
+        if i is None:
+            return None
+        return _entry(self.meta['profiles'][i], self.rows[i], self.scores[i], self.meta['relaxed'][i], top_n)
+
+    def recompute(self, rec, profile, top_n=None):
+        """
+        表是用旧版本索引算的时，用 rec 的当前索引按建表时相同的打分和约束放宽规则重算一个画像，返回格式同 lookup
+        """
+        rows, scores, relaxed = build_profile_recs(rec, [profile], top_k=self.meta.get('top_k', TOP_K))
+        return _entry(profile, rows[0], scores[0], relaxed[0], top_n)
+
+
+def _entry(profile, rows, scores, relaxed, top_n=None):
+    keep = rows >= 0
+    rows, scores = rows[keep][:top_n], scores[keep][:top_n]
+    return {'profile': profile, 'rows': rows.tolist(), 'scores': scores.tolist(), 'relaxed': relaxed}
+
+
+def refresh_profile_recs(profiles_path, csv_path, out_dir=None, top_k=TOP_K, index_dir=None):
+    from recommender import TravelRecommender
+    from user_profile import load_profiles
+    out_dir = out_dir or default_recs_dir(csv_path)
+    profiles = load_profiles(profiles_path)
+    rec = TravelRecommender(csv_path, index_dir)
+    t0 = time.perf_counter()
+    rows, scores, relaxed = build_profile_recs(rec, profiles, top_k)
+    elapsed = time.perf_counter() - t0
+    save_profile_recs(out_dir, profiles, rows, scores, relaxed, rec.index.version, os.path.abspath(csv_path), top_k)
+    n_relaxed = sum(1 for r in relaxed if r)
+    print(f"[画像推荐] {len(profiles)} 个画像 × {len(rec)} 篇，top {rows.shape[1]}，用时 {elapsed:.2f}s"
+          f"（{len(profiles) / max(elapsed, 1e-9):.0f} 个/秒），{n_relaxed} 个放宽了约束 -> {out_dir}")
+    return rows, scores, relaxed
+
+
+if __name__ == "__main__":
+    import argparse
+    parser = argparse.ArgumentParser(description="按用户画像离线批量推荐")
+    parser.add_argument("profiles", help="画像文件（.jsonl 或 .csv）")
+    parser.add_argument("--data", default=os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                                       "..", "data", "qunar_travel.csv"))
+    parser.add_argument("--out", default=None, help="输出目录，默认 data/profile_recs/<数据文件名>/")
+    parser.add_argument("--top-k", type=int, default=TOP_K)
+    args = parser.parse_args()
+    refresh_profile_recs(args.profiles, args.data, args.out, args.top_k)
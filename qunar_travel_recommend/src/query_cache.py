@@ -0,0 +1,136 @@
+"""
+推荐接口的响应缓存：
+
+    - 键为规范化后的查询参数：兴趣/主题/人物/城市按分隔符切开、去空白、去重后排序，
+      预算按原值（统一成 float），再加上天数和 top_n
+    - 容量有上限，按最近使用淘汰（LRU）；每条缓存有 TTL
+    - 记录生成时的索引版本，索引版本变化时整体失效
+    - 缓存的是序列化好的响应体和它的 ETag，命中时不再序列化
+
+计算结果时也要用规范化后的参数，保证同一个键对应的响应完全相同。预算既是硬过滤（费用 <= 预算）又参与契合度打分，
+不能合并到档位里：按档位算会混入超出预算的游记或漏掉预算内的，只有完全相同的预算才共用一条缓存。
+"""
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+
+from recommender import split_values
+
+DEFAULT_MAX_ENTRIES = 1024
+DEFAULT_TTL = 300
+
+
+def normalize_terms(text):
+    return " ".join(sorted(set(split_values(text))))
+
+
+def normalize_budget(budget):
+    """
+    预算统一成 float（200 和 200.0 是同一个键）；空、<= 0 或 NaN 视为不限
+    """
+    if budget is None or not budget > 0:
+        return None
+    return float(budget)
+
+
+def normalize_query(interests="", theme="", people="", city="", budget=None, days=None, top_n=5):
+    """
+    返回规范化后的参数字典，可直接传给 TravelRecommender.recommend，也用来生成缓存键
+    """
+    return {
+        'interests': normalize_terms(interests),
+        'theme': normalize_terms(theme),
+        'people': normalize_terms(people),
+        'city': normalize_terms(city),
+        'budget': normalize_budget(budget),
+        'days': days if days and days > 0 else None,
+        'top_n': top_n,
+    }
+
+
+def cache_key(query):
+    return tuple(query[k] for k in sorted(query))
+
+
+class CachedResponse:
+    def __init__(self, body, expires_at, results=None):
+        self.body = body
+        # 响应里的推荐条数（指标统计用，命中缓存时不必再解析响应体）
+        self.results = results
+        self.etag = hashlib.sha1(body).hexdigest()
+        self.expires_at = expires_at
+
+    def max_age(self, now=None):
+        return max(0, int(self.expires_at - (now or time.monotonic())))
+
+
+class QueryCache:
+    """
+    线程安全的 LRU + TTL 响应缓存，按索引版本整体失效
+    """
+
+    def __init__(self, max_entries=DEFAULT_MAX_ENTRIES, ttl=DEFAULT_TTL):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.entries = OrderedDict()
+        self.version = None
+        self.lock = threading.Lock()
+        self.hits = self.misses = self.evictions = self.expirations = self.invalidations = 0
+
+    def _check_version(self, version):
+        if version != self.version:
+            if self.entries:
+                self.invalidations += 1
+            self.entries.clear()
+            self.version = version
+
+    def get(self, key, version):
+        with self.lock:
+            self._check_version(version)
+            entry = self.entries.get(key)
+            if entry is not None and entry.expires_at <= time.monotonic():
+                del self.entries[key]
+                self.expirations += 1
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return None
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return entry
+
+    def put(self, key, version, body, results=None):
+        """
+        存入序列化好的响应体（bytes），返回 CachedResponse；生成期间索引版本已变化的结果不缓存
+        """
+        entry = CachedResponse(body, time.monotonic() + self.ttl, results)
+        with self.lock:
+            if version != self.version:
+                return entry
+            self.entries[key] = entry
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+                self.evictions += 1
+        return entry
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+
+    def stats(self):
+        with self.lock:
+            total = self.hits + self.misses
+            return {
+                'version': self.version,
+                'size': len(self.entries),
+                'max_entries': self.max_entries,
+                'ttl': self.ttl,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': round(self.hits / total, 4) if total else None,
+                'evictions': self.evictions,
+                'expirations': self.expirations,
+                'invalidations': self.invalidations,
+            }
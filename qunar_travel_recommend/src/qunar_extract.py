@@ -0,0 +1,286 @@
+"""
+游记列表页解析器，两种后端输出完全相同的 13 字段记录：
+    - bs4：BeautifulSoup 逐条 find/find_all（原实现）
+    - fast：基于 html.parser 的单遍事件解析，只在 li.list_item 内按需收集文本，不做重复的子树搜索
+
+正则统一预编译，两个后端共用。
+"""
+import re
+from html.parser import HTMLParser
+
+from bs4 import BeautifulSoup
+
+DATE_RE = re.compile(r"(\d{4}-\d{2}-\d{2}) 出发")
+DAYS_RE = re.compile(r"共(\d+)天")
+FEE_RE = re.compile(r"人均(\d+)元")
+PEOPLE_RE = re.compile(r"(独自一人|三五好友|亲子|家庭|情侣|闺蜜|学生)")
+NON_DIGIT_RE = re.compile(r"\D")
+HOST = "https://travel.qunar.com"
+COUNTER_CLASSES = ("icon_view", "icon_love", "icon_comment")
+VOID_TAGS = {"area", "base", "br", "col", "embed", "hr", "img", "input",
+             "link", "meta", "param", "source", "track", "wbr"}
+
+
+def parse_num(s):
+    """
+    解析数字，如“3.4万”转成34000
+    """
+    if not s: return None
+    s = s.replace(',','').replace(' ', '')
+    if '万' in s:
+        try:
+            return int(float(s.replace('万', '')) * 10000)
+        except:
+            return 0
+    try:
+        return int(NON_DIGIT_RE.sub('', s))
+    except:
+        return 0
+
+
+def _intro_fields(intro_text):
+    intro_text = intro_text.replace('\xa0', ' ')
+    date_match = DATE_RE.search(intro_text)
+    days_match = DAYS_RE.search(intro_text)
+    fee_match = FEE_RE.search(intro_text)
+    people_match = PEOPLE_RE.search(intro_text)
+    return (date_match.group(1) if date_match else "",
+            days_match.group(1) if days_match else "",
+            fee_match.group(1) if fee_match else "",
+            people_match.group(1) if people_match else "")
+
+
+def _record(title, link, author, date, days, fee, people, trip, view, like, comment, dest, itinerary):
+    if link and not link.startswith("http"):
+        link = HOST + link
+    return {
+        "标题": title,
+        "链接": link,
+        "作者": author,
+        "出发时间": date,
+        "天数": days,
+        "费用": fee,
+        "人物": people,
+        "主题": trip,
+        "浏览": view,
+        "点赞": like,
+        "评论": comment,
+        "目的地": dest,
+        "行程": itinerary,
+    }
+
+
+# ----------- bs4 后端 -----------
+def extract_bs4(html):
+    soup = BeautifulSoup(html, "html.parser")
+    result = []
+    ul = soup.find("ul", class_="b_strategy_list")
+    if not ul:
+        print("未找到攻略列表")
+        return []
+    for li in ul.find_all("li", class_="list_item"):
+        title_tag = li.find("h2", class_="tit")
+        title = title_tag.a.get_text(strip=True) if title_tag and title_tag.a else ""
+        link = title_tag.a['href'] if title_tag and title_tag.a and title_tag.a.has_attr('href') else ""
+        author_a = li.find("span", class_="user_name")
+        author = author_a.get_text(strip=True) if author_a else ""
+        intro = li.find("span", class_="intro")
+        date, days, fee, people, trip = "", "", "", "", ""
+        if intro:
+            date, days, fee, people = _intro_fields(intro.text)
+            trip_find = intro.find("span", class_="trip")
+            if trip_find:
+                trip = trip_find.get_text(strip=True).replace('\xa0', ' ').replace(' ', ' ')
+        counters = []
+        for cls in COUNTER_CLASSES:
+            num = li.find("span", class_=cls)
+            spans = num.find_all("span") if num else []
+            counters.append(parse_num(spans[1].text if len(spans) > 1 else "") if num else 0)
+        p_places = li.find_all("p", class_="places")
+        dest, itinerary = "", ""
+        for p in p_places:
+            if "途经" in p.get_text():
+                dest = p.get_text(strip=True).replace('途经：','')
+                break
+        for p in p_places:
+            if "行程" in p.get_text():
+                itinerary = p.get_text(strip=True).replace('行程：','')
+                break
+        result.append(_record(title, link, author, date, days, fee, people, trip,
+                              counters[0], counters[1], counters[2], dest, itinerary))
+    return result
+
+
+# ----------- fast 后端 -----------
+class _Capture:
+    """
+    收集某个元素内的文本：depth 为该元素在栈中的深度，元素闭合时结束
+    """
+    __slots__ = ("depth", "parts")
+
+    def __init__(self, depth):
+        self.depth = depth
+        self.parts = []
+
+    def raw(self):
+        return "".join(self.parts)
+
+    def stripped(self):
+        return "".join(p.strip() for p in self.parts)
+
+
+class _ListPageParser(HTMLParser):
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.stack = []
+        self.found_list = False
+        self.in_list = False
+        self.list_depth = 0
+        self.items = []
+        self.item = None
+        self.captures = []
+
+    def _open(self, depth):
+        cap = _Capture(depth)
+        self.captures.append(cap)
+        return cap
+
+    def _is_open(self, cap):
+        return cap is not None and cap.depth <= len(self.stack) and cap in self.captures
+
+    def handle_starttag(self, tag, attrs):
+        if tag in VOID_TAGS:
+            return
+        self.stack.append(tag)
+        depth = len(self.stack)
+        classes = ()
+        for k, v in attrs:
+            if k == "class" and v:
+                classes = v.split()
+                break
+        if not self.in_list:
+            if tag == "ul" and not self.found_list and "b_strategy_list" in classes:
+                self.found_list = self.in_list = True
+                self.list_depth = depth
+            return
+        item = self.item
+        if tag == "li" and "list_item" in classes:
+            # 列表页常省略 </li>：新的一条开始时结束上一条。bs4 后端此时把后一条嵌在前一条内，
+            # 前一条缺的目的地/行程会取到后一条的；这里有意不跟随（见 data/fixtures/quirks）
+            if item is not None:
+                self._finish_item()
+                item = None
+                # 每条游记的收集状态：各字段对应元素的文本收集器，只记第一个匹配
+            self.item = {"depth": depth, "h2": None, "title": None, "link": "", "author": None,
+                         "intro": None, "trip": None, "counters": {}, "places": []}
+            return
+        if item is None:
+            return
+        if tag == "span":
+            # 计数元素内的第 2 个 span 是数值
+            for counter in item["counters"].values():
+                if counter[2] is None and self._is_open(counter[0]):
+                    counter[1] += 1
+                    if counter[1] == 2:
+                        counter[2] = self._open(depth)
+            if not classes:
+                return
+            if item["author"] is None and "user_name" in classes:
+                item["author"] = self._open(depth)
+            if item["intro"] is None and "intro" in classes:
+                item["intro"] = self._open(depth)
+            if item["trip"] is None and "trip" in classes and self._is_open(item["intro"]):
+                item["trip"] = self._open(depth)
+            for cls in COUNTER_CLASSES:
+                if cls in classes and cls not in item["counters"]:
+                    item["counters"][cls] = [self._open(depth), 0, None]
+        elif tag == "a":
+            if item["title"] is None and self._is_open(item["h2"]):
+                item["title"] = self._open(depth)
+                item["link"] = next((v or "" for k, v in attrs if k == "href"), "")
+        elif tag == "h2":
+            if item["h2"] is None and "tit" in classes:
+                item["h2"] = self._open(depth)
+        elif tag == "p":
+            if "places" in classes:
+                item["places"].append(self._open(depth))
+
+    def handle_data(self, data):
+        for cap in self.captures:
+            cap.parts.append(data)
+
+    def handle_endtag(self, tag):
+        if tag in VOID_TAGS:
+            return
+        # 与 html.parser 树构建器一致：弹到最近的同名开放元素，找不到则忽略
+        for i in range(len(self.stack) - 1, -1, -1):
+            if self.stack[i] == tag:
+                break
+        else:
+            return
+        del self.stack[i:]
+        depth = len(self.stack)
+        if self.captures:
+            self.captures = [c for c in self.captures if c.depth <= depth]
+        if self.item is not None and self.item["depth"] > depth:
+            self._finish_item()
+        if self.in_list and self.list_depth > depth:
+            self.in_list = False
+
+    def _finish_item(self):
+        item = self.item
+        self.item = None
+        # 上一条里没闭合的元素不再收集文本
+        self.captures = []
+        title = item["title"].stripped() if item["title"] else ""
+        author = item["author"].stripped() if item["author"] else ""
+        date, days, fee, people, trip = "", "", "", "", ""
+        if item["intro"] is not None:
+            date, days, fee, people = _intro_fields(item["intro"].raw())
+            if item["trip"] is not None:
+                trip = item["trip"].stripped().replace('\xa0', ' ')
+        counters = []
+        for cls in COUNTER_CLASSES:
+            counter = item["counters"].get(cls)
+            if counter is None:
+                counters.append(0)
+            else:
+                counters.append(parse_num(counter[2].raw() if counter[2] is not None else ""))
+        dest, itinerary = "", ""
+        for p in item["places"]:
+            if "途经" in p.raw():
+                dest = p.stripped().replace('途经：', '')
+                break
+        for p in item["places"]:
+            if "行程" in p.raw():
+                itinerary = p.stripped().replace('行程：', '')
+                break
+        self.items.append(_record(title, item["link"], author, date, days, fee, people, trip,
+                                  counters[0], counters[1], counters[2], dest, itinerary))
+
+    def close(self):
+        super().close()
+        if self.item is not None:
+            self._finish_item()
+
+
+def extract_fast(html):
+    parser = _ListPageParser()
+    parser.feed(html)
+    parser.close()
+    if not parser.found_list:
+        print("未找到攻略列表")
+        return []
+    return parser.items
+
+
+EXTRACTORS = {
+    "bs4": extract_bs4,
+    "fast": extract_fast,
+}
+
+
+def get_extractor(name="fast"):
+    if name not in EXTRACTORS:
+        raise ValueError(f"未知的解析后端: {name}，可选 {sorted(EXTRACTORS)}")
+    return EXTRACTORS[name]
@@ -0,0 +1,145 @@
+"""
+本地桩服务：按去哪儿游记列表页的HTML结构提供保存好的页面，用于离线测试爬虫和解析器。
+
+    python qunar_stub_server.py --write-fixtures   # 由 qunar_travel.csv 生成 data/fixtures/page_NNNN.html
+    python qunar_stub_server.py --port 8765        # 启动服务
+
+爬虫指向桩服务：
+    crawl_qunar_travelbooks(max_pages=10, base_url="http://127.0.0.1:8765/travelbook/list.htm?page={}&order=hot_heat")
+"""
+import argparse
+import html
+import os
+import threading
+import zlib
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlparse, parse_qs
+
+import pandas as pd
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+FIXTURE_DIR = os.path.join(BASE_DIR, "data", "fixtures")
+SOURCE_CSV = os.path.join(BASE_DIR, "data", "qunar_travel.csv")
+
+
+def _text(v):
+    if v is None or (isinstance(v, float) and pd.isna(v)):
+        return ""
+    if isinstance(v, float) and v.is_integer():
+        v = int(v)
+    return html.escape(str(v))
+
+
+def _counter(seed, scale):
+    """
+    CSV 里计数常为空，按链接生成稳定的计数，超过一万时用“x.x万”的写法
+    """
+    n = zlib.crc32(seed.encode("utf-8")) % scale
+    return f"{n / 10000:.1f}万" if n >= 10000 else str(n)
+
+
+def render_item(r):
+    link = _text(r.get("链接")).replace("https://travel.qunar.com", "")
+    intro = [f'<span class="user_name"><a href="/space/1">{_text(r.get("作者"))}</a></span>']
+    if _text(r.get("出发时间")):
+        intro.append(f'<span class="date">{_text(r.get("出发时间"))}&nbsp;出发</span>')
+    if _text(r.get("天数")):
+        intro.append(f'<span class="days">共{_text(r.get("天数"))}天</span>')
+    if _text(r.get("费用")):
+        intro.append(f'<span class="fee">人均{_text(r.get("费用"))}元</span>')
+    if _text(r.get("人物")):
+        intro.append(f'<span class="people">{_text(r.get("人物"))}</span>')
+    if _text(r.get("主题")) and _text(r.get("主题")) != "无":
+        themes = "&nbsp;".join(_text(t) for t in str(r.get("主题")).split())
+        intro.append(f'<span class="trip">{themes}</span>')
+    places = []
+    if _text(r.get("目的地")):
+        cities = "<span>&gt;</span>".join(f'<a href="/p-cs1">{_text(c)}</a>' for c in str(r["目的地"]).split(">"))
+        places.append(f'<p class="places">途经：{cities}</p>')
+    if _text(r.get("行程")):
+        places.append(f'<p class="places">行程：{_text(r.get("行程"))}</p>')
+    seed = _text(r.get("链接"))
+    nums = "".join(
+        f'<span class="{cls}"><span class="iconfont">&#xe6{i};</span><span>{_counter(seed + cls, scale)}</span></span>'
+        for i, (cls, scale) in enumerate([("icon_view", 60000), ("icon_love", 500), ("icon_comment", 80)]))
+    return (
+        '<li class="list_item ">\n'
+        f'  <h2 class="tit"><a href="{link}" target="_blank">{_text(r.get("标题"))}</a></h2>\n'
+        f'  <p class="user_info"><span class="intro">{" ".join(intro)}</span></p>\n'
+        f'  {"".join(places)}\n'
+        f'  <p class="nums">{nums}</p>\n'
+        '</li>'
+    )
+
+
+def render_list_page(records):
+    items = "\n".join(render_item(r) for r in records)
+    return (
+        '<!DOCTYPE html>\n<html><head><meta charset="utf-8"><title>游记列表</title></head>\n'
+        '<body><div class="b_strategy_wrap">\n'
+        f'<ul class="b_strategy_list">\n{items}\n</ul>\n'
+        '</div></body></html>\n'
+    )
+
+
+def write_fixtures(csv_path=SOURCE_CSV, out_dir=FIXTURE_DIR, per_page=10, pages=10):
+    df = pd.read_csv(csv_path, encoding="utf-8-sig")
+    os.makedirs(out_dir, exist_ok=True)
+    records = df.to_dict("records")
+    for page in range(1, pages + 1):
+        chunk = records[(page - 1) * per_page:page * per_page]
+        if not chunk:
+            break
+        with open(os.path.join(out_dir, f"page_{page:04d}.html"), "w", encoding="utf-8") as f:
+            f.write(render_list_page(chunk))
+    print(f"已生成 {page} 页样例到 {out_dir}")
+
+
+def make_server(fixture_dir=FIXTURE_DIR, port=0, fail_first=0):
+    """
+    启动桩服务（后台线程），返回 (server, base_url)。
+    fail_first>0 时每页的前 fail_first 次请求返回 503，用于测试重试。
+    """
+    attempts = {}
+    lock = threading.Lock()
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            url = urlparse(self.path)
+            page = int(parse_qs(url.query).get("page", ["1"])[0])
+            with lock:
+                attempts[page] = attempts.get(page, 0) + 1
+                n = attempts[page]
+            if n <= fail_first:
+                self.send_error(503)
+                return
+            path = os.path.join(fixture_dir, f"page_{page:04d}.html")
+            body = (open(path, "rb").read() if os.path.exists(path)
+                    else render_list_page([]).encode("utf-8"))
+            self.send_response(200)
+            self.send_header("Content-Type", "text/html; charset=utf-8")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", port), Handler)
+    server.attempts = attempts
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base_url = f"http://127.0.0.1:{server.server_address[1]}/travelbook/list.htm?page={{}}&order=hot_heat"
+    return server, base_url
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="去哪儿游记列表桩服务")
+    parser.add_argument("--write-fixtures", action="store_true")
+    parser.add_argument("--port", type=int, default=8765)
+    args = parser.parse_args()
+    if args.write_fixtures:
+        write_fixtures()
+    else:
+        server, base_url = make_server(port=args.port)
+        print("桩服务已启动:", base_url)
+        threading.Event().wait()
@@ -0,0 +1,213 @@
+"""
+TravelRecommender：基于 TF-IDF 索引的游记查询引擎。
+
+人物、主题词、目的地城市、旅行月份的倒排表（取值 -> 升序行号数组）随索引一起构建和持久化，
+加载时直接是内存映射数组上的切片。多条件过滤先做倒排表求交，只对命中的行做文本打分，
+查询代价取决于命中行数而不是语料规模。
+"""
+import json
+
+import numpy as np
+
+from metrics import NULL_TRACE
+from rerank import retrieve_rerank, retrieve_rerank_many
+from route_graph import route_search
+from tokenizer import tokenize_query
+from travel_index import CITY_SEP, FILTER_SEP, intersect_postings, load_or_build_index, split_values
+# 前端/画像里常见的同行方式说法 -> 游记中的人物取值
+PEOPLE_ALIASES = {
+    '朋友': '三五好友',
+    '好友': '三五好友',
+    '独自': '独自一人',
+    '一个人': '独自一人',
+    '家人': '家庭',
+    '孩子': '亲子',
+}
+# 拼接 JSON 时补在预序列化片段后的推荐理由键
+REASON_KEY = ', "推荐理由": '.encode('utf-8')
+
+
+class FacetIndex:
+    """
+    单个字段的倒排索引。查询值先精确匹配，找不到时匹配包含该值的取值（如“朋友”->“三五好友”）。
+    包含匹配走加载时建好的字符 n-gram 表（单字、相邻两字 -> 取值号），只核对与查询值共有这些 n-gram 的取值，
+    代价与命中的取值数有关，与取值总数无关；别名在加载时就解析成行号
+    """
+
+    def __init__(self, values, indptr, rows, aliases=None):
+        # 每个取值对应 rows 上的一段切片，不复制
+        self.values = list(values)
+        self.postings = {v: rows[indptr[k]:indptr[k + 1]] for k, v in enumerate(self.values)}
+        self.grams = {}
+        for k, v in enumerate(self.values):
+            for g in set(v) | set(v[j:j + 2] for j in range(len(v) - 1)):
+                self.grams.setdefault(g, []).append(k)
+        self.aliases = {a: self._resolve(v) for a, v in (aliases or {}).items()}
+
+    def _resolve(self, value):
+        rows = self.postings.get(value)
+        if rows is not None:
+            return rows
+        if not value:
+            # 空串包含于任何取值
+            return np.unique(np.concatenate(list(self.postings.values()))) if self.postings else np.empty(0, np.int32)
+        # 查询值的每个 n-gram 都必须出现在取值里：从最短的那张表开始求交，再逐个确认包含关系
+        grams = set(value[j:j + 2] for j in range(len(value) - 1)) or {value}
+        lists = sorted((self.grams.get(g, ()) for g in grams), key=len)
+        ids = set(lists[0])
+        for other in lists[1:]:
+            if not ids:
+                break
+            ids.intersection_update(other)
+        hits = [self.postings[self.values[k]] for k in sorted(ids) if value in self.values[k]]
+        if not hits:
+            return np.empty(0, dtype=np.int32)
+        if len(hits) == 1:
+            return hits[0]
+        return np.unique(np.concatenate(hits))
+
+    def lookup(self, value):
+        rows = self.aliases.get(value)
+        if rows is not None:
+            return rows
+        return self._resolve(value)
+
+    def match(self, values):
+        """
+        同一字段的多个取值取并集
+        """
+        lists = [self.lookup(v) for v in values]
+        if len(lists) == 1:
+            return lists[0]
+        return np.unique(np.concatenate(lists))
+
+
+class TravelRecommender:
+    def __init__(self, csv_path, index_dir=None, verify=True, index=None):
+        """
+        index 给出时直接使用（如多进程服务里各进程挂载同一份已构建好的索引），否则加载或构建
+        """
+        self.csv_path = csv_path
+        self.index = index if index is not None else load_or_build_index(csv_path, index_dir, verify=verify)
+        aliases = {'people': PEOPLE_ALIASES}
+        self.facets = {name: FacetIndex(*csr, aliases=aliases.get(name))
+                       for name, csr in self.index.facets.items()}
+
+    def __len__(self):
+        return len(self.index)
+
+    def candidates(self, theme="", people="", city="", month=None, budget=None):
+        """
+        倒排表求交得到候选行号；没有任何过滤条件时返回 None（表示全部行）
+        """
+        lists = []
+        for name, text in [('people', people), ('theme', theme), ('city', city)]:
+            values = [v for v in split_values(text) if v != '无']
+            if values:
+                lists.append(self.facets[name].match(values))
+        if month:
+            lists.append(self.facets['month'].match([str(int(m)) for m in split_values(month)]))
+        rows = intersect_postings(lists)
+        if budget is not None and budget > 0:
+            fee = self.index.numeric['fee']
+            if rows is None:
+                rows = np.flatnonzero(~np.isnan(fee) & (fee <= budget)).astype(np.int32)
+            else:
+                f = fee[rows]
+                rows = rows[~np.isnan(f) & (f <= budget)]
+        return rows
+
+    def recommend(self, interests="", theme="", people="", city="", budget=None, top_n=5, month=None, days=None,
+                  trace=NULL_TRACE):
+        """
+        trace（metrics.start_trace()）依次记录 filter / tokenize / vectorize / retrieve / rerank / format 各阶段耗时
+        """
+        hits = self.recommend_rows(interests, theme, people, city, budget, top_n, month, days, trace)
+        results = [self.format_result(i, interests, city=city) for i in hits]
+        trace.mark('format')
+        return results
+
+    def recommend_json(self, interests="", theme="", people="", city="", budget=None, top_n=5, month=None, days=None,
+                       trace=NULL_TRACE):
+        """
+        与 recommend 相同，但直接返回 (JSON 数组字节串, 结果条数)：结果字段用建索引时序列化好的片段拼接，不解析成 dict
+        """
+        hits = self.recommend_rows(interests, theme, people, city, budget, top_n, month, days, trace)
+        body = self.results_json(hits, interests, city=city)
+        trace.mark('format')
+        return body, len(hits)
+
+    def recommend_rows(self, interests="", theme="", people="", city="", budget=None, top_n=5, month=None, days=None,
+                       trace=NULL_TRACE):
+        rows = self.candidates(theme=theme, people=people, city=city, month=month, budget=budget)
+        trace.mark('filter')
+        if rows is not None and rows.size == 0:
+            return np.empty(0, dtype=np.int64)
+        query = " ".join(v for v in [interests, theme] if v and v.strip())
+        tokens = tokenize_query(query)
+        trace.mark('tokenize')
+        user_vec = self.index.vectorize([tokens])
+        trace.mark('vectorize')
+        # 召回（文本前若干篇 + 热度兜底）后重排；过滤后的候选行号直接作为允许集合
+        hits, _ = retrieve_rerank(self.index, user_vec, top_n, rows=rows, budget=budget, days=days, trace=trace)
+        return hits
+
+    def recommend_many(self, queries, top_n=5, budget=None):
+        """
+        批量推荐：所有兴趣串一起分词、向量化，预算过滤的候选行只算一次，文本得分按查询分块用稀疏矩阵乘法
+        一起算出，再逐条重排（rerank.retrieve_rerank_many）。同样的兴趣串和预算得到的结果与 recommend 一致，
+        返回与 queries 一一对应的推荐列表
+        """
+        queries = [str(q).strip() for q in queries]
+        rows = self.candidates(budget=budget)
+        if not queries or (rows is not None and rows.size == 0):
+            return [[] for _ in queries]
+        Q = self.index.vectorize([tokenize_query(q) for q in queries])
+        ranked = retrieve_rerank_many(self.index, Q, top_n, rows=rows, budget=budget)
+        return [[self.format_result(i, q) for i in hits] for q, (hits, _) in zip(queries, ranked)]
+
+    def routes(self, through="", kind="city", ordered=False, stops=None, days=None, loop=None, top_n=10):
+        """
+        按路线条件找游记（经过哪些站点、几站、几天、是否环线），按热度排序；推荐理由给出完整路线
+        """
+        names = [v for v in split_values(through, CITY_SEP if '>' in str(through) else FILTER_SEP) if v]
+        hits = route_search(self.index, kind, names, ordered=ordered, n_stops=stops, days=days, loop=loop,
+                            top_n=top_n)
+        graph = self.index.routes[kind]
+        results = []
+        for i in hits:
+            result = self.format_result(i, "")
+            result['推荐理由'] = f"路线：{'>'.join(graph.route(i))}"
+            results.append(result)
+        return results
+
+    def next_stops(self, stop, kind="city", k=10):
+        return [{'站点': name, '游记数': count} for name, count in self.index.routes[kind].next_stops(stop, k)]
+
+    def format_result(self, i, interests, city=""):
+        result = self.index.docs[i]
+        result['推荐理由'] = self.recommend_reason(interests, i, city=city)
+        return result
+
+    def result_json(self, i, interests, city=""):
+        """
+        预先序列化的结果片段（以“}”结尾）末尾补上推荐理由
+        """
+        reason = json.dumps(self.recommend_reason(interests, i, city=city), ensure_ascii=False)
+        return self.index.result_fragment(i)[:-1] + REASON_KEY + reason.encode('utf-8') + b'}'
+
+    def results_json(self, hits, interests, city=""):
+        return b'[' + b', '.join(self.result_json(i, interests, city=city) for i in hits) + b']'
+
+    def recommend_reason(self, interests, i, city=""):
+        reasons = []
+        # 查询分词走缓存，文档词集合在建索引时已算好，这里不再分词
+        hit = self.index.matched_terms(interests, i) if interests else []
+        if hit:
+            reasons.append(f"匹配兴趣词：{'、'.join(hit)}")
+        # 途经城市从路线图里取（建索引时已解析好），不用解码整行
+        route = '>'.join(self.index.routes['city'].route(i)) if city else ''
+        cities = [c for c in split_values(city) if c in route]
+        if cities:
+            reasons.append(f"途经：{'、'.join(cities)}")
+        return "；".join(reasons) if reasons else "为您推荐热门游记"
@@ -0,0 +1,134 @@
+"""
+两阶段推荐：召回 + 重排。
+
+    1. 召回：文本得分前 TEXT_CANDIDATES 篇（倒排索引检索，只取得分 > 0 的），
+       再并上按热度预先排好序的兜底列表中前 POPULAR_CANDIDATES 篇（均满足过滤条件）
+    2. 重排：对候选集合一次性用 NumPy 计算各项特征并加权求和
+         文本相关度（余弦）、热度（浏览/点赞/评论）、新近度（出发时间）、预算契合度、天数契合度
+
+每次推荐的开销只与候选数有关，与语料规模无关；没有文本匹配时自然按热度等特征排序。
+批量推荐（retrieve_rerank_many）的文本得分按查询分块用一次稀疏矩阵乘法算出，再逐条重排，结果与逐条调用相同。
+"""
+import numpy as np
+
+from metrics import NULL_TRACE
+from travel_index import topk
+
+TEXT_CANDIDATES = 200
+POPULAR_CANDIDATES = 50
+RERANK_WEIGHTS = {'text': 1.0, 'popularity': 0.2, 'recency': 0.1, 'budget': 0.1, 'duration': 0.1}
+# 新近度半衰期：出发时间比数据里最新的一篇早这么多天，新近度减半
+RECENCY_HALF_LIFE_DAYS = 365
+# 天数契合度：与期望天数每差这么多天，契合度降为 1/e
+DURATION_SCALE_DAYS = 2.0
+
+
+def popular_rows(index, need, mask=None, rows=None):
+    """
+    兜底列表中满足过滤条件的前 need 篇。给出 rows 时直接在 rows 里按热度取前 need 个；
+    给出 mask 时按热度顺序分段扫描，凑够就停
+    """
+    if need <= 0:
+        return np.empty(0, dtype=np.int64)
+    if rows is not None:
+        rows = np.asarray(rows, dtype=np.int64)
+        return rows[topk(np.asarray(index.popularity[rows]), need)]
+    order = index.popular
+    if mask is None:
+        return np.asarray(order[:need], dtype=np.int64)
+    found, start, chunk = [], 0, max(4 * need, 256)
+    while start < len(order) and sum(len(f) for f in found) < need:
+        part = np.asarray(order[start:start + chunk], dtype=np.int64)
+        found.append(part[mask[part]])
+        start += chunk
+        chunk *= 2
+    return np.concatenate(found)[:need] if found else np.empty(0, dtype=np.int64)
+
+
+def _feature(index, name, cand):
+    values = index.numeric.get(name)
+    if values is None:
+        return np.full(len(cand), np.nan)
+    return np.asarray(values[cand], dtype=np.float64)
+
+
+def recency_score(date, latest):
+    return np.nan_to_num(0.5 ** ((latest - date) / RECENCY_HALF_LIFE_DAYS), nan=0.0)
+
+
+def budget_fit(fee, budget):
+    """
+    预算契合度；fee、budget 可以是可广播的数组（如 (1, N) 与 (B, 1)）
+    """
+    return np.nan_to_num(np.clip(1 - np.abs(fee - budget) / budget, 0, 1), nan=0.0)
+
+
+def duration_fit(dur, days):
+    return np.nan_to_num(np.exp(-np.abs(dur - days) / DURATION_SCALE_DAYS), nan=0.0)
+
+
+def rerank_features(index, cand, text_scores, budget=None, days=None):
+    """
+    候选集合的各项特征，均在 [0, 1] 内，缺失值记 0。返回 {特征名: 数组}
+    """
+    features = {'text': text_scores, 'popularity': np.asarray(index.popularity[cand], dtype=np.float64)}
+    latest = index.meta.get('latest_date')
+    if latest is not None:
+        features['recency'] = recency_score(_feature(index, 'date', cand), latest)
+    if budget is not None and budget > 0:
+        features['budget'] = budget_fit(_feature(index, 'fee', cand), budget)
+    if days is not None and days > 0:
+        features['duration'] = duration_fit(_feature(index, 'days', cand), days)
+    return features
+
+
+def retrieve_rerank(index, query_vec, top_n=5, mask=None, rows=None, budget=None, days=None,
+                    n_text=TEXT_CANDIDATES, n_popular=POPULAR_CANDIDATES, weights=RERANK_WEIGHTS, trace=NULL_TRACE):
+    """
+    召回 + 重排，返回 (行号数组, 综合得分数组)。mask/rows 为过滤条件（与 TravelIndex.search 相同），
+    budget/days 只影响契合度特征，不做硬过滤；trace 记录 retrieve / rerank 两个阶段的耗时
+    """
+    if rows is not None and len(rows) == 0:
+        return np.empty(0, dtype=np.int64), np.empty(0)
+    hits, scores = index.search(query_vec, n_text, mask=mask, rows=rows, fill=False)
+    popular = popular_rows(index, max(n_popular, top_n), mask=mask, rows=rows)
+    trace.mark('retrieve')
+    result = rerank(index, hits, scores, popular, top_n, budget=budget, days=days, weights=weights)
+    trace.mark('rerank')
+    return result
+
+
+def retrieve_rerank_many(index, query_mat, top_n=5, mask=None, rows=None, budget=None, days=None,
+                         n_text=TEXT_CANDIDATES, n_popular=POPULAR_CANDIDATES, weights=RERANK_WEIGHTS,
+                         max_block_bytes=64 << 20):
+    """
+    批量召回 + 重排：全部查询的文本得分由 TravelIndex.search_many 分块计算（每块稠密分数不超过 max_block_bytes），
+    热度兜底列表只取一次，再逐条重排。每条结果与 retrieve_rerank 相同，返回 [(行号数组, 综合得分数组)]
+    """
+    n_queries = query_mat.shape[0]
+    if rows is not None and len(rows) == 0:
+        return [(np.empty(0, dtype=np.int64), np.empty(0)) for _ in range(n_queries)]
+    top_idx, top_scores = index.search_many(query_mat, n_text, mask=mask, rows=rows,
+                                            max_block_bytes=max_block_bytes)
+    popular = popular_rows(index, max(n_popular, top_n), mask=mask, rows=rows)
+    results = []
+    for hits, scores in zip(top_idx, top_scores):
+        # 与 search(fill=False) 相同，只取得分 > 0 的
+        positive = scores > 0
+        results.append(rerank(index, hits[positive], scores[positive], popular, top_n,
+                              budget=budget, days=days, weights=weights))
+    return results
+
+
+def rerank(index, hits, scores, popular, top_n=5, budget=None, days=None, weights=RERANK_WEIGHTS):
+    """
+    文本召回 (hits, scores) 并上热度兜底 popular 后加权重排，返回前 top_n 的 (行号数组, 综合得分数组)
+    """
+    cand, first = np.unique(np.concatenate([hits, popular]), return_index=True)
+    text = np.concatenate([scores, np.zeros(len(popular))])[first]
+    features = rerank_features(index, cand, text, budget=budget, days=days)
+    total = np.zeros(len(cand))
+    for name, values in features.items():
+        total += weights.get(name, 0.0) * values
+    top = topk(total, top_n)
+    return cand[top], total[top]
@@ -0,0 +1,220 @@
+"""
+路线图索引：目的地（城市序列，如“淄博>潍坊>常州”）和行程（景点序列）建索引时解析一次，站点名整数化后存成数组，
+随 TF-IDF 索引一起持久化、内存映射加载。每种序列（city / poi）包含：
+
+    names                       站点名表（meta.json 的 routes 里），下标即站点号
+    seq_indptr / seq_ids        每篇游记按顺序经过的站点号（CSR，相邻重复的站点合并）
+    post_indptr / post_rows     站点 -> 经过它的游记行号（升序）
+    adj_indptr / adj_nbrs / adj_weight
+                                有向邻接表：a -> b 的权重为“b 紧接在 a 之后”的游记篇数，每个站点的邻居按权重降序
+    len_indptr / len_rows       按经过的不同站点数分组的行号（第 n 组为 n 站的游记，超过 MAX_STOPS 的归入最后一组）
+    loop                        首尾是同一站点的游记（环线）
+
+查询都只读倒排表/邻接表上的切片：
+    “同时经过厦门和泉州”        两条倒排链求交（ordered=True 时再要求先后顺序）
+    “X 之后最常去哪”            X 的邻接表切片，已按权重排好
+    “5 天 3 城的环线”           3 站的那组行号上按天数/环线过滤
+"""
+from functools import lru_cache
+
+import numpy as np
+
+from tokenizer import CITY_SUFFIX
+from travel_index import CITY_SEP, ROUTE_FIELDS, ROUTE_PARTS, intersect_postings, topk
+
+MAX_STOPS = 32
+
+
+@lru_cache(maxsize=1 << 16)
+def normalize_stop(name, kind):
+    """
+    城市去掉拼音/英文后缀（“光雾山Guangwushan” -> “光雾山”），景点去掉列表页截断留下的“...”
+    """
+    name = str(name).strip()
+    if kind == 'city':
+        name = CITY_SUFFIX.sub('', name).strip() or name
+    return name.rstrip('.…').strip()
+
+
+def parse_route(text, kind):
+    if text is None or text != text:
+        return []
+    stops = []
+    for part in CITY_SEP.split(str(text)):
+        stop = normalize_stop(part, kind)
+        if stop and (not stops or stops[-1] != stop):
+            stops.append(stop)
+    return stops
+
+
+def _csr(groups, values, n_groups):
+    """
+    按 groups 稳定排序后的 (行指针, 取值)
+    """
+    order = np.argsort(groups, kind='stable')
+    indptr = np.zeros(n_groups + 1, dtype=np.int64)
+    indptr[1:] = np.cumsum(np.bincount(groups, minlength=n_groups))
+    return indptr, values[order]
+
+
+def _sorted_unique(values):
+    """
+    排序去重，返回 (取值, 次数)；比 np.unique 的哈希实现在大数组上快
+    """
+    values = np.sort(values)
+    starts = np.flatnonzero(np.concatenate([[True], values[1:] != values[:-1]])) if len(values) else np.empty(0, int)
+    return values[starts], np.diff(np.append(starts, len(values)))
+
+
+def build_route_graph(sequences):
+    """
+    sequences[i] 为第 i 篇游记的站点名列表，返回 (站点名表, {数组名: 数组})
+    """
+    ids = {}
+    seq_indptr = np.zeros(len(sequences) + 1, dtype=np.int64)
+    flat = []
+    for i, stops in enumerate(sequences):
+        flat.extend(ids.setdefault(s, len(ids)) for s in stops)
+        seq_indptr[i + 1] = len(flat)
+    names = list(ids)
+    n_nodes, n_rows = len(names), len(sequences)
+    seq_ids = np.array(flat, dtype=np.int32)
+    row_of = np.repeat(np.arange(n_rows, dtype=np.int32), np.diff(seq_indptr))
+
+    # 站点 -> 行号：(站点, 行) 编成一个 int64 去重，排序后即按站点分组、组内行号升序
+    n_nodes_, n_rows_ = max(n_nodes, 1), max(n_rows, 1)
+    pairs, _ = _sorted_unique(seq_ids.astype(np.int64) * n_rows_ + row_of)
+    post_indptr, post_rows = _csr(pairs // n_rows_, (pairs % n_rows_).astype(np.int32), n_nodes)
+
+    # 相邻两站为一条边，同一篇游记里重复的边只计一次
+    same_row = row_of[1:] == row_of[:-1] if len(row_of) else np.empty(0, dtype=bool)
+    edge = seq_ids[:-1][same_row].astype(np.int64) * n_nodes_ + seq_ids[1:][same_row]
+    edge = _sorted_unique(edge * n_rows_ + row_of[1:][same_row])[0] // n_rows_
+    keys, weight = _sorted_unique(edge)
+    e_src, e_dst = keys // n_nodes_, keys % n_nodes_
+    # 每个站点的邻居按权重降序、站点号升序排好，查询时直接取前几个
+    order = np.lexsort((e_dst, -weight, e_src))
+    e_src, e_dst, weight = e_src[order], e_dst[order], weight[order]
+    adj_indptr = np.zeros(n_nodes + 1, dtype=np.int64)
+    adj_indptr[1:] = np.cumsum(np.bincount(e_src, minlength=n_nodes))
+
+    distinct = np.array([len(set(s)) for s in sequences], dtype=np.int64)
+    len_indptr, len_rows = _csr(np.minimum(distinct, MAX_STOPS), np.arange(n_rows, dtype=np.int32), MAX_STOPS + 1)
+    starts, ends = seq_indptr[:-1], seq_indptr[1:]
+    has_two = distinct >= 2
+    loop = np.zeros(n_rows, dtype=np.uint8)
+    loop[has_two] = seq_ids[starts[has_two]] == seq_ids[ends[has_two] - 1]
+    arrays = {
+        'seq_indptr': seq_indptr, 'seq_ids': seq_ids,
+        'post_indptr': post_indptr, 'post_rows': post_rows,
+        'adj_indptr': adj_indptr, 'adj_nbrs': e_dst.astype(np.int32), 'adj_weight': weight.astype(np.int32),
+        'len_indptr': len_indptr, 'len_rows': len_rows, 'loop': loop,
+    }
+    return names, arrays
+
+
+def build_routes(df):
+    """
+    数据表 -> {序列名: (站点名表, 数组)}；缺少对应列时为空图
+    """
+    routes = {}
+    for kind, col in ROUTE_FIELDS.items():
+        values = df[col].tolist() if col in df.columns else [None] * len(df)
+        routes[kind] = build_route_graph([parse_route(v, kind) for v in values])
+    return routes
+
+
+class RouteGraph:
+    def __init__(self, kind, names, arrays):
+        self.kind = kind
+        self.names = names
+        self.ids = {name: j for j, name in enumerate(names)}
+        for part in ROUTE_PARTS:
+            setattr(self, part, arrays[part])
+
+    def __len__(self):
+        return len(self.names)
+
+    def node(self, name):
+        return self.ids.get(normalize_stop(name, self.kind))
+
+    def route(self, i):
+        """
+        第 i 篇游记经过的站点名
+        """
+        return [self.names[j] for j in self.seq_ids[self.seq_indptr[i]:self.seq_indptr[i + 1]]]
+
+    def rows_with(self, name):
+        j = self.node(name)
+        if j is None:
+            return np.empty(0, dtype=np.int32)
+        return self.post_rows[self.post_indptr[j]:self.post_indptr[j + 1]]
+
+    def through(self, names, ordered=False):
+        """
+        同时经过 names 中全部站点的游记行号（升序）；ordered=True 时还要求按给出的先后顺序经过
+        """
+        rows = intersect_postings([self.rows_with(n) for n in names])
+        if rows is None:
+            return np.empty(0, dtype=np.int32)
+        if not ordered or len(names) < 2 or rows.size == 0:
+            return rows
+        wanted = [self.node(n) for n in names]
+        keep = []
+        for i in rows.tolist():
+            seq = self.seq_ids[self.seq_indptr[i]:self.seq_indptr[i + 1]].tolist()
+            pos = 0
+            for j in wanted:
+                try:
+                    pos = seq.index(j, pos) + 1
+                except ValueError:
+                    break
+            else:
+                keep.append(i)
+        return np.array(keep, dtype=np.int32)
+
+    def next_stops(self, name, k=10):
+        """
+        紧接在 name 之后最常去的 k 个站点：[(站点名, 游记篇数)]
+        """
+        j = self.node(name)
+        if j is None:
+            return []
+        lo = self.adj_indptr[j]
+        hi = min(self.adj_indptr[j + 1], lo + k)
+        return [(self.names[n], w) for n, w in zip(self.adj_nbrs[lo:hi].tolist(), self.adj_weight[lo:hi].tolist())]
+
+    def with_stops(self, n_stops, loop=None):
+        """
+        经过 n_stops 个不同站点的游记行号（升序）；loop=True/False 时只要/不要环线
+        """
+        n = min(int(n_stops), MAX_STOPS)
+        if n < 0:
+            return np.empty(0, dtype=np.int32)
+        rows = self.len_rows[self.len_indptr[n]:self.len_indptr[n + 1]]
+        if loop is not None and rows.size:
+            rows = rows[self.loop[rows].astype(bool) == bool(loop)]
+        return rows
+
+
+def route_search(index, kind='city', through=(), ordered=False, n_stops=None, days=None, loop=None, top_n=10):
+    """
+    路线条件组合查询，结果按热度取前 top_n 行号
+    """
+    graph = index.routes[kind]
+    lists = []
+    if through:
+        lists.append(graph.through(list(through), ordered=ordered))
+    if n_stops is not None or loop is not None:
+        if n_stops is not None:
+            lists.append(graph.with_stops(n_stops, loop))
+        else:
+            lists.append(np.flatnonzero(np.asarray(graph.loop).astype(bool) == bool(loop)).astype(np.int32))
+    rows = intersect_postings(lists)
+    if rows is None:
+        rows = np.arange(len(index), dtype=np.int32)
+    if days is not None and rows.size:
+        dur = np.asarray(index.numeric['days'][rows])
+        rows = rows[dur == days]
+    rows = np.asarray(rows, dtype=np.int64)
+    return rows[topk(np.asarray(index.popularity[rows]), top_n)]
@@ -0,0 +1,146 @@
+"""
+多进程推荐服务（预先 fork，仅 POSIX）：
+
+    1. 主进程构建/校验好数据文件对应的索引（磁盘上的版本目录 + CURRENT 指针），然后监听端口
+    2. 主进程导入 jieba 并加载词典、以 follow 模式导入 web_api（只读挂载索引：CSR 矩阵、IDF、数值字段、
+       倒排表和行元数据全部是同一组文件的内存映射），然后 fork 出若干工作进程共用监听套接字。
+       词典、词表等 Python 对象在 fork 前建好并 gc.freeze()，工作进程按写时复制与主进程共享，
+       不各自再导入一遍；索引数组共享页缓存
+    3. 各工作进程把指标快照写到同一个目录（METRICS_MULTIPROC_DIR，默认临时目录），任何一个进程处理 /metrics
+       时都汇总全部进程，Prometheus 看到的计数器不会因为换了进程而来回跳
+    4. 主进程轮询数据文件，有变化时构建新版本并切换 CURRENT，工作进程各自热更新到新版本；
+       工作进程意外退出时主进程补起一个
+
+    python serve.py [--workers 4] [--host 0.0.0.0] [--port 5000] [--data ../data/qunar_travel.csv] [--watch 30]
+"""
+import argparse
+import gc
+import os
+import shutil
+import signal
+import socket
+import sys
+import tempfile
+import time
+
+from hot_reload import file_signature
+from travel_index import build_index, load_or_build_index
+
+DEFAULT_DATA = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "data", "qunar_travel.csv")
+
+
+def preload(data_path, watch_interval):
+    """
+    fork 前在主进程里完成所有大块的初始化，返回 web_api 模块。
+    线程不会被 fork 带到子进程，web_api 的 CURRENT 轮询线程在这里先不启动，由工作进程各自启动
+    """
+    import jieba
+    jieba.initialize()
+    os.environ["TRAVEL_DATA"] = data_path
+    os.environ["INDEX_FOLLOW"] = "1"
+    os.environ["INDEX_WATCH_INTERVAL"] = "0"
+    import web_api
+    # 预热查询分词（jieba 的 HMM 等在第一次分词时才加载）
+    web_api.live.get().recommend(interests="美食")
+    web_api.INDEX_WATCH_INTERVAL = watch_interval
+    # 之后不再回收这些对象，子进程里的 GC 不会触碰它们的页，避免写时复制
+    gc.freeze()
+    return web_api
+
+
+def run_worker(web_api, sock, host, port, metrics_dir):
+    from werkzeug.serving import make_server
+    web_api.metrics.enable_multiprocess(metrics_dir)
+    if web_api.INDEX_WATCH_INTERVAL > 0:
+        web_api.live.watch(web_api.INDEX_WATCH_INTERVAL)
+    server = make_server(host, port, web_api.app, threaded=True, fd=sock.fileno())
+    print(f"[服务] 工作进程 {os.getpid()} 就绪，索引版本 {web_api.live.info['version']}")
+    server.serve_forever()
+
+
+def spawn(web_api, sock, host, port, metrics_dir):
+    pid = os.fork()
+    if pid == 0:
+        signal.signal(signal.SIGTERM, signal.SIG_DFL)
+        signal.signal(signal.SIGINT, signal.SIG_DFL)
+        try:
+            run_worker(web_api, sock, host, port, metrics_dir)
+        finally:
+            os._exit(0)
+    return pid
+
+
+def serve(data_path, workers=4, host="0.0.0.0", port=5000, watch=30):
+    data_path = os.path.abspath(data_path)
+    # 先在主进程里把索引准备好并挂载，工作进程 fork 后直接使用
+    load_or_build_index(data_path)
+    signature = file_signature(data_path)
+    # 工作进程只需检查 CURRENT 指针，代价很小，可以查得勤一些
+    web_api = preload(data_path, int(os.environ.get("INDEX_WATCH_INTERVAL", 2)))
+    # 指标快照目录只属于这一次运行，启动时清空，计数从 0 开始
+    metrics_dir = os.environ.get("METRICS_MULTIPROC_DIR") or tempfile.mkdtemp(prefix="travel-metrics-")
+    shutil.rmtree(metrics_dir, ignore_errors=True)
+    os.makedirs(metrics_dir)
+    sock = socket.create_server((host, port), backlog=128)
+    sock.set_inheritable(True)
+    children = {spawn(web_api, sock, host, port, metrics_dir) for _ in range(workers)}
+    print(f"[服务] 主进程 {os.getpid()}，{workers} 个工作进程监听 {host}:{port}")
+
+    stopping = []
+
+    def stop(signum, frame):
+        stopping.append(signum)
+
+    signal.signal(signal.SIGTERM, stop)
+    signal.signal(signal.SIGINT, stop)
+    last_check = time.monotonic()
+    failed = None
+    while not stopping:
+        time.sleep(0.5)
+        while True:
+            try:
+                pid, _ = os.waitpid(-1, os.WNOHANG)
+            except ChildProcessError:
+                pid = 0
+            if pid == 0:
+                break
+            children.discard(pid)
+            if not stopping:
+                print(f"[服务] 工作进程 {pid} 退出，重新启动")
+                children.add(spawn(web_api, sock, host, port, metrics_dir))
+        if watch and time.monotonic() - last_check >= watch:
+            last_check = time.monotonic()
+            current = file_signature(data_path)
+            # 在同一版本数据上失败过的不再重试，等数据文件再次变化
+            if current != signature and current != failed:
+                try:
+                    build_index(data_path)
+                    signature, failed = current, None
+                except Exception as e:
+                    failed = current
+                    print(f"[服务] 重建索引失败，继续使用当前版本，数据文件再次变化时重试：{type(e).__name__}: {e}")
+    for pid in children:
+        try:
+            os.kill(pid, signal.SIGTERM)
+        except ProcessLookupError:
+            pass
+    for pid in children:
+        try:
+            os.waitpid(pid, 0)
+        except ChildProcessError:
+            pass
+    sock.close()
+    shutil.rmtree(metrics_dir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="多进程推荐服务（工作进程共享内存映射的索引）")
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=5000)
+    parser.add_argument("--data", default=os.environ.get("TRAVEL_DATA") or DEFAULT_DATA)
+    parser.add_argument("--watch", type=int, default=30, help="检查数据文件的间隔秒数，0 为不检查")
+    args = parser.parse_args()
+    if not hasattr(os, "fork"):
+        sys.exit("多进程模式需要 fork（Linux/macOS）；Windows 下请直接运行 web_api.py")
+    serve(args.data, args.workers, args.host, args.port, args.watch)
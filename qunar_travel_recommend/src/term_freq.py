@@ -0,0 +1,259 @@
+"""
+词云用的词频表：按文本字段逐篇分词，过滤停用词和短词后累加词频并持久化。
+数据文件新增游记时只对新增的游记分词、累加（只记已处理到的水位：行数 + 这些行标识的指纹），
+词云用 WordCloud.generate_from_frequencies 直接从词频表生成，渲染好的图片按
+（词频表版本, 渲染参数）缓存到磁盘。
+
+产物默认在数据文件旁边的 termfreq/<数据文件名>.<字段>.json，图片在 termfreq/images/<词频表名>/ 下。
+
+    python term_freq.py ../data/featured_travel.csv 标题 主题 行程
+"""
+import hashlib
+import io
+import json
+import os
+import re
+import sys
+import threading
+import time
+from collections import Counter
+
+import pandas as pd
+
+from tokenizer import destination_words, segment_corpus
+from travel_stats import file_signature, stats_rows
+from travel_store import youji_id
+
+TERMFREQ_FORMAT = 2
+MIN_LEN = 2
+# 通用虚词 + 游记里没有区分度的高频词
+STOPWORDS = frozenset("""
+我们 你们 他们 自己 一个 一些 一下 一起 一次 这个 那个 这里 那里 这样 那样 什么 怎么 如何
+可以 没有 不是 就是 还是 但是 因为 所以 如果 然后 已经 非常 真的 还有 以及 或者 而且
+游记 攻略 旅行 旅游 出游 行程 之旅 日游 第一天 第二天 第三天 无
+""".split())
+WORD_RE = re.compile(r'\w')
+
+
+def _sha(obj):
+    return hashlib.sha256(json.dumps(obj, ensure_ascii=False, sort_keys=True).encode('utf-8')).hexdigest()
+
+
+def row_keys(df):
+    """
+    行的标识：游记ID，没有时退回链接，再退回标题
+    """
+    links = df['链接'] if '链接' in df.columns else pd.Series(None, index=df.index, dtype=object)
+    keys = links.map(youji_id)
+    keys = keys.where(keys.notna(), links)
+    titles = df['标题'] if '标题' in df.columns else pd.Series(None, index=df.index, dtype=object)
+    return keys.where(keys.notna(), titles).astype(str)
+
+
+def rows_digest(keys):
+    """
+    一串行标识的指纹，用来确认已计入的行仍原样在文件开头
+    """
+    return hashlib.sha256('\n'.join(keys).encode('utf-8')).hexdigest()
+
+
+def pending_start(keys, watermark):
+    """
+    新增行的起始位置；水位之前的行有变化（删除/替换/重排）时返回 None，需要整体重算
+    """
+    n = watermark.get('rows', 0)
+    if not n:
+        return 0
+    if len(keys) < n or rows_digest(keys.iloc[:n]) != watermark.get('digest'):
+        return None
+    return n
+
+
+def make_watermark(keys, signature):
+    return {'rows': len(keys), 'digest': rows_digest(keys), 'file': signature}
+
+
+def count_terms(docs_tokens, min_len=MIN_LEN, stopwords=STOPWORDS):
+    """
+    累加词频，跳过停用词、长度不足 min_len 的词和纯标点
+    """
+    counts = Counter()
+    for tokens in docs_tokens:
+        counts.update(w for w in (t.strip().lower() for t in tokens)
+                      if len(w) >= min_len and w not in stopwords and WORD_RE.search(w))
+    return counts
+
+
+class TermFreqStore:
+    """
+    持久化词频表。counts: 词 -> 出现次数；watermark: 已处理到的位置（见 make_watermark）；
+    fields / min_len / 停用词有变化时整体重算
+    """
+
+    def __init__(self, path=None, fields=('标题', '主题'), min_len=MIN_LEN, stopwords=STOPWORDS):
+        self.path = path
+        self.fields = list(fields)
+        self.min_len = min_len
+        self.stopwords = frozenset(stopwords)
+        self.counts = Counter()
+        self.watermark = {}
+        self.docs = 0
+        self.source = None
+        self.updated_at = None
+        self.lock = threading.Lock()
+
+    @property
+    def settings(self):
+        return {'fields': self.fields, 'min_len': self.min_len, 'stopwords': _sha(sorted(self.stopwords))}
+
+    @property
+    def version(self):
+        """
+        词频表内容的指纹，词频不变版本就不变
+        """
+        return _sha([self.settings, sorted(self.counts.items())])[:12]
+
+    @classmethod
+    def open(cls, path, fields=('标题', '主题'), min_len=MIN_LEN, stopwords=STOPWORDS):
+        store = cls(path, fields, min_len, stopwords)
+        if not os.path.exists(path):
+            return store
+        with open(path, encoding='utf-8') as f:
+            saved = json.load(f)
+        if saved.get('format') != TERMFREQ_FORMAT or saved.get('settings') != store.settings:
+            print(f"[词频] {path} 格式或分词参数不符，将重新统计")
+            return store
+        store.counts = Counter(saved['counts'])
+        store.watermark = saved['watermark']
+        store.docs = saved['docs']
+        store.source = saved.get('source')
+        store.updated_at = saved.get('updated_at')
+        return store
+
+    def save(self, path=None):
+        path = path or self.path
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        saved = {
+            'format': TERMFREQ_FORMAT,
+            'settings': self.settings,
+            'version': self.version,
+            'docs': self.docs,
+            'source': self.source,
+            'updated_at': self.updated_at,
+            'counts': dict(self.counts.most_common()),
+            'watermark': self.watermark,
+        }
+        tmp = path + '.tmp'
+        with open(tmp, 'w', encoding='utf-8') as f:
+            json.dump(saved, f, ensure_ascii=False)
+        os.replace(tmp, path)
+
+    def clear(self):
+        self.counts, self.watermark, self.docs = Counter(), {}, 0
+
+    def add_texts(self, texts, user_words=None):
+        """
+        逐篇分词（文档多时进程池并行）并累加词频，返回处理的文档数
+        """
+        docs_tokens = segment_corpus(texts, user_words=user_words)
+        self.counts.update(count_terms(docs_tokens, self.min_len, self.stopwords))
+        self.docs += len(docs_tokens)
+        self.updated_at = time.strftime('%Y-%m-%dT%H:%M:%S')
+        return len(docs_tokens)
+
+    def refresh(self, csv_path, df=None):
+        """
+        从数据文件增量刷新：只对尚未计入的游记分词。返回 (新增文档数, 是否整体重算)
+        """
+        from travel_index import build_content
+        with self.lock:
+            source = os.path.abspath(csv_path)
+            signature = file_signature(csv_path)
+            if df is None and self.source == source and self.watermark.get('file') == signature:
+                return 0, False
+            if df is None:
+                from columnar import load_dataset
+                df = load_dataset(csv_path)
+            keys = row_keys(df)
+            start = pending_start(keys, self.watermark) if self.source in (None, source) else None
+            rebuilt = start is None
+            if rebuilt:
+                self.clear()
+                start = 0
+            self.source = source
+            added = 0
+            if start < len(df):
+                rows = stats_rows(df.iloc[start:])
+                texts = build_content(rows, self.fields)
+                user_words = destination_words(df['目的地'].dropna()) if '目的地' in df.columns else None
+                added = self.add_texts(texts[texts != ''].tolist(), user_words)
+            self.watermark = make_watermark(keys, signature)
+            return added, rebuilt
+
+    def frequencies(self, max_words=200):
+        return dict(self.counts.most_common(max_words))
+
+
+def default_termfreq_path(csv_path, fields):
+    base = os.path.dirname(os.path.abspath(csv_path))
+    name = os.path.splitext(os.path.basename(csv_path))[0]
+    return os.path.join(base, 'termfreq', f"{name}.{'+'.join(fields)}.json")
+
+
+def refresh_term_freq(csv_path, fields=('标题', '主题'), path=None, rebuild=False):
+    """
+    打开数据文件对应的词频表，增量刷新并保存，返回 TermFreqStore；rebuild=True 时丢掉已有词频重新统计
+    """
+    path = path or default_termfreq_path(csv_path, fields)
+    store = TermFreqStore.open(path, fields)
+    if rebuild:
+        store.clear()
+    t0 = time.perf_counter()
+    watermark = store.watermark
+    added, rebuilt = store.refresh(csv_path)
+    rebuilt = rebuilt or rebuild
+    if added or rebuilt or store.watermark != watermark or not os.path.exists(path):
+        store.save()
+    print(f"[词频] {csv_path}: {'重新' if rebuilt else '增量'}分词 {added} 篇，共 {store.docs} 篇、"
+          f"{len(store.counts)} 个词，用时 {time.perf_counter() - t0:.2f}s -> {path}")
+    return store
+
+
+def wordcloud_png(store, font_path=None, width=800, height=400, max_words=120,
+                  background_color='white', cache_dir=None, **options):
+    """
+    从词频表生成词云 PNG。同一词频表版本 + 同一组参数只渲染一次，结果缓存在 cache_dir（默认 images/<词频表名>/）
+    """
+    from wordcloud import WordCloud
+    params = dict(font_path=font_path, width=width, height=height, max_words=max_words,
+                  background_color=background_color, **options)
+    if cache_dir is None and store.path:
+        stem = os.path.splitext(os.path.basename(store.path))[0]
+        cache_dir = os.path.join(os.path.dirname(os.path.abspath(store.path)), 'images', stem)
+    cache_file = None
+    if cache_dir:
+        cache_file = os.path.join(cache_dir, f"{store.version}-{_sha(params)[:12]}.png")
+        if os.path.exists(cache_file):
+            with open(cache_file, 'rb') as f:
+                return f.read()
+    wc = WordCloud(**params).generate_from_frequencies(store.frequencies(max_words))
+    buf = io.BytesIO()
+    wc.to_image().save(buf, format='PNG')
+    png = buf.getvalue()
+    if cache_file:
+        os.makedirs(cache_dir, exist_ok=True)
+        tmp = cache_file + '.tmp'
+        with open(tmp, 'wb') as f:
+            f.write(png)
+        os.replace(tmp, cache_file)
+        # 旧版本词频表的图片不会再用到
+        for name in os.listdir(cache_dir):
+            if name.endswith('.png') and not name.startswith(store.version):
+                os.remove(os.path.join(cache_dir, name))
+    return png
+
+
+if __name__ == '__main__':
+    csv = sys.argv[1] if len(sys.argv) > 1 else '../data/featured_travel.csv'
+    store = refresh_term_freq(csv, sys.argv[2:] or ('标题', '主题'))
+    print(store.frequencies(20))
@@ -0,0 +1,100 @@
+"""
+共享分词层：
+    - chinese_tokenizer：单条文本分词
+    - tokenize_query：查询分词，带有界 LRU 缓存
+    - segment_corpus：语料批量分词，文档多时用进程池并行，每个进程只加载一次目的地用户词典
+    - destination_words / load_user_words：从“目的地”字段整理城市名并加入 jieba 词典
+"""
+import os
+import re
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
+
+import jieba
+
+QUERY_CACHE_SIZE = 4096
+PARALLEL_MIN_DOCS = 5000
+CITY_SPLIT = re.compile(r'\s*>\s*')
+CITY_SUFFIX = re.compile(r'[A-Za-z][A-Za-z\s.]*$')
+
+_loaded_words = set()
+
+
+def chinese_tokenizer(text):
+    try:
+        return list(jieba.cut(str(text)))
+    except Exception as e:
+        print("分词异常:", text, e)
+        return []
+
+
+@lru_cache(maxsize=QUERY_CACHE_SIZE)
+def tokenize_query(text):
+    """
+    查询分词（先转小写，与建索引时一致），结果为元组以便缓存共享
+    """
+    return tuple(chinese_tokenizer(str(text).lower()))
+
+
+def query_terms(text):
+    """
+    查询中的有效词（去掉空白），按出现顺序去重
+    """
+    return [t for t in dict.fromkeys(tokenize_query(text)) if t.strip()]
+
+
+def destination_words(values):
+    """
+    从“目的地”取值（如“厦门Xiamen>鼓浪屿”）中整理出中文城市名，去掉拼音/英文后缀
+    """
+    words = set()
+    for v in values:
+        if not v:
+            continue
+        for city in CITY_SPLIT.split(str(v)):
+            city = CITY_SUFFIX.sub('', city).strip()
+            if len(city) >= 2:
+                words.add(city)
+    return sorted(words)
+
+
+def load_user_words(words):
+    """
+    把目的地名加入 jieba 词典；已加载过的词跳过。词典变化后清空查询缓存
+    """
+    new_words = [w for w in words if w not in _loaded_words]
+    for w in new_words:
+        jieba.add_word(w)
+        _loaded_words.add(w)
+    if new_words:
+        tokenize_query.cache_clear()
+    return len(new_words)
+
+
+def _init_worker(user_words):
+    jieba.initialize()
+    load_user_words(user_words or [])
+
+
+def _segment_chunk(texts):
+    return [chinese_tokenizer(t) for t in texts]
+
+
+def segment_corpus(texts, user_words=None, processes=None, chunk_size=500):
+    """
+    批量分词，返回与 texts 一一对应的词列表。
+    文档数不少于 PARALLEL_MIN_DOCS 且 processes != 1 时用进程池，每个进程初始化时加载一次用户词典
+    """
+    texts = [str(t) for t in texts]
+    load_user_words(user_words or [])
+    if processes is None:
+        processes = os.cpu_count() or 1
+    if processes <= 1 or len(texts) < PARALLEL_MIN_DOCS:
+        return _segment_chunk(texts)
+    chunks = [texts[i:i + chunk_size] for i in range(0, len(texts), chunk_size)]
+    result = []
+    with ProcessPoolExecutor(max_workers=processes, initializer=_init_worker,
+                             initargs=(list(user_words or []),)) as pool:
+        for tokens in pool.map(_segment_chunk, chunks):
+            result.extend(tokens)
+    return result
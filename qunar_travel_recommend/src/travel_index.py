@@ -0,0 +1,741 @@
+"""
+游记推荐索引：离线构建 TF-IDF 索引产物，服务端用内存映射直接加载，启动时不再重新分词、拟合。
+
+产物目录结构（默认在数据文件旁边的 index/<数据文件名>/ 下）：
+    CURRENT                 当前生效的版本号
+    <version>/meta.json     格式版本、数据源指纹、各文件校验和、词表、构建参数
+    <version>/idf.npy       IDF 权重
+    <version>/indptr.npy    文档-词 CSR 矩阵（行指针）
+    <version>/indices.npy   文档-词 CSR 矩阵（列号）
+    <version>/data.npy      文档-词 CSR 矩阵（权重）
+    <version>/num_*.npy     数值字段（费用、浏览、点赞等），float64，缺失为 NaN
+    <version>/row_data.npy / row_offsets.npy   行元数据（展示用字段）：每行一段 UTF-8 JSON 首尾相接，取某行时才解码
+    <version>/doc_data.npy / doc_offsets.npy   推荐结果片段：每行按接口输出的键预先编码好的 JSON 对象，响应直接拼接
+    <version>/tokens.json   文档分词用到的全部词
+    <version>/tok_indptr.npy / tok_ids.npy   每篇文档的词集合（CSR，词号升序）
+    <version>/post_*.npy    词-文档倒排链（X 的 CSC 形式）和每个词的最大权重，检索时 MaxScore 剪枝用
+    <version>/popularity.npy / popular.npy   热度分（浏览/点赞/评论）和按热度排好序的行号，重排与兜底用
+    <version>/facet_*.npy   人物/主题/目的地/月份的过滤倒排表（CSR，取值列表在 meta.json 的 facets 里）
+    <version>/route_*.npy   目的地/行程序列的路线图：站点序列、站点倒排、有向邻接表（站点名表在 meta.json 的 routes 里）
+
+全部数组（含行元数据）都以内存映射方式只读加载，同一台机器上的多个服务进程共享同一份页缓存，
+每个进程自己持有的只有词表等少量 Python 对象。
+
+直接用原始爬取文件建索引时，先去掉近重复游记（见 build_index / near_dup）。
+
+用法：
+    python travel_index.py ../data/featured_travel.csv [词表上限，默认 500，0 为不限]
+"""
+import hashlib
+import json
+import os
+import re
+import shutil
+import sys
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+from scipy import sparse
+from sklearn.feature_extraction.text import TfidfVectorizer
+
+from columnar import load_dataset
+from inverted_index import InvertedIndex
+from tokenizer import (tokenize_query, segment_corpus, destination_words, load_user_words,
+                       query_terms)
+
+INDEX_FORMAT = 9
+CONTENT_FIELDS = ['标题', '人物', '主题']
+ROW_FIELDS = ['标题', '人物', '主题', '费用', '浏览', '点赞', '链接', '目的地', '内容']
+# 推荐结果里展示的字段：结果中的键 -> 行元数据字段；建索引时每行预先编码成一段 JSON（见 TravelIndex.docs）
+RESULT_FIELDS = {'标题': '标题', '链接': '链接', '主题': '主题', '人物': '人物', '费用': '费用', '城市': '目的地'}
+# 数值字段：索引内名称 -> 候选列名（按顺序取第一个存在的列）
+NUMERIC_FIELDS = {
+    'fee': ['费用', '人均费用'],
+    'views': ['浏览次数', '浏览'],
+    'likes': ['点赞'],
+    'comments': ['评论'],
+    'days': ['旅行时长', '天数'],
+    'month': ['旅行月份'],
+    'date': ['出发时间', '出发日期'],
+}
+# 以日期读入的数值字段，存为距 1970-01-01 的天数
+DATE_NUMERIC = {'date'}
+# 路线图（见 route_graph）：序列名 -> 字段
+ROUTE_FIELDS = {'city': '目的地', 'poi': '行程'}
+# 建索引时需要读取的列（列式文件只解码这些列）
+INDEX_COLUMNS = list(dict.fromkeys(
+    CONTENT_FIELDS + ROW_FIELDS + [c for cols in NUMERIC_FIELDS.values() for c in cols] + ['出发时间']
+    + list(ROUTE_FIELDS.values())))
+FILTER_SEP = re.compile(r'[\s,，、/;；]+')
+CITY_SEP = re.compile(r'\s*>\s*')
+# 过滤用倒排表：索引内名称 -> (行元数据字段, 取值分隔符)，None 表示整个值作为一个取值；月份取自数值字段
+FACET_FIELDS = {'people': ('人物', None), 'theme': ('主题', FILTER_SEP), 'city': ('目的地', CITY_SEP), 'month': None}
+# 路线图每种序列的数组（见 route_graph）
+ROUTE_PARTS = ['seq_indptr', 'seq_ids', 'post_indptr', 'post_rows', 'adj_indptr', 'adj_nbrs', 'adj_weight',
+               'len_indptr', 'len_rows', 'loop']
+ARRAY_FILES = (['idf', 'indptr', 'indices', 'data', 'tok_indptr', 'tok_ids',
+                'post_indptr', 'post_docs', 'post_data', 'post_max', 'popularity', 'popular',
+                'row_data', 'row_offsets', 'doc_data', 'doc_offsets']
+               + ['num_' + k for k in NUMERIC_FIELDS]
+               + [f'facet_{k}_{part}' for k in FACET_FIELDS for part in ('indptr', 'rows')]
+               + [f'route_{k}_{part}' for k in ROUTE_FIELDS for part in ROUTE_PARTS])
+KEEP_VERSIONS = 2
+POPULARITY_WEIGHTS = {'views': 1.0, 'likes': 2.0, 'comments': 3.0}
+# 文档数少于这个值时直接暴力打分（小语料上比倒排检索快，两者结果一致）
+EXHAUSTIVE_MAX_DOCS = 20000
+
+
+class StaleIndexError(ValueError):
+    """索引产物与当前代码/数据不一致（格式版本、数据源或校验和不符）"""
+
+
+# ----------- 数据读取 -----------
+def file_sha256(path, chunk_size=1 << 20):
+    h = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def split_values(text, sep=FILTER_SEP):
+    if text is None:
+        return []
+    return [v for v in sep.split(str(text).strip()) if v]
+
+
+def intersect_postings(lists):
+    """
+    多个升序行号数组求交，从最短的开始，结果为空时提前结束
+    """
+    if not lists:
+        return None
+    lists = sorted(lists, key=len)
+    result = lists[0]
+    for rows in lists[1:]:
+        if result.size == 0:
+            break
+        result = np.intersect1d(result, rows, assume_unique=True)
+    return result
+
+
+def load_travel_csv(path):
+    """
+    读取游记CSV，兼容tab/逗号分隔和 BOM
+    """
+    with open(path, 'r', encoding='utf-8') as f:
+        header = f.readline()
+    sep = '\t' if '\t' in header else ','
+    df = pd.read_csv(path, sep=sep, encoding='utf-8')
+    df.columns = [c.replace('\ufeff', '') for c in df.columns]
+    return df
+
+
+def build_content(df, fields=CONTENT_FIELDS):
+    """
+    合成推荐用的“内容”字段：标题/人物/主题中非空、非“无”的值用空格拼接（向量化实现）
+    """
+    content = pd.Series('', index=df.index, dtype=object)
+    for k in fields:
+        if k not in df.columns:
+            continue
+        val = df[k].astype(object).where(df[k].notnull(), '').astype(str).str.strip()
+        val = val.where(val != '无', '')
+        content = (content + ' ' + val).where((content != '') & (val != ''), content + val)
+    return content
+
+
+def numeric_columns(df):
+    """
+    预先把数值字段转成 float64 数组（缺失为 NaN），查询时不再 pd.to_numeric
+    """
+    result = {}
+    for name, cols in NUMERIC_FIELDS.items():
+        col = next((c for c in cols if c in df.columns), None)
+        if col is not None and name in DATE_NUMERIC:
+            values = (pd.to_datetime(df[col], errors='coerce') - pd.Timestamp('1970-01-01')).dt.days
+        elif col is not None:
+            values = pd.to_numeric(df[col], errors='coerce')
+        elif name == 'month' and '出发时间' in df.columns:
+            values = pd.to_datetime(df['出发时间'], errors='coerce').dt.month
+        else:
+            values = pd.Series(np.nan, index=df.index)
+        result[name] = values.to_numpy(dtype=np.float64, na_value=np.nan)
+    return result
+
+
+def popularity_scores(numeric, normalize=True):
+    """
+    热度分：浏览、点赞、评论分别取 log1p 后加权求和（缺失按 0），再按最大值归一到 [0, 1]；
+    normalize=False 时不归一（分块计算的结果之间也可比较）
+    """
+    n = len(next(iter(numeric.values())))
+    raw = np.zeros(n)
+    for name, weight in POPULARITY_WEIGHTS.items():
+        values = numeric.get(name)
+        if values is not None:
+            raw += weight * np.log1p(np.nan_to_num(np.clip(values, 0, None), nan=0.0))
+    top = raw.max() if n and normalize else 0.0
+    return raw / top if top > 0 else raw
+
+
+def popular_order(popularity):
+    """
+    按热度降序排好的行号（同分按行号升序），作为无匹配时的兜底推荐列表
+    """
+    return np.lexsort((np.arange(len(popularity)), -popularity)).astype(np.int32)
+
+
+def topk(scores, k):
+    """
+    部分选择取前 k 个（argpartition + 只对 k 个排序），分数相同按行号升序。
+    与第 k 名同分的行取行号最小的，结果与完整排序的前 k 个一致
+    """
+    n = len(scores)
+    if k <= 0 or n == 0:
+        return np.empty(0, dtype=np.int64)
+    if k < n:
+        kth = scores[np.argpartition(-scores, k - 1)[k - 1]]
+        above = np.flatnonzero(scores > kth)
+        tied = np.flatnonzero(scores == kth)[:k - len(above)]
+        cand = np.concatenate([above, tied])
+    else:
+        cand = np.arange(n)
+    return cand[np.lexsort((cand, -scores[cand]))]
+
+
+def topk_rows(S, k):
+    """
+    二维分数矩阵逐行取前 k 个列号，规则与 topk 相同
+    """
+    n = S.shape[1]
+    k = min(k, n)
+    if k <= 0:
+        return np.empty((S.shape[0], 0), dtype=np.int64)
+    if k < n:
+        kth = -np.partition(-S, k - 1, axis=1)[:, k - 1:k]
+        above = S > kth
+        tied = S == kth
+        need = k - above.sum(axis=1, keepdims=True)
+        take = above | (tied & (np.cumsum(tied, axis=1) <= need))
+        cand = np.nonzero(take)[1].reshape(S.shape[0], k)
+    else:
+        cand = np.broadcast_to(np.arange(n), S.shape)
+    vals = np.take_along_axis(S, cand, axis=1)
+    order = np.argsort(-vals, axis=1, kind='stable')
+    return np.take_along_axis(cand, order, axis=1)
+
+
+def facet_csr(values_per_row):
+    """
+    values_per_row[i] 为第 i 行的取值列表，返回 (取值列表, 行指针, 行号)：
+    第 k 个取值的行号为 rows[indptr[k]:indptr[k + 1]]，升序 int32
+    """
+    postings = {}
+    for i, values in enumerate(values_per_row):
+        for v in set(values):
+            postings.setdefault(v, []).append(i)
+    values = sorted(postings)
+    indptr = np.zeros(len(values) + 1, dtype=np.int64)
+    indptr[1:] = np.cumsum([len(postings[v]) for v in values])
+    rows = np.array([i for v in values for i in postings[v]], dtype=np.int32)
+    return values, indptr, rows
+
+
+def build_facets(rows, numeric):
+    """
+    由行元数据和数值字段建过滤倒排表，返回 {名称: (取值列表, 行指针, 行号)}
+    """
+    facets = {}
+    for name, spec in FACET_FIELDS.items():
+        if spec is None:
+            month = numeric['month']
+            values = [[] if np.isnan(m) else [str(int(m))] for m in month]
+        else:
+            field, sep = spec
+            col = rows.column(field)
+            values = [([v] if v else []) if sep is None else split_values(v, sep) for v in col]
+        facets[name] = facet_csr(values)
+    return facets
+
+
+# ----------- 索引对象 -----------
+class RowStore:
+    """
+    行元数据：每行一段 UTF-8 JSON（字段 -> 值）首尾相接存放在 data（uint8）里，offsets 为各行起止位置。
+    加载时 data 是内存映射数组，取某一行时才解码
+    """
+
+    def __init__(self, data, offsets):
+        self.data = data
+        self.offsets = offsets
+
+    @classmethod
+    def from_columns(cls, columns):
+        n = len(next(iter(columns.values()))) if columns else 0
+        chunks = [json.dumps({k: v[i] for k, v in columns.items()}, ensure_ascii=False).encode('utf-8')
+                  for i in range(n)]
+        offsets = np.zeros(n + 1, dtype=np.int64)
+        offsets[1:] = np.cumsum([len(c) for c in chunks])
+        return cls(np.frombuffer(b''.join(chunks), dtype=np.uint8), offsets)
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def raw(self, i):
+        return self.data[self.offsets[i]:self.offsets[i + 1]].tobytes()
+
+    def __getitem__(self, i):
+        return json.loads(self.raw(i))
+
+    def column(self, name):
+        """
+        某个字段的全部取值（逐行解码，只在建索引等离线场景使用）
+        """
+        return [self[i].get(name) for i in range(len(self))]
+
+
+def result_docs(columns):
+    """
+    由行元数据各列（字段 -> 取值列表）生成推荐结果片段，键为 RESULT_FIELDS 的键
+    """
+    return RowStore.from_columns({key: columns[field] for key, field in RESULT_FIELDS.items()})
+
+
+class TravelIndex:
+    """
+    已拟合的 TF-IDF 索引：词表、IDF、文档-词矩阵 X（行已做 L2 归一化）、行元数据（RowStore）和过滤倒排表。
+    查询向量化在这里直接完成，服务端不再依赖拟合好的 TfidfVectorizer 对象。
+    """
+
+    def __init__(self, vocabulary, idf, X, rows, numeric, tokens, tok_indptr, tok_ids, meta=None,
+                 postings=None, popularity=None, popular=None, facets=None, routes=None, docs=None):
+        self.vocabulary = vocabulary
+        self.idf = idf
+        self.X = X
+        self.rows = rows
+        self.numeric = numeric
+        self.tokens = tokens
+        self.token_ids = {t: j for j, t in enumerate(tokens)}
+        self.tok_indptr = tok_indptr
+        self.tok_ids = tok_ids
+        self.meta = meta or {}
+        self.postings = postings if postings is not None else InvertedIndex.from_matrix(X)
+        self.exhaustive_max_docs = EXHAUSTIVE_MAX_DOCS
+        self.popularity = popularity if popularity is not None else popularity_scores(numeric)
+        self.popular = popular if popular is not None else popular_order(self.popularity)
+        self.facets = facets or {}
+        # 序列名 -> route_graph.RouteGraph
+        self.routes = routes or {}
+        # 推荐结果片段；只给了检索用数组（如基准里的合成索引）时没有行元数据，也就没有片段
+        if docs is None and isinstance(rows, RowStore):
+            docs = result_docs({f: rows.column(f) for f in RESULT_FIELDS.values()})
+        self.docs = docs
+
+    @property
+    def version(self):
+        return self.meta.get('version', '')
+
+    def __len__(self):
+        return self.X.shape[0]
+
+    def transform(self, texts):
+        """
+        与 TfidfVectorizer.transform 等价：小写 -> 分词 -> 词频 * IDF -> L2 归一化
+        """
+        return self.vectorize([tokenize_query(text) for text in texts])
+
+    def vectorize(self, docs_tokens):
+        """
+        已分好词的查询 -> 词频 * IDF -> L2 归一化的稀疏矩阵
+        """
+        indptr, indices, data = [0], [], []
+        for tokens in docs_tokens:
+            counts = {}
+            for tok in tokens:
+                j = self.vocabulary.get(tok)
+                if j is not None:
+                    counts[j] = counts.get(j, 0) + 1
+            cols = sorted(counts)
+            vals = np.array([counts[j] for j in cols], dtype=np.float64) * self.idf[cols]
+            norm = np.sqrt((vals ** 2).sum())
+            if norm > 0:
+                vals /= norm
+            indices.extend(cols)
+            data.extend(vals.tolist())
+            indptr.append(len(indices))
+        return sparse.csr_matrix(
+            (np.array(data, dtype=np.float64), np.array(indices, dtype=np.int32), np.array(indptr, dtype=np.int64)),
+            shape=(len(indptr) - 1, len(self.idf)))
+
+    def row(self, i):
+        return self.rows[i]
+
+    def result_fragment(self, i):
+        """
+        第 i 篇的推荐结果 JSON 对象（UTF-8 字节，不含推荐理由）
+        """
+        return self.docs.raw(i)
+
+    def doc_token_ids(self, i):
+        return self.tok_ids[self.tok_indptr[i]:self.tok_indptr[i + 1]]
+
+    def matched_terms(self, query, i):
+        """
+        查询词（分词带缓存）与第 i 篇文档预存词集合的交集，按查询中的顺序返回
+        """
+        doc = self.doc_token_ids(i)
+        hit = []
+        for t in query_terms(query):
+            j = self.token_ids.get(t)
+            if j is None:
+                continue
+            pos = np.searchsorted(doc, j)
+            if pos < len(doc) and doc[pos] == j:
+                hit.append(t)
+        return hit
+
+    def scores(self, query_vec):
+        """
+        单条查询与全部文档的余弦相似度（X 与查询向量都已 L2 归一化，点积即余弦）
+        """
+        return self.X @ query_vec.toarray().ravel()
+
+    def budget_mask(self, budget):
+        """
+        预算过滤掩码；budget 为空或 <= 0 时不过滤，返回 None
+        """
+        if budget is None or budget <= 0:
+            return None
+        fee = self.numeric['fee']
+        return ~np.isnan(fee) & (fee <= budget)
+
+    def search(self, query_vec, top_n=5, mask=None, rows=None, stats=None, fill=True):
+        """
+        倒排索引检索 top_n：只读查询词的倒排链，MaxScore 剪枝后对少量候选精确打分，
+        结果（含同分顺序、不足 top_n 时按行号补 0 分行）与 search_exhaustive 一致。
+        mask 为行过滤掩码，rows 为允许的行号（升序）；fill=False 时只返回得分 > 0 的行。
+        返回 (行号数组, 分数数组)
+        """
+        if len(self) < self.exhaustive_max_docs:
+            hits, hit_scores = self.search_exhaustive(query_vec, top_n, mask, rows)
+            if not fill:
+                positive = hit_scores > 0
+                hits, hit_scores = hits[positive], hit_scores[positive]
+            return hits, hit_scores
+        q = sparse.csr_matrix(query_vec)
+        terms = np.asarray(q.indices[q.indptr[0]:q.indptr[1]], dtype=np.int64)
+        qweights = np.asarray(q.data[q.indptr[0]:q.indptr[1]], dtype=np.float64)
+        cand = self.postings.candidates(terms, qweights, top_n, mask=mask, rows=rows, stats=stats)
+        if len(cand):
+            dense = np.zeros(q.shape[1])
+            dense[terms] = qweights
+            exact = self.X[cand] @ dense
+            top = topk(exact, top_n)
+            hits, hit_scores = cand[top], exact[top]
+        else:
+            hits, hit_scores = cand, np.empty(0)
+        if not fill:
+            return hits, hit_scores
+        pad = self.postings.fill_rows(cand, top_n - len(hits), mask=mask, rows=rows)
+        return np.concatenate([hits, pad]), np.concatenate([hit_scores, np.zeros(len(pad))])
+
+    def search_exhaustive(self, query_vec, top_n=5, mask=None, rows=None):
+        """
+        暴力打分：在 X 上对全部行打分再取 top_n；mask 为行过滤掩码，rows 为允许的行号（只对这些行打分）。
+        返回 (行号数组, 分数数组)
+        """
+        if rows is not None:
+            sub = self.X[rows] @ query_vec.toarray().ravel()
+            top = topk(sub, top_n)
+            return rows[top], sub[top]
+        scores = self.scores(query_vec)
+        if mask is None:
+            top = topk(scores, top_n)
+            return top, scores[top]
+        rows = np.flatnonzero(mask)
+        sub = scores[rows]
+        top = topk(sub, top_n)
+        return rows[top], sub[top]
+
+    def search_many(self, query_mat, top_n=5, mask=None, rows=None, max_block_bytes=64 << 20):
+        """
+        多条查询一起打分：按查询分块计算 Q×N 分数矩阵，每块的稠密分数不超过 max_block_bytes，
+        逐块取 top_n（规则与 search_exhaustive 相同）。mask 为行过滤掩码，rows 为允许的行号（升序）。
+        返回 (行号矩阵, 分数矩阵)，形状均为 (查询数, k)
+        """
+        if rows is None and mask is not None:
+            rows = np.flatnonzero(mask)
+        X = self.X if rows is None else self.X[rows]
+        n, q = X.shape[0], query_mat.shape[0]
+        k = min(top_n, n)
+        top_idx = np.empty((q, k), dtype=np.int64)
+        top_scores = np.empty((q, k), dtype=np.float64)
+        block = max(1, int(max_block_bytes // (8 * max(n, 1))))
+        for start in range(0, q, block):
+            Qb = query_mat[start:start + block]
+            S = np.ascontiguousarray((X @ Qb.T.toarray()).T)
+            idx = topk_rows(S, k)
+            top_idx[start:start + Qb.shape[0]] = idx
+            top_scores[start:start + Qb.shape[0]] = np.take_along_axis(S, idx, axis=1)
+        if rows is not None:
+            top_idx = rows[top_idx]
+        return top_idx, top_scores
+
+
+def _json_value(v):
+    if v is None or v is pd.NA:
+        return None
+    if isinstance(v, (float, np.floating)) and np.isnan(v):
+        return None
+    if isinstance(v, np.generic):
+        return v.item()
+    return v
+
+
+def _pretokenized(tokens):
+    return tokens
+
+
+def doc_token_sets(docs_tokens):
+    """
+    把每篇文档的分词结果压成 CSR 形式的词集合：(词表, 行指针, 升序词号)
+    """
+    token_ids = {}
+    indptr, ids = [0], []
+    for tokens in docs_tokens:
+        doc = {token_ids.setdefault(t, len(token_ids)) for t in tokens if t.strip()}
+        ids.extend(sorted(doc))
+        indptr.append(len(ids))
+    return list(token_ids), np.array(indptr, dtype=np.int64), np.array(ids, dtype=np.int32)
+
+
+def fit_index(df, max_features=500, source_sha256='', processes=None):
+    """
+    在内存中拟合索引；df 需包含“内容”列以外的原始字段，内容为空的行会被去掉。
+    语料只分词一次：同一份分词结果既用于 TF-IDF，也作为每篇文档的词集合存进索引
+    """
+    df = df.copy()
+    df['内容'] = build_content(df)
+    df = df[df['内容'].str.strip() != ''].reset_index(drop=True)
+    if df.empty:
+        raise ValueError("没有任何可用内容行，请检查数据文件内容！")
+    user_words = destination_words(df['目的地']) if '目的地' in df.columns else []
+    docs_tokens = segment_corpus(df['内容'].str.lower(), user_words=user_words, processes=processes)
+    vectorizer = TfidfVectorizer(analyzer=_pretokenized, max_features=max_features)
+    X = vectorizer.fit_transform(docs_tokens).tocsr()
+    X.sort_indices()
+    vocab_list = [None] * len(vectorizer.vocabulary_)
+    for term, j in vectorizer.vocabulary_.items():
+        vocab_list[j] = term
+    columns = {}
+    for k in ROW_FIELDS:
+        col = df[k] if k in df.columns else pd.Series([''] * len(df))
+        columns[k] = [_json_value(v) for v in col.tolist()]
+    rows = RowStore.from_columns(columns)
+    meta = {
+        'format': INDEX_FORMAT,
+        'source_sha256': source_sha256,
+        'max_features': max_features,
+        'n_docs': int(X.shape[0]),
+        'n_terms': len(vocab_list),
+        'vocabulary': vocab_list,
+        'user_words': user_words,
+        'built_at': time.strftime('%Y-%m-%d %H:%M:%S'),
+    }
+    numeric = numeric_columns(df)
+    dates = numeric['date'][~np.isnan(numeric['date'])]
+    # 重排时的“新近度”以数据里最新的出发日期为基准，结果不随当前日期漂移
+    meta['latest_date'] = float(dates.max()) if dates.size else None
+    tokens, tok_indptr, tok_ids = doc_token_sets(docs_tokens)
+    facets = build_facets(rows, numeric)
+    meta['facets'] = {name: values for name, (values, _, _) in facets.items()}
+    from route_graph import RouteGraph, build_routes
+    routes = {kind: RouteGraph(kind, names, arrays) for kind, (names, arrays) in build_routes(df).items()}
+    meta['routes'] = {kind: graph.names for kind, graph in routes.items()}
+    return TravelIndex(dict(vectorizer.vocabulary_), vectorizer.idf_.astype(np.float64),
+                       X, rows, numeric, tokens, tok_indptr, tok_ids, meta, facets=facets, routes=routes,
+                       docs=result_docs(columns))
+
+
+# ----------- 持久化 -----------
+def default_index_dir(csv_path):
+    stem = os.path.splitext(os.path.basename(csv_path))[0]
+    return os.path.join(os.path.dirname(os.path.abspath(csv_path)), 'index', stem)
+
+
+def _index_arrays(index):
+    X = index.X
+    arrays = {
+        'idf': np.asarray(index.idf, dtype=np.float64),
+        'indptr': np.asarray(X.indptr, dtype=np.int64),
+        'indices': np.asarray(X.indices, dtype=np.int32),
+        'data': np.asarray(X.data, dtype=np.float64),
+        'tok_indptr': np.asarray(index.tok_indptr, dtype=np.int64),
+        'tok_ids': np.asarray(index.tok_ids, dtype=np.int32),
+        'post_indptr': np.asarray(index.postings.indptr, dtype=np.int64),
+        'post_docs': np.asarray(index.postings.docs, dtype=np.int32),
+        'post_data': np.asarray(index.postings.weights, dtype=np.float64),
+        'post_max': np.asarray(index.postings.term_max, dtype=np.float64),
+        'popularity': np.asarray(index.popularity, dtype=np.float64),
+        'popular': np.asarray(index.popular, dtype=np.int32),
+        'row_data': np.asarray(index.rows.data, dtype=np.uint8),
+        'row_offsets': np.asarray(index.rows.offsets, dtype=np.int64),
+        'doc_data': np.asarray(index.docs.data, dtype=np.uint8),
+        'doc_offsets': np.asarray(index.docs.offsets, dtype=np.int64),
+    }
+    for name, values in index.numeric.items():
+        arrays['num_' + name] = np.asarray(values, dtype=np.float64)
+    for name, (_, indptr, rows) in index.facets.items():
+        arrays[f'facet_{name}_indptr'] = np.asarray(indptr, dtype=np.int64)
+        arrays[f'facet_{name}_rows'] = np.asarray(rows, dtype=np.int32)
+    for kind, graph in index.routes.items():
+        for part in ROUTE_PARTS:
+            arrays[f'route_{kind}_{part}'] = np.asarray(getattr(graph, part))
+    return arrays
+
+
+def save_index(index, index_dir):
+    """
+    写入一个新版本目录并原子地切换 CURRENT，返回版本号
+    """
+    os.makedirs(index_dir, exist_ok=True)
+    tmp_dir = tempfile.mkdtemp(prefix='.build-', dir=index_dir)
+    try:
+        checksums = {}
+        for name, arr in _index_arrays(index).items():
+            path = os.path.join(tmp_dir, name + '.npy')
+            np.save(path, arr)
+            checksums[name + '.npy'] = file_sha256(path)
+        tokens_path = os.path.join(tmp_dir, 'tokens.json')
+        with open(tokens_path, 'w', encoding='utf-8') as f:
+            json.dump(index.tokens, f, ensure_ascii=False)
+        checksums['tokens.json'] = file_sha256(tokens_path)
+        meta = dict(index.meta)
+        meta['checksums'] = checksums
+        h = hashlib.sha256(meta.get('source_sha256', '').encode())
+        for name in sorted(checksums):
+            h.update(checksums[name].encode())
+        h.update(json.dumps(meta['vocabulary'], ensure_ascii=False).encode('utf-8'))
+        meta['version'] = h.hexdigest()[:12]
+        with open(os.path.join(tmp_dir, 'meta.json'), 'w', encoding='utf-8') as f:
+            json.dump(meta, f, ensure_ascii=False)
+        version_dir = os.path.join(index_dir, meta['version'])
+        if os.path.exists(version_dir):
+            shutil.rmtree(tmp_dir)
+        else:
+            os.replace(tmp_dir, version_dir)
+    except Exception:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        raise
+    _write_current(index_dir, meta['version'])
+    _prune_versions(index_dir, meta['version'])
+    index.meta = meta
+    return meta['version']
+
+
+def _write_current(index_dir, version):
+    tmp = os.path.join(index_dir, '.CURRENT.tmp')
+    with open(tmp, 'w') as f:
+        f.write(version)
+    os.replace(tmp, os.path.join(index_dir, 'CURRENT'))
+
+
+def _prune_versions(index_dir, current, keep=KEEP_VERSIONS):
+    versions = [d for d in os.listdir(index_dir)
+                if not d.startswith('.') and os.path.isfile(os.path.join(index_dir, d, 'meta.json'))]
+    versions.sort(key=lambda d: os.path.getmtime(os.path.join(index_dir, d)), reverse=True)
+    old = [d for d in versions if d != current][keep - 1:]
+    for d in old:
+        shutil.rmtree(os.path.join(index_dir, d), ignore_errors=True)
+
+
+def current_version(index_dir):
+    path = os.path.join(index_dir, 'CURRENT')
+    if not os.path.exists(path):
+        return None
+    with open(path) as f:
+        return f.read().strip() or None
+
+
+def load_index(index_dir, source_csv=None, verify=True):
+    """
+    以内存映射方式加载当前版本的索引。
+    source_csv 给出时校验数据源指纹；verify=True 时校验各文件的 sha256。
+    不一致时抛出 StaleIndexError。
+    """
+    version = current_version(index_dir)
+    if version is None:
+        raise FileNotFoundError(f"找不到索引: {index_dir}")
+    version_dir = os.path.join(index_dir, version)
+    with open(os.path.join(version_dir, 'meta.json'), encoding='utf-8') as f:
+        meta = json.load(f)
+    if meta.get('format') != INDEX_FORMAT:
+        raise StaleIndexError(f"索引格式版本不符: {meta.get('format')} != {INDEX_FORMAT}")
+    if source_csv is not None and meta.get('source_sha256') != file_sha256(source_csv):
+        raise StaleIndexError(f"索引已过期，数据源已变化: {source_csv}")
+    if verify:
+        for name, checksum in meta['checksums'].items():
+            if file_sha256(os.path.join(version_dir, name)) != checksum:
+                raise StaleIndexError(f"索引文件校验失败: {name}")
+    arrays = {name: np.load(os.path.join(version_dir, name + '.npy'), mmap_mode='r')
+              for name in ARRAY_FILES}
+    X = sparse.csr_matrix((arrays['data'], arrays['indices'], arrays['indptr']),
+                          shape=(meta['n_docs'], meta['n_terms']), copy=False)
+    with open(os.path.join(version_dir, 'tokens.json'), encoding='utf-8') as f:
+        tokens = json.load(f)
+    # 查询分词必须与建索引时使用同一份用户词典
+    load_user_words(meta.get('user_words', []))
+    vocabulary = {term: j for j, term in enumerate(meta['vocabulary'])}
+    numeric = {name: arrays['num_' + name] for name in NUMERIC_FIELDS}
+    postings = InvertedIndex(arrays['post_indptr'], arrays['post_docs'], arrays['post_data'],
+                             arrays['post_max'], meta['n_docs'])
+    rows = RowStore(arrays['row_data'], arrays['row_offsets'])
+    facets = {name: (meta['facets'][name], arrays[f'facet_{name}_indptr'], arrays[f'facet_{name}_rows'])
+              for name in FACET_FIELDS}
+    from route_graph import RouteGraph
+    routes = {kind: RouteGraph(kind, meta['routes'][kind], {part: arrays[f'route_{kind}_{part}'] for part in ROUTE_PARTS})
+              for kind in ROUTE_FIELDS}
+    docs = RowStore(arrays['doc_data'], arrays['doc_offsets'])
+    return TravelIndex(vocabulary, arrays['idf'], X, rows, numeric, tokens,
+                       arrays['tok_indptr'], arrays['tok_ids'], meta, postings,
+                       arrays['popularity'], arrays['popular'], facets, routes, docs)
+
+
+def build_index(csv_path, index_dir=None, max_features=500, dedup=None):
+    """
+    dedup 为 None 时自动判断：没经过清洗流水线的数据（没有“旅行月份”列，如直接用原始爬取文件）先去掉近重复游记
+    """
+    index_dir = index_dir or default_index_dir(csv_path)
+    df = load_dataset(csv_path, INDEX_COLUMNS)
+    if dedup is None:
+        dedup = '旅行月份' not in df.columns
+    if dedup:
+        from near_dup import drop_near_duplicates
+        df = drop_near_duplicates(df).reset_index(drop=True)
+    index = fit_index(df, max_features=max_features, source_sha256=file_sha256(csv_path))
+    version = save_index(index, index_dir)
+    print(f"[索引构建] {csv_path} -> {index_dir}/{version}，文档数 {len(index)}，词表 {len(index.vocabulary)}")
+    return index
+
+
+def load_or_build_index(csv_path, index_dir=None, max_features=500, verify=True):
+    """
+    优先加载已有索引；不存在或已过期时重新构建。verify=False 时跳过数据源和文件校验和
+    （由别的进程刚构建/校验过的索引，直接挂载）
+    """
+    index_dir = index_dir or default_index_dir(csv_path)
+    try:
+        return load_index(index_dir, source_csv=csv_path if verify else None, verify=verify)
+    except (FileNotFoundError, StaleIndexError) as e:
+        print(f"[索引] {e}，重新构建")
+        return build_index(csv_path, index_dir, max_features=max_features)
+
+
+if __name__ == "__main__":
+    csv_path = sys.argv[1] if len(sys.argv) > 1 else "../data/featured_travel.csv"
+    # 词表上限，0 表示不限（检索只读查询词的倒排链，词表变大不增加单次查询开销）
+    max_features = int(sys.argv[2]) if len(sys.argv) > 2 else 500
+    build_index(csv_path, max_features=max_features or None)
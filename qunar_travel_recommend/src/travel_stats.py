@@ -0,0 +1,327 @@
+"""
+游记统计的物化聚合表：按 目的地 × 年份 × 月份 × 人物 × 主题 × 时长分桶 预先汇总
+游记数、费用合计、有费用的游记数，看板和 /api/stats 直接从这张小表出数。
+
+聚合表可增量刷新：水位记下已计入的行数、处理到的字节位置、该位置之前 ANCHOR_BYTES 字节的指纹、表头和文件签名。
+    - 文件签名没变：不读数据
+    - 文件在水位之后追加了新行（表头和锚点字节都没变）：从水位的字节位置往后读，只聚合新增的行
+    - 其他变化（截断、整体重写）：整体重算；rebuild=True 时总是整体重算
+抓取存储（travel_store）更新计数时会整体重写文件，但统计不用计数字段，所以增量抓取直接把新追加的行交给
+refresh（appended），不用重读文件。水位大小与语料规模无关，聚合表文件只随分组数增长。
+
+“目的地”维度与看板原来的口径相同：用 TITLE_DEST 从标题里取“游/行”前的 2-8 个汉字。
+
+产物默认在数据文件旁边的 stats/<数据文件名>.json。
+
+    python travel_stats.py ../data/qunar_travel.csv
+"""
+import csv
+import hashlib
+import io
+import json
+import os
+import sys
+import threading
+import time
+
+import numpy as np
+import pandas as pd
+
+from feature_pipeline import add_feature_columns, clean_frame, parse_dates
+
+STATS_FORMAT = 3
+# 水位锚点：确认水位之前的内容没被改写时只比对这么多字节
+ANCHOR_BYTES = 4096
+DIMENSIONS = ['目的地', '年份', '月份', '人物', '主题', '时长']
+MEASURES = ['数量', '费用合计', '费用条数']
+INT_DIMENSIONS = ['年份', '月份']
+# 对外参数名 -> 维度
+DIMENSION_ALIASES = {'city': '目的地', 'dest': '目的地', 'year': '年份', 'month': '月份',
+                     'people': '人物', 'theme': '主题', 'days': '时长'}
+# 时长分桶：(最少天数, 最多天数, 名称)
+DURATION_BUCKETS = [(1, 1, '1天'), (2, 2, '2天'), (3, 3, '3天'), (4, 5, '4-5天'),
+                    (6, 7, '6-7天'), (8, 10, '8-10天'), (11, 15, '11-15天'), (16, np.inf, '15天以上')]
+TITLE_DEST = r'([\u4e00-\u9fa5]{2,8})[游行]'
+UNKNOWN = '未知'
+
+
+# ----------- 维度计算（向量化） -----------
+def duration_bucket(days):
+    days = pd.to_numeric(days, errors='coerce')
+    out = pd.Series(pd.NA, index=days.index, dtype='object')
+    for lo, hi, name in DURATION_BUCKETS:
+        out[(days >= lo) & (days <= hi)] = name
+    return out
+
+
+def _column(df, names):
+    for c in names:
+        if c in df.columns:
+            return df[c]
+    return pd.Series(pd.NA, index=df.index, dtype='object')
+
+
+def stats_rows(df):
+    """
+    原始爬取数据先做与流水线一致的清洗 + 特征（逐行处理，可以只对新增行做）；已是特征数据的原样返回
+    """
+    if '旅行月份' in df.columns or '天数' not in df.columns:
+        return df
+    return add_feature_columns(clean_frame(df))
+
+
+def dimension_frame(df):
+    """
+    每行对应的各维度取值；缺失的字符串维度记为“未知”，缺失的年份/月份记为 None
+    """
+    dest = _column(df, ['标题']).astype('string').str.extract(TITLE_DEST, expand=False)
+    dates = parse_dates(_column(df, ['出发时间', '出发日期']).astype('string'))
+    month = _column(df, ['旅行月份'])
+    month = pd.to_numeric(month, errors='coerce').where(month.notna(), dates.dt.month)
+    dims = pd.DataFrame({
+        '目的地': dest,
+        '年份': dates.dt.year,
+        '月份': month,
+        '人物': _column(df, ['人物', '人数']),
+        '主题': _column(df, ['主题', '玩法']),
+        '时长': duration_bucket(_column(df, ['旅行时长', '天数'])),
+    }, index=df.index)
+    for c in DIMENSIONS:
+        if c in INT_DIMENSIONS:
+            dims[c] = dims[c].astype('Int64').astype(object).where(dims[c].notna(), None)
+        else:
+            dims[c] = dims[c].astype(object).where(dims[c].notna(), UNKNOWN).map(str)
+    return dims
+
+
+def file_signature(path):
+    st = os.stat(path)
+    return [st.st_size, st.st_mtime_ns]
+
+
+def read_anchor(path, offset):
+    """
+    offset 之前 ANCHOR_BYTES 字节的指纹
+    """
+    start = max(0, offset - ANCHOR_BYTES)
+    with open(path, 'rb') as f:
+        f.seek(start)
+        return hashlib.sha256(f.read(offset - start)).hexdigest()
+
+
+def read_header(path):
+    with open(path, encoding='utf-8-sig', newline='') as f:
+        return next(csv.reader(f), [])
+
+
+def make_watermark(path, rows, signature=None):
+    """
+    水位推进到文件末尾（已处理 rows 行）
+    """
+    signature = signature or file_signature(path)
+    offset = signature[0]
+    return {'rows': rows, 'offset': offset, 'anchor': read_anchor(path, offset),
+            'header': read_header(path), 'file': signature}
+
+
+def appended_only(path, watermark, signature):
+    """
+    文件是否只在水位之后追加了内容（变长、表头和锚点字节都没变）
+    """
+    offset = watermark.get('offset')
+    if offset is None or signature[0] < offset:
+        return False
+    return read_header(path) == watermark.get('header') and read_anchor(path, offset) == watermark.get('anchor')
+
+
+def read_tail(path, offset, header):
+    """
+    从字节位置 offset 往后读出的行（不含表头），各列按字符串读
+    """
+    with open(path, 'rb') as f:
+        f.seek(offset)
+        data = f.read()
+    if not data.strip():
+        return pd.DataFrame(columns=header)
+    return pd.read_csv(io.BytesIO(data), header=None, names=header, dtype=str, encoding='utf-8')
+
+
+# ----------- 聚合表 -----------
+class StatsStore:
+    """
+    物化聚合表。groups: 维度取值元组 -> [数量, 费用合计, 费用条数]；watermark: 已处理到的位置（见 make_watermark）
+    """
+
+    def __init__(self, path=None):
+        self.path = path
+        self.groups = {}
+        self.watermark = {}
+        self.rows = 0
+        self.source = None
+        self.updated_at = None
+        self.lock = threading.Lock()
+
+    @classmethod
+    def open(cls, path):
+        """
+        读取已保存的聚合表；文件不存在或格式不符时返回空表
+        """
+        store = cls(path)
+        if not os.path.exists(path):
+            return store
+        with open(path, encoding='utf-8') as f:
+            saved = json.load(f)
+        if saved.get('format') != STATS_FORMAT or saved.get('dimensions') != DIMENSIONS:
+            print(f"[统计] {path} 格式不符，将重新聚合")
+            return store
+        store.groups = {tuple(g[:len(DIMENSIONS)]): g[len(DIMENSIONS):] for g in saved['groups']}
+        store.watermark = saved['watermark']
+        store.rows = saved['rows']
+        store.source = saved.get('source')
+        store.updated_at = saved.get('updated_at')
+        return store
+
+    def save(self, path=None):
+        path = path or self.path
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        saved = {
+            'format': STATS_FORMAT,
+            'dimensions': DIMENSIONS,
+            'measures': MEASURES,
+            'rows': self.rows,
+            'source': self.source,
+            'updated_at': self.updated_at,
+            'groups': [list(k) + v for k, v in self.groups.items()],
+            'watermark': self.watermark,
+        }
+        tmp = path + '.tmp'
+        with open(tmp, 'w', encoding='utf-8') as f:
+            json.dump(saved, f, ensure_ascii=False)
+        os.replace(tmp, path)
+
+    def clear(self):
+        self.groups, self.watermark, self.rows = {}, {}, 0
+
+    def add(self, df):
+        """
+        把一批（已清洗、带特征的）行累加进聚合表，返回累加的行数
+        """
+        if df.empty:
+            return 0
+        dims = dimension_frame(df)
+        fee = pd.to_numeric(_column(df, ['费用', '人均费用']), errors='coerce')
+        dims['数量'] = 1
+        dims['费用合计'] = fee.fillna(0).astype(float)
+        dims['费用条数'] = fee.notna().astype(int)
+        batch = dims.groupby(DIMENSIONS, dropna=False, sort=False)[MEASURES].sum()
+        for key, (n, fee_sum, fee_n) in zip(batch.index, batch.to_numpy()):
+            key = tuple(None if v is None or v is pd.NA or v != v else v for v in key)
+            key = tuple(int(v) if c in INT_DIMENSIONS and v is not None else v
+                        for c, v in zip(DIMENSIONS, key))
+            acc = self.groups.setdefault(key, [0, 0.0, 0])
+            acc[0] += int(n)
+            acc[1] += float(fee_sum)
+            acc[2] += int(fee_n)
+        self.rows += len(df)
+        self.updated_at = time.strftime('%Y-%m-%dT%H:%M:%S')
+        return len(df)
+
+    def refresh(self, csv_path, appended=None, rebuild=False):
+        """
+        从数据文件增量刷新：只对水位之后的行做清洗、特征和聚合。返回 (新增行数, 是否整体重算)。
+        appended 给出时，调用方保证文件自上次刷新以来只在末尾追加了这些行（已有行至多改了计数字段，
+        如 travel_store.merge_into_store），直接聚合它们，不读文件
+        """
+        with self.lock:
+            source = os.path.abspath(csv_path)
+            signature = file_signature(csv_path)
+            same_source = self.source == source
+            if not rebuild and same_source and appended is not None:
+                added = self.add(stats_rows(appended))
+                self.watermark = make_watermark(csv_path, self.watermark.get('rows', 0) + len(appended), signature)
+                return added, False
+            if not rebuild and same_source and self.watermark.get('file') == signature:
+                return 0, False
+            if not rebuild and same_source and appended_only(csv_path, self.watermark, signature):
+                tail = read_tail(csv_path, self.watermark['offset'], self.watermark['header'])
+                added = self.add(stats_rows(tail))
+                # 清洗时被过滤掉的行也算已处理，水位推进到文件末尾
+                self.watermark = make_watermark(csv_path, self.watermark['rows'] + len(tail), signature)
+                return added, False
+            # 截断、整体重写或换了数据源：已计入的行无法增量扣减，整体重算
+            from columnar import load_dataset
+            df = load_dataset(csv_path)
+            self.clear()
+            self.source = source
+            added = self.add(stats_rows(df))
+            self.watermark = make_watermark(csv_path, len(df), signature)
+            return added, True
+
+    def to_records(self, table):
+        """
+        table() 的结果转成可直接 JSON 序列化的字典列表（缺失值为 None）
+        """
+        return json.loads(table.to_json(orient='records', force_ascii=False))
+
+    def table(self, group_by=None, filters=None):
+        """
+        按 group_by 维度汇总（None 时汇总成一行），filters 为 {维度: 取值或取值列表}。
+        返回 DataFrame：维度列 + 数量、费用合计、费用条数、平均费用
+        """
+        group_by = [resolve_dimension(c) for c in (group_by or [])]
+        df = pd.DataFrame([list(k) + v for k, v in self.groups.items()], columns=DIMENSIONS + MEASURES)
+        for c in INT_DIMENSIONS:
+            df[c] = df[c].astype('Int64')
+        for dim, value in (filters or {}).items():
+            dim = resolve_dimension(dim)
+            values = value if isinstance(value, (list, tuple, set)) else [value]
+            if dim in INT_DIMENSIONS:
+                try:
+                    values = [int(v) for v in values]
+                except ValueError:
+                    raise ValueError(f"{dim} 的取值必须是整数：{values}")
+            else:
+                values = [str(v) for v in values]
+            df = df[df[dim].isin(values)]
+        if group_by:
+            out = df.groupby(group_by, dropna=False, sort=False)[MEASURES].sum().reset_index()
+        else:
+            out = pd.DataFrame([df[MEASURES].sum()], columns=MEASURES)
+        out['数量'] = out['数量'].astype(int)
+        out['费用条数'] = out['费用条数'].astype(int)
+        out['平均费用'] = (out['费用合计'] / out['费用条数'].replace(0, np.nan)).round(2)
+        return out.sort_values('数量', ascending=False, kind='stable').reset_index(drop=True)
+
+
+def resolve_dimension(name):
+    dim = DIMENSION_ALIASES.get(name, name)
+    if dim not in DIMENSIONS:
+        raise ValueError(f"未知的统计维度：{name}，可选 {DIMENSIONS}")
+    return dim
+
+
+def default_stats_path(csv_path):
+    base = os.path.dirname(os.path.abspath(csv_path))
+    name = os.path.splitext(os.path.basename(csv_path))[0]
+    return os.path.join(base, 'stats', name + '.json')
+
+
+def refresh_stats(csv_path, stats_path=None, rebuild=False, appended=None):
+    """
+    打开数据文件对应的聚合表，增量刷新并保存，返回 StatsStore；rebuild=True 时丢掉已有聚合整体重算，
+    appended 见 StatsStore.refresh
+    """
+    stats_path = stats_path or default_stats_path(csv_path)
+    store = StatsStore.open(stats_path)
+    t0 = time.perf_counter()
+    watermark = store.watermark
+    added, rebuilt = store.refresh(csv_path, appended=appended, rebuild=rebuild)
+    if added or rebuilt or store.watermark != watermark or not os.path.exists(stats_path):
+        store.save()
+    print(f"[统计] {csv_path}: {'重算' if rebuilt else '增量'}聚合 {added} 行，共 {store.rows} 行、"
+          f"{len(store.groups)} 组，用时 {time.perf_counter() - t0:.2f}s -> {stats_path}")
+    return store
+
+
+if __name__ == '__main__':
+    refresh_stats(sys.argv[1] if len(sys.argv) > 1 else '../data/qunar_travel.csv')
@@ -0,0 +1,109 @@
+"""
+以游记ID（链接中的 /youji/<id>）为主键的爬取结果存储。
+
+    - 新游记追加到文件末尾
+    - 已有游记只原地更新浏览/点赞/评论计数，其他字段保持不变
+"""
+import os
+import re
+
+import pandas as pd
+
+YOUJI_ID_RE = re.compile(r"/youji/(\d+)")
+COUNTER_FIELDS = ["浏览", "点赞", "评论"]
+
+
+def youji_id(link):
+    if not isinstance(link, str):
+        return None
+    m = YOUJI_ID_RE.search(link)
+    return m.group(1) if m else None
+
+
+def load_store(path):
+    """
+    读取存储文件，返回带 youji_id 列的 DataFrame；文件不存在时返回空表
+    """
+    if not os.path.exists(path):
+        return pd.DataFrame()
+    # 全部按字符串读入，整体重写时其他字段原样保留
+    df = pd.read_csv(path, encoding="utf-8-sig", dtype=str)
+    df["youji_id"] = df["链接"].map(youji_id)
+    return df
+
+
+def known_ids(path):
+    df = load_store(path)
+    if df.empty:
+        return set()
+    return set(df["youji_id"].dropna())
+
+
+def _write_atomic(df, path):
+    tmp = path + ".tmp"
+    df.to_csv(tmp, index=False, encoding="utf-8-sig")
+    os.replace(tmp, path)
+
+
+def _batch_frame(records):
+    """
+    一批抓取记录转成带 youji_id 列的 DataFrame，去掉没有ID的，同一ID以第一次出现为准
+    """
+    new = pd.DataFrame(records)
+    if new.empty:
+        return new
+    new["youji_id"] = new["链接"].map(youji_id)
+    return new.dropna(subset=["youji_id"]).drop_duplicates("youji_id")
+
+
+def new_records(records, known):
+    """
+    本批记录中 ID 不在 known 里的（即 merge_into_store 会追加的行），不含 youji_id 列
+    """
+    new = _batch_frame(records)
+    if new.empty:
+        return new
+    return new[~new["youji_id"].isin(known)].drop(columns="youji_id")
+
+
+def merge_into_store(path, records):
+    """
+    把新抓到的记录并入存储：新ID追加，已有ID只更新计数字段。
+    同一批里重复出现的ID以第一次出现为准。返回 (新增条数, 计数有变化的条数)
+    """
+    new = _batch_frame(records)
+    if new.empty:
+        return 0, 0
+    store = load_store(path)
+    if store.empty:
+        _write_atomic(new.drop(columns="youji_id"), path)
+        return len(new), 0
+
+    is_known = new["youji_id"].isin(store["youji_id"])
+    added = new[~is_known]
+    updated = 0
+    counters = [c for c in COUNTER_FIELDS if c in new.columns and c in store.columns]
+    if is_known.any() and counters:
+        fresh = new[is_known].set_index("youji_id")[counters]
+        store = store.reset_index(drop=True)
+        key = store["youji_id"]
+        hit = key.isin(fresh.index)
+        changed_rows = pd.Series(False, index=store.index)
+        for c in counters:
+            old = pd.to_numeric(store.loc[hit, c], errors="coerce")
+            val = pd.to_numeric(key[hit].map(fresh[c]), errors="coerce")
+            changed = val.notna() & (old.isna() | (old != val))
+            if changed.any():
+                idx = changed[changed].index
+                store.loc[idx, c] = val[changed].astype("int64").astype(str)
+                changed_rows[idx] = True
+        updated = int(changed_rows.sum())
+
+    if updated:
+        # 计数有变化时整体重写（原子替换），新记录顺带写在末尾
+        merged = pd.concat([store, added], ignore_index=True)
+        _write_atomic(merged.drop(columns="youji_id"), path)
+    elif not added.empty:
+        columns = [c for c in store.columns if c != "youji_id"]
+        added.reindex(columns=columns).to_csv(path, mode="a", header=False, index=False, encoding="utf-8")
+    return len(added), updated
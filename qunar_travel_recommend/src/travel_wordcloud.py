@@ -1,22 +1,18 @@
-import pandas as pd
-from wordcloud import WordCloud
+import io
 import matplotlib.pyplot as plt
+from term_freq import refresh_term_freq, wordcloud_png
 
 def generate_wordcloud(csv_path, font_path="msyh.ttc"):
-    df = pd.read_csv(csv_path)
-    # 自动组合标题+主题+行程
-    text_columns = []
-    for col in ["标题", "主题", "行程"]:
-        if col in df.columns:
-            text_columns.append(df[col].astype(str))
-    if not text_columns:
+    # 标题+主题+行程逐篇分词，词频表持久化并增量更新，不再拼成一个大字符串
+    store = refresh_term_freq(csv_path, ["标题", "主题", "行程"])
+    if not store.counts:
         raise ValueError("没有可用的文本列！")
-    texts = " ".join([" ".join(col) for col in text_columns])
-    wordcloud = WordCloud(font_path=font_path, width=800, height=400, background_color='white').generate(texts)
+    png = wordcloud_png(store, font_path=font_path, width=800, height=400, max_words=200,
+                        background_color="white")
     plt.figure(figsize=(12,6))
-    plt.imshow(wordcloud, interpolation="bilinear")
+    plt.imshow(plt.imread(io.BytesIO(png)), interpolation="bilinear")
     plt.axis("off")
     plt.show()
 
 if __name__ == "__main__":
-    generate_wordcloud("../data/featured_travel.csv", font_path="msyh.ttc")
\ No newline at end of file
+    generate_wordcloud("../data/featured_travel.csv", font_path="msyh.ttc")
@@ -1,3 +1,9 @@
+import json
+import os
+
+PROFILE_FIELDS = ["name", "preferences", "budget", "travel_days", "travel_month", "accompany"]
+
+
 def build_user_profile(name, preferences, budget, travel_days, travel_month, accompany):
     return {
         "name": name,
@@ -8,6 +14,28 @@ def build_user_profile(name, preferences, budget, travel_days, travel_month, acc
         "accompany": accompany        # 同行方式, 如 "家庭" "独自" "三五好友"
     }
 
+def save_profiles(profiles, path):
+    """
+    画像按行写成 JSON（.jsonl）
+    """
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    with open(path, "w", encoding="utf-8") as f:
+        for p in profiles:
+            f.write(json.dumps(p, ensure_ascii=False) + "\n")
+
+
+def load_profiles(path):
+    """
+    读取画像文件：.csv（列名同 build_user_profile 的字段）或每行一个 JSON 的 .jsonl
+    """
+    if path.endswith(".csv"):
+        import pandas as pd
+        df = pd.read_csv(path, dtype={"name": str, "preferences": str, "accompany": str})
+        df = df.astype(object).where(df.notna(), None)
+        return [build_user_profile(**{k: r.get(k) for k in PROFILE_FIELDS}) for r in df.to_dict("records")]
+    with open(path, encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
 if __name__ == "__main__":
     profile = build_user_profile("小明", "美食,古镇", 2000, 5, 5, "家庭")
     print(profile)
\ No newline at end of file
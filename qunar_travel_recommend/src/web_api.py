@@ -1,22 +1,282 @@
-from flask import Flask, request, jsonify
-from recommender import TravelRecommender
-
-app = Flask(__name__)
-rec = TravelRecommender("data/qunar_travel.csv")
-
-@app.route("/api/recommend", methods=["GET"])
-def recommend():
-    interests = request.args.get("interests", "")
-    theme = request.args.get("theme", "")
-    people = request.args.get("people", "")
-    city = request.args.get("city", "")
-    budget = request.args.get("budget", type=float, default=None)
-    top_n = request.args.get("top_n", type=int, default=5)
-    recs = rec.recommend(
-        interests=interests, theme=theme, people=people,
-        city=city, budget=budget, top_n=top_n
-    )
-    return jsonify(recs)
-
-if __name__ == "__main__":
+import hmac
+import os
+import time
+from flask import Flask, Response, request, jsonify
+import metrics
+from hot_reload import LiveRecommender, file_signature
+from profile_recs import ProfileRecs, default_recs_dir, profile_interests
+from query_cache import QueryCache, cache_key, normalize_budget, normalize_query, normalize_terms
+from travel_stats import DIMENSIONS, DIMENSION_ALIASES, StatsStore, default_stats_path
+
+app = Flask(__name__)
+DATA_PATH = os.environ.get("TRAVEL_DATA") or os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), "..", "data", "qunar_travel.csv")
+# 请求处理时先取 live.get()，索引热更新替换推荐器时进行中的请求不受影响。
+# 多进程服务（serve.py）的工作进程设置 INDEX_FOLLOW=1：只挂载主进程构建好的索引，跟随其版本切换
+if os.environ.get("INDEX_FOLLOW") == "1":
+    live = LiveRecommender.follow(DATA_PATH)
+else:
+    live = LiveRecommender(DATA_PATH)
+# 每隔多少秒检查数据文件是否有新版本，0 为不自动检查（仍可 POST /admin/index/reload）
+INDEX_WATCH_INTERVAL = int(os.environ.get("INDEX_WATCH_INTERVAL", 30))
+if INDEX_WATCH_INTERVAL > 0:
+    live.watch(INDEX_WATCH_INTERVAL)
+# 管理接口（触发重建）的访问控制：默认只允许本机；远程调用需设置 ADMIN_TOKEN 并带 X-Admin-Token 头
+ADMIN_TOKEN = os.environ.get("ADMIN_TOKEN", "")
+LOCAL_ADDRS = {"127.0.0.1", "::1"}
+cache = QueryCache(max_entries=int(os.environ.get("RECOMMEND_CACHE_SIZE", 1024)),
+                   ttl=int(os.environ.get("RECOMMEND_CACHE_TTL", 300)))
+stats = StatsStore.open(default_stats_path(DATA_PATH))
+# 离线批量算好的画像推荐表（profile_recs.py），文件更新后下次查询时重新读取
+PROFILE_RECS_DIR = os.environ.get("PROFILE_RECS_DIR") or default_recs_dir(DATA_PATH)
+profile_recs = None
+profile_recs_signature = None
+
+
+def collect_service_metrics():
+    """
+    /metrics 抓取时现算：响应缓存、在线索引、采样率和进程号
+    """
+    c = cache.stats()
+    info = live.info
+    return [
+        ('recommend_cache_hits_total', 'counter', '响应缓存命中次数', [({}, c['hits'])]),
+        ('recommend_cache_misses_total', 'counter', '响应缓存未命中次数', [({}, c['misses'])]),
+        ('recommend_cache_evictions_total', 'counter', '响应缓存按 LRU 淘汰的条数', [({}, c['evictions'])]),
+        ('recommend_cache_expirations_total', 'counter', '响应缓存过期的条数', [({}, c['expirations'])]),
+        ('recommend_cache_invalidations_total', 'counter', '索引版本变化导致缓存整体失效的次数',
+         [({}, c['invalidations'])]),
+        ('recommend_cache_entries', 'gauge', '响应缓存当前条数', [({}, c['size'])]),
+        ('recommend_index_docs', 'gauge', '在线索引文档数', [({'version': info['version']}, info['docs'])]),
+        ('recommend_index_reloads_total', 'counter', '索引热更新次数', [({}, live.reloads)]),
+        ('recommend_metrics_sample_rate', 'gauge', '阶段计时的采样率', [({}, metrics.sample_rate)]),
+        ('recommend_process_info', 'gauge', '服务进程（多进程时每个存活的工作进程一条）', [({'pid': str(os.getpid())}, 1)]),
+    ]
+
+
+metrics.REGISTRY.add_collector(collect_service_metrics)
+stats_signature = None
+
+def refresh_stats():
+    """
+    数据文件有变化（mtime/大小）时增量刷新聚合表，只聚合新增的行
+    """
+    global stats_signature
+    st = os.stat(DATA_PATH)
+    signature = (st.st_mtime, st.st_size)
+    if signature != stats_signature:
+        added, rebuilt = stats.refresh(DATA_PATH)
+        if added or rebuilt:
+            stats.save()
+        stats_signature = signature
+
+@app.route("/api/recommend", methods=["GET"])
+def recommend():
+    """
+    参数先规范化（词语去重排序、预算统一成 float）再查缓存，未命中时用规范化后的参数计算。
+    响应带 ETag / Cache-Control，X-Cache 标明是否命中缓存
+    """
+    trace = metrics.start_trace()
+    query = normalize_query(
+        interests=request.args.get("interests", ""),
+        theme=request.args.get("theme", ""),
+        people=request.args.get("people", ""),
+        city=request.args.get("city", ""),
+        budget=request.args.get("budget", type=float, default=None),
+        days=request.args.get("days", type=int, default=None),
+        top_n=request.args.get("top_n", type=int, default=5),
+    )
+    key = cache_key(query)
+    rec = live.get()
+    version = rec.index.version
+    entry = cache.get(key, version)
+    status = "HIT"
+    if entry is None:
+        status = "MISS"
+        # 结果字段是建索引时序列化好的 JSON 片段，直接拼接成响应体
+        body, n = rec.recommend_json(trace=trace, **query)
+        entry = cache.put(key, version, body, results=n)
+    if request.if_none_match.contains(entry.etag):
+        resp = Response(status=304)
+    else:
+        resp = Response(entry.body, mimetype="application/json")
+    resp.set_etag(entry.etag)
+    resp.headers["Cache-Control"] = f"public, max-age={entry.max_age()}"
+    resp.headers["X-Cache"] = status
+    cache_label = status.lower()
+    metrics.REQUESTS.inc("recommend", cache_label)
+    metrics.RESULTS.observe(entry.results or 0, "recommend")
+    elapsed = trace.elapsed()
+    if elapsed is not None:
+        metrics.REQUEST_SECONDS.observe(elapsed, "recommend", cache_label)
+    trace.finish()
+    return resp
+
+@app.route("/metrics", methods=["GET"])
+def metrics_endpoint():
+    return Response(metrics.render(), content_type="text/plain; version=0.0.4; charset=utf-8")
+
+@app.route("/api/cache/stats", methods=["GET"])
+def cache_stats():
+    return jsonify(cache.stats())
+
+@app.route("/admin/index", methods=["GET"])
+def index_status():
+    """
+    当前在线索引的版本、构建时间、文档数，以及是否正在后台重建
+    """
+    return jsonify(live.status())
+
+def admin_allowed():
+    """
+    管理接口只接受本机请求；设置了 ADMIN_TOKEN 时也接受带正确 X-Admin-Token 头的远程请求
+    """
+    if request.remote_addr in LOCAL_ADDRS:
+        return True
+    token = request.headers.get("X-Admin-Token", "")
+    return bool(ADMIN_TOKEN) and hmac.compare_digest(token.encode("utf-8"), ADMIN_TOKEN.encode("utf-8"))
+
+@app.route("/admin/index/reload", methods=["POST"])
+def index_reload():
+    """
+    触发后台重建，立即返回；新索引建好后自动替换
+    """
+    if not admin_allowed():
+        return jsonify({"error": "只允许本机或携带 X-Admin-Token 的请求"}), 403
+    started = live.reload()
+    return jsonify({"started": started, **live.status()}), 202
+
+@app.route("/api/recommend/batch", methods=["POST"])
+def recommend_batch():
+    """
+    与 /api/recommend 的排序相同（召回 + 重排），兴趣串和预算按同样的规则规范化，同一查询两个接口结果一致
+    """
+    body = request.get_json(silent=True)
+    if not isinstance(body, dict):
+        return jsonify({"error": "请求体必须是 JSON 对象"}), 400
+    queries = body.get("queries") or []
+    if not isinstance(queries, list) or not all(isinstance(q, str) for q in queries):
+        return jsonify({"error": "queries 必须是字符串数组"}), 400
+    try:
+        top_n = int(body.get("top_n", 5))
+        budget = body.get("budget")
+        budget = float(budget) if budget not in (None, "") else None
+    except (TypeError, ValueError):
+        return jsonify({"error": "top_n 必须是整数，budget 必须是数字"}), 400
+    if top_n <= 0:
+        return jsonify({"error": "top_n 必须是正整数"}), 400
+    t0 = time.perf_counter()
+    results = live.get().recommend_many([normalize_terms(q) for q in queries], top_n=top_n,
+                                        budget=normalize_budget(budget))
+    elapsed = time.perf_counter() - t0
+    metrics.REQUESTS.inc("batch", "none")
+    metrics.REQUEST_SECONDS.observe(elapsed, "batch", "none")
+    for recs in results:
+        metrics.RESULTS.observe(len(recs), "batch")
+    return jsonify({
+        "results": results,
+        "count": len(queries),
+        "elapsed_ms": round(elapsed * 1000, 2),
+        "qps": round(len(queries) / elapsed, 1) if elapsed > 0 else None,
+    })
+
+def current_profile_recs():
+    global profile_recs, profile_recs_signature
+    try:
+        signature = file_signature(os.path.join(PROFILE_RECS_DIR, "meta.json"))
+    except OSError:
+        return None
+    if signature != profile_recs_signature:
+        profile_recs = ProfileRecs.open(PROFILE_RECS_DIR)
+        profile_recs_signature = signature
+    return profile_recs
+
+@app.route("/api/recommend/user/<name>", methods=["GET"])
+def recommend_user(name):
+    """
+    已知用户按离线算好的画像推荐表直接返回；表是用旧版本索引算的时，用同样的打分和约束放宽规则对该画像实时重算
+    （relaxed 也随之重算）。X-Source 标明来源
+    """
+    t0 = time.perf_counter()
+    top_n = request.args.get("top_n", type=int, default=5)
+    table = current_profile_recs()
+    hit = table.lookup(name, top_n) if table is not None else None
+    if hit is None:
+        return jsonify({"error": f"没有用户 {name} 的画像推荐"}), 404
+    rec = live.get()
+    if table.index_version == rec.index.version:
+        source = "precomputed"
+    else:
+        source = "live"
+        hit = table.recompute(rec, hit["profile"], top_n)
+    interests = profile_interests(hit["profile"])
+    recs = [rec.format_result(i, interests) for i in hit["rows"]]
+    metrics.REQUESTS.inc("user", source)
+    metrics.REQUEST_SECONDS.observe(time.perf_counter() - t0, "user", source)
+    metrics.RESULTS.observe(len(recs), "user")
+    resp = jsonify({"user": name, "results": recs, "relaxed": hit["relaxed"], "source": source})
+    resp.headers["X-Source"] = source
+    return resp
+
+@app.route("/api/routes", methods=["GET"])
+def routes():
+    """
+    路线查询：through=厦门,泉州（ordered=1 要求按顺序经过，也可写成 厦门>泉州）、stops=3、days=5、loop=1，
+    kind=city（目的地）或 poi（行程景点）
+    """
+    kind = request.args.get("kind", "city")
+    if kind not in ("city", "poi"):
+        return jsonify({"error": "kind 只能是 city 或 poi"}), 400
+    through = request.args.get("through", "")
+    loop = request.args.get("loop")
+    t0 = time.perf_counter()
+    recs = live.get().routes(
+        through=through,
+        kind=kind,
+        ordered=request.args.get("ordered") == "1" or ">" in through,
+        stops=request.args.get("stops", type=int, default=None),
+        days=request.args.get("days", type=int, default=None),
+        loop=None if loop in (None, "") else loop == "1",
+        top_n=request.args.get("top_n", type=int, default=10),
+    )
+    metrics.REQUESTS.inc("routes", "none")
+    metrics.REQUEST_SECONDS.observe(time.perf_counter() - t0, "routes", "none")
+    return jsonify({"results": recs, "count": len(recs)})
+
+@app.route("/api/routes/next", methods=["GET"])
+def route_next():
+    """
+    某站之后最常去的站点：stop=厦门&kind=city&k=10
+    """
+    kind = request.args.get("kind", "city")
+    if kind not in ("city", "poi"):
+        return jsonify({"error": "kind 只能是 city 或 poi"}), 400
+    stop = request.args.get("stop", "")
+    return jsonify({"stop": stop, "next": live.get().next_stops(stop, kind, request.args.get("k", type=int, default=10))})
+
+@app.route("/api/stats", methods=["GET"])
+def stats_summary():
+    """
+    预聚合统计：group_by=目的地,人物（也可用 city/people/theme/month/year/days），
+    同名参数作为过滤条件（如 month=5&people=家庭），top 限制返回组数
+    """
+    refresh_stats()
+    group_by = [c.strip() for c in request.args.get("group_by", "").split(",") if c.strip()]
+    filters = {k: request.args.getlist(k) for k in request.args
+               if k in DIMENSIONS or k in DIMENSION_ALIASES}
+    top = request.args.get("top", type=int, default=None)
+    try:
+        table = stats.table(group_by, filters)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    if top:
+        table = table.head(top)
+    return jsonify({
+        "rows": stats.rows,
+        "updated_at": stats.updated_at,
+        "group_by": list(table.columns[:len(group_by)]),
+        "groups": stats.to_records(table),
+    })
+
+if __name__ == "__main__":
     app.run("0.0.0.0", port=5000, debug=True)
\ No newline at end of file
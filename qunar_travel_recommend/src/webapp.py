@@ -1,15 +1,35 @@
+import os
 import streamlit as st
 from recommender import TravelRecommender
+from travel_index import file_sha256
 
 st.title("去哪儿游记智能推荐🦄")
 
-rec = TravelRecommender("data/qunar_travel.csv")
+DATA_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "data", "qunar_travel.csv")
+
+
+@st.cache_data(show_spinner=False)
+def data_version(path, mtime, size):
+    return file_sha256(path)[:12]
+
+
+@st.cache_resource(show_spinner="正在加载推荐模型……")
+def load_recommender(path, version):
+    """
+    推荐器（数据 + 索引 + 过滤倒排）按数据内容版本缓存，所有会话共享，交互重跑时不再重建
+    """
+    return TravelRecommender(path)
+
+
+stat = os.stat(DATA_PATH)
+rec = load_recommender(DATA_PATH, data_version(DATA_PATH, stat.st_mtime, stat.st_size))
 
 city_sel = st.text_input("目标城市（可为空，例如厦门，北京，上海...）：", "")
 interests = st.text_input("你的兴趣（如美食、沙滩、古镇...）：", "")
 theme = st.text_input("主题偏好（如亲子，度假，探险...）：", "")
 people = st.text_input("出行人物（如情侣、家庭、朋友...）：", "")
 budget = st.number_input("最高预算（元，0代表忽略）：", min_value=0, value=0)
+days = st.number_input("期望天数（0代表忽略）：", min_value=0, value=0)
 top_n = st.slider("推荐条数", 1, 10, 5)
 
 if st.button("推荐！"):
@@ -19,6 +39,7 @@ if st.button("推荐！"):
         people=people,
         city=city_sel,
         budget=(budget if budget > 0 else None),
+        days=(days if days > 0 else None),
         top_n=top_n
     )
     if not recs:
@@ -0,0 +1,52 @@
+"""
+列表页解析：fast 与 bs4 两个后端在样例页上逐条记录一致；
+省略 </li> 等不规范写法的变体（data/fixtures/quirks）上 fast 与原页结果相同，bs4 的差别单独固定
+
+    python -m pytest tests
+"""
+import os
+import sys
+
+import pytest
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(BASE_DIR, "src"))
+sys.path.insert(0, os.path.join(BASE_DIR, "bench"))
+from bench_extract import load_fixtures, load_quirks  # noqa: E402
+from qunar_extract import extract_bs4, extract_fast  # noqa: E402
+
+PAGES = load_fixtures()
+QUIRKS = load_quirks()
+# bs4 把后一条嵌进前一条时，前一条缺的这些字段会取到后一条的
+BORROWED_FIELDS = {"目的地", "行程"}
+
+
+@pytest.mark.parametrize("name,html", PAGES, ids=[name for name, _ in PAGES])
+def test_fast_matches_bs4(name, html):
+    expected = extract_bs4(html)
+    assert expected
+    assert extract_fast(html) == expected
+
+
+def test_unclosed_li_starts_new_record():
+    html = dict(PAGES)["page_0003.html"]
+    records = extract_fast(html.replace("</li>", ""))
+    assert len(records) == 10
+    assert records == extract_fast(html)
+
+
+@pytest.mark.parametrize("name,html,source", QUIRKS, ids=[name for name, _, _ in QUIRKS])
+def test_quirk_matches_source_page(name, html, source):
+    assert extract_fast(html) == extract_fast(dict(PAGES)[source])
+
+
+@pytest.mark.parametrize("name,html,source", QUIRKS, ids=[name for name, _, _ in QUIRKS])
+def test_quirk_bs4_borrows_nested_fields(name, html, source):
+    fast, bs4 = extract_fast(html), extract_bs4(html)
+    assert len(fast) == len(bs4)
+    diffs = [(f, b) for f, b in zip(fast, bs4) if f != b]
+    assert diffs
+    for f, b in diffs:
+        changed = {k for k in f if f[k] != b[k]}
+        assert changed <= BORROWED_FIELDS
+        assert all(f[k] == "" for k in changed)
@@ -0,0 +1,48 @@
+"""
+批量推荐：recommend_many（分块打分后逐条重排）与逐条 recommend 的结果一致
+
+    python -m pytest tests
+"""
+import os
+import sys
+
+import pytest
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(BASE_DIR, "src"))
+from recommender import TravelRecommender  # noqa: E402
+from rerank import retrieve_rerank, retrieve_rerank_many  # noqa: E402
+from travel_index import build_index  # noqa: E402
+
+DATA = os.path.join(BASE_DIR, "data", "featured_travel.csv")
+QUERIES = ["美食", "亲子 沙滩", "古镇 摄影", "徒步", "", "不存在的词xyz", "海岛 潜水 美食", "美食"]
+
+
+@pytest.fixture(scope="module")
+def rec(tmp_path_factory):
+    index = build_index(DATA, str(tmp_path_factory.mktemp("index")))
+    return TravelRecommender(DATA, index=index)
+
+
+@pytest.mark.parametrize("budget", [None, 3000.0, 1.0])
+def test_batch_matches_single(rec, budget):
+    batch = rec.recommend_many(QUERIES, top_n=10, budget=budget)
+    assert batch == [rec.recommend(interests=q, budget=budget, top_n=10) for q in QUERIES]
+
+
+def test_small_blocks_match_single(rec):
+    index = rec.index
+    Q = index.transform(QUERIES)
+    mask = index.budget_mask(3000)
+    # 每块只放得下一条查询
+    ranked = retrieve_rerank_many(index, Q, 10, mask=mask, budget=3000, max_block_bytes=1)
+    for qi, (hits, scores) in enumerate(ranked):
+        expected_hits, expected_scores = retrieve_rerank(index, Q[qi], 10, mask=mask, budget=3000)
+        assert hits.tolist() == expected_hits.tolist()
+        assert scores.tolist() == expected_scores.tolist()
+
+
+def test_batch_matches_inverted_search(rec, monkeypatch):
+    # 大索引时 recommend 走倒排检索（MaxScore），批量仍是分块暴力打分
+    monkeypatch.setattr(rec.index, "exhaustive_max_docs", 0)
+    assert rec.recommend_many(QUERIES, top_n=10) == [rec.recommend(interests=q, top_n=10) for q in QUERIES]